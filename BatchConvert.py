@@ -0,0 +1,140 @@
+from SVG2SCR import Converter
+from SCRStats import ConversionStats, writeReports
+from union import overlapWarning
+import os, sys, glob, time, traceback, multiprocessing
+
+## BatchConvert runs lots of conversions at once. The inputs can be SVG files,
+##  directories (which are searched recursively for .svg and .svgz files) or glob
+##  patterns, and the conversions are shared out over a pool of worker
+##  processes, one per core unless told otherwise. A file that fails to convert
+##  is reported and skipped; it never stops the rest of the batch.
+
+## findSVGs() expands a list of inputs into a list of (filename, root) pairs,
+##  where 'root' is the directory the file was found under (used to mirror the
+##  directory structure when writing into an output directory). Each file only
+##  appears once, in the order it was first found.
+def findSVGs(inputs):
+    found = []
+    seen = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            matches = []
+            for dirpath, dirnames, filenames in os.walk(item):
+                dirnames.sort()
+                for name in sorted(filenames):
+                    if name.lower().endswith((".svg", ".svgz")):
+                        matches.append((os.path.join(dirpath, name), item))
+        elif glob.has_magic(item):
+            ## The root of a pattern is the part of it before the first
+            ##  wildcard, e.g. "art" for "art/*/logo?.svg".
+            wild = min(i for i in (item.find(c) for c in "*?[") if i >= 0)
+            matches = [(name, os.path.dirname(item[:wild]))
+                       for name in sorted(glob.glob(item))
+                       if os.path.isfile(name)]
+        else:
+            matches = [(item, os.path.dirname(item))]
+        for name, root in matches:
+            if name not in seen:
+                seen.add(name)
+                found.append((name, root))
+    return found
+
+## scriptNameFor() works out where the script for an SVG goes: next to the SVG
+##  itself, or under 'outputDir' in the same position relative to it that the
+##  SVG had relative to 'root'.
+def scriptNameFor(filename, root, outputDir=None):
+    scriptName = os.path.splitext(filename)[0] + ".scr"
+    if outputDir is None:
+        return scriptName
+    return os.path.join(outputDir, os.path.relpath(scriptName, root or "."))
+
+## The worker side. Each worker process builds one Converter when it starts and
+##  reuses it for every file it's handed.
+_converter = None
+
+def _startWorker(options):
+    global _converter
+    _converter = Converter(**options)
+
+## _convertOne() converts a single file and returns a tuple of (filename,
+##  scriptName, error, seconds, stats), where 'error' is None on success and
+##  'stats' is the file's ConversionStats report if it was asked for, or if
+##  POLYGONs are being merged (for overlapWarning() in union.py), or None.
+def _convertOne(job):
+    filename, scriptName, wantStats = job
+    stats = ConversionStats() if wantStats or _converter.union else None
+    start = time.time()
+    try:
+        directory = os.path.dirname(scriptName)
+        if directory and not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                if not os.path.isdir(directory):   ## Another worker may have
+                    raise                          ##  just made it.
+        _converter.convertFile(filename, scriptName, stats)
+        error = None
+    except Exception:
+        error = traceback.format_exc().strip().splitlines()[-1]
+    return (filename, scriptName, error, time.time() - start,
+            stats.report() if stats is not None else None)
+
+## convertBatch() converts every (filename, scriptName) pair in 'jobs' with the
+##  given Converter options and returns the results from _convertOne() in the
+##  same order as 'jobs'. 'processes' is the size of the worker pool; by
+##  default it's the number of cores in the machine. If 'stats' is set, each
+##  result includes the file's statistics.
+def convertBatch(jobs, options=None, processes=None, stats=False):
+    options = options or {}
+    jobs = [(filename, scriptName, stats) for filename, scriptName in jobs]
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    processes = max(1, min(processes, len(jobs)))
+    if processes == 1:
+        _startWorker(options)
+        return [_convertOne(job) for job in jobs]
+    pool = multiprocessing.Pool(processes, _startWorker, (options,))
+    try:
+        results = pool.map(_convertOne, jobs, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+    return results
+
+## report() prints a line per file, plus any warning about it, and a summary,
+##  and returns the number of files that failed.
+def report(results, wallTime=None, f=sys.stdout):
+    failures = 0
+    for filename, scriptName, error, seconds, stats in results:
+        if error is None:
+            f.write("ok    %8.3fs  %s -> %s\n"
+                    % (seconds, filename, scriptName))
+            warning = overlapWarning(stats)
+            if warning is not None:
+                f.write("      %s\n" % warning)
+        else:
+            failures += 1
+            f.write("FAIL  %8.3fs  %s: %s\n" % (seconds, filename, error))
+    total = sum(r[3] for r in results)
+    f.write("%d converted, %d failed, %.3fs conversion time"
+            % (len(results) - failures, failures, total))
+    if wallTime is not None:
+        f.write(", %.3fs elapsed" % wallTime)
+    f.write("\n")
+    return failures
+
+## run() is what the command line uses: find the files, convert them and report
+##  on how it went. It returns the number of failures. If 'stats' is given,
+##  statistics for every file that converted are written there as JSON (see
+##  writeReports() in SCRStats.py).
+def run(inputs, options=None, outputDir=None, processes=None, f=sys.stdout,
+        stats=None):
+    start = time.time()
+    jobs = [(name, scriptNameFor(name, root, outputDir))
+            for name, root in findSVGs(inputs)]
+    results = convertBatch(jobs, options, processes, stats is not None)
+    failures = report(results, time.time() - start, f)
+    if stats is not None:
+        writeReports(dict((r[0], r[4]) for r in results if r[2] is None),
+                     stats)
+    return failures
@@ -0,0 +1,322 @@
+from SVG2SCR import Converter
+from SvgParser import parsers
+from SCRStats import ConversionStats
+from union import overlapWarning
+from clip import parseRegion
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from SocketServer import ThreadingMixIn, UnixStreamServer
+from urlparse import urlparse, parse_qsl
+from urllib import urlencode
+from collections import OrderedDict
+import os, sys, json, signal, socket, httplib, argparse, traceback
+import multiprocessing
+
+## ConvertServer runs SVG2SCR as a long-lived local service, for tools that
+##  convert drawings on demand and don't want to pay for starting Python and
+##  importing everything for each one. It speaks plain HTTP, either on a
+##  localhost port or on a Unix socket:
+##
+##      POST /convert?tolerance=0.02&arcs=0.01    (body: the SVG)
+##
+##  answers with the text of the script, or, with stats=1 in the query, a JSON
+##  object holding the script ("script") and the conversion's statistics
+##  ("stats", see SCRStats.py). Any of the Converter options tolerance,
+##  simplify, arcs, group, stitch, union, region, clip and parser can be
+##  given in the query. A bad request gets a
+##  400 with the reason as plain text. GET /status says how many workers the
+##  server has.
+##
+##  Requests are taken in by one thread each and converted by a pool of worker
+##  processes, so any number can be in progress at once and the conversions
+##  themselves run in parallel. Each worker keeps a Converter for each of the
+##  last few sets of options it has been asked for (MAX_CONVERTERS), along
+##  with its cache file if the server was given one, so a request costs little
+##  more than the conversion itself.
+##
+##  convertRemote() (and "python ConvertServer.py convert") is the client end.
+
+## The default port; the server only ever listens on localhost.
+DEFAULT_PORT = 8354
+
+## flag() reads a yes/no query parameter.
+def flag(value):
+    return value.lower() not in ("", "0", "false", "no")
+
+## The query parameters that are passed on to Converter, and their types.
+OPTIONS = {"tolerance": float, "simplify": float, "arcs": float,
+           "group": flag, "stitch": flag, "union": flag,
+           "region": parseRegion, "clip": flag, "parser": str}
+
+## How many Converters each worker keeps. Every distinct set of options in a
+##  query gets a Converter of its own, so without a limit a client could use
+##  up a worker's memory just by asking for lots of different tolerances.
+MAX_CONVERTERS = 16
+
+## The worker side. Each worker process keeps its Converters between requests,
+##  least recently used first.
+_converters = OrderedDict()
+_cache = None
+
+def _startWorker(cache):
+    global _cache
+    _cache = cache
+
+## _convertOne() converts an SVG with the given options and returns a tuple of
+##  (script, stats report), where the report is None unless it was asked
+##  for, or POLYGONs are being merged (for overlapWarning() in union.py).
+##  'svg' is the body of the request, and is only ever read as the SVG itself
+##  (gzipped or not), never as the name of a file on the server.
+def _convertOne(svg, options, wantStats):
+    key = tuple(sorted(options.items()))
+    converter = _converters.pop(key, None)
+    if converter is None:
+        converter = Converter(cache=_cache, **options)
+        if len(_converters) >= MAX_CONVERTERS:
+            oldKey, oldest = _converters.popitem(last=False)
+            if oldest.cache:
+                oldest.cache.close()
+    _converters[key] = converter
+    stats = ConversionStats() if wantStats or converter.union else None
+    script = converter.convertText(svg, stats)
+    return script, stats.report() if stats is not None else None
+
+## parseOptions() turns the query of a request into Converter options and
+##  whether statistics were asked for. It raises ValueError for anything it
+##  doesn't understand.
+def parseOptions(query):
+    options = {}
+    wantStats = False
+    for name, value in parse_qsl(query):
+        if name == "stats":
+            wantStats = flag(value)
+        elif name in OPTIONS:
+            options[name] = OPTIONS[name](value)
+        else:
+            raise ValueError("unknown option: %s" % name)
+    if options.get("parser", "expat") not in parsers:
+        raise ValueError("unknown parser: %s" % options["parser"])
+    return options, wantStats
+
+## The request handler. The server it belongs to holds the worker pool.
+class ConvertHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if urlparse(self.path).path != "/status":
+            return self.reply(404, "not found\n")
+        self.reply(200, json.dumps({"workers": self.server.workers}) + "\n",
+                   "application/json")
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/convert":
+            return self.reply(404, "not found\n")
+        length = self.headers.getheader("content-length")
+        if length is None:
+            return self.reply(411, "Content-Length required\n")
+        svg = self.rfile.read(int(length))
+        try:
+            options, wantStats = parseOptions(url.query)
+        except ValueError as e:
+            return self.reply(400, "%s\n" % e)
+        try:
+            script, stats = self.server.pool.apply(
+                _convertOne, (svg, options, wantStats))
+        except Exception:
+            error = traceback.format_exc().strip().splitlines()[-1]
+            return self.reply(400, "%s\n" % error)
+        warning = overlapWarning(stats)
+        if warning is not None:
+            self.log_message("%s", warning)
+        if wantStats:
+            self.reply(200, json.dumps({"script": script, "stats": stats}),
+                       "application/json")
+        else:
+            self.reply(200, script)
+
+    ## reply() sends a complete response.
+    def reply(self, code, body, contentType="text/plain"):
+        self.send_response(code)
+        self.send_header("Content-Type", contentType)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    ## A Unix socket has no client address to speak of.
+    def address_string(self):
+        if isinstance(self.client_address, str):
+            return self.client_address or "local"
+        return BaseHTTPRequestHandler.address_string(self)
+
+    ## BaseHTTPRequestHandler logs the client address as client_address[0],
+    ##  which a Unix socket doesn't have.
+    def log_message(self, format, *args):
+        if isinstance(self.client_address, str):
+            address = self.address_string()
+        else:
+            address = self.client_address[0]
+        sys.stderr.write("%s - - [%s] %s\n" % (address,
+                                               self.log_date_time_string(),
+                                               format % args))
+
+    ## Only errors are logged; a busy server would otherwise fill the log
+    ##  with a line per request.
+    def log_request(self, code="-", size="-"):
+        if code != 200:
+            BaseHTTPRequestHandler.log_request(self, code, size)
+
+class ConvertServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+class UnixConvertServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+    ## HTTPServer does this for TCP servers; BaseHTTPRequestHandler wants it.
+    def server_bind(self):
+        UnixStreamServer.server_bind(self)
+        self.server_name = "localhost"
+        self.server_port = 0
+
+## serve() runs the server until it's interrupted or terminated, on 'port' of
+##  localhost, or on the Unix socket 'socketPath' if that's given. 'processes'
+##  is the number of workers; by default it's the number of cores in the
+##  machine. 'cache' is the name of a cache file for the workers to share (see
+##  SCRCache.py).
+def serve(port=DEFAULT_PORT, socketPath=None, processes=None, cache=None):
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    ## The pool is started before the server so that the workers don't
+    ##  inherit its socket.
+    pool = multiprocessing.Pool(processes, _startWorker, (cache,))
+    if socketPath is not None:
+        if os.path.exists(socketPath):
+            os.unlink(socketPath)
+        server = UnixConvertServer(socketPath, ConvertHandler)
+        where = socketPath
+    else:
+        server = ConvertServer(("127.0.0.1", port), ConvertHandler)
+        where = "http://127.0.0.1:%d/" % server.server_port
+    server.pool = pool
+    server.workers = processes
+    ## Being terminated shuts down as tidily as an interrupt does.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    sys.stderr.write("converting on %s with %d workers\n" % (where, processes))
+    try:
+        server.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        server.server_close()
+        if socketPath is not None and os.path.exists(socketPath):
+            os.unlink(socketPath)
+        pool.terminate()
+        pool.join()
+
+## The client side.
+
+## UnixHTTPConnection is an HTTPConnection over a Unix socket.
+class UnixHTTPConnection(httplib.HTTPConnection):
+    def __init__(self, socketPath, timeout=None):
+        httplib.HTTPConnection.__init__(self, "localhost", timeout=timeout)
+        self.socketPath = socketPath
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socketPath)
+
+## ServerError is raised by convertRemote() when the server turns a request
+##  down.
+class ServerError(Exception):
+    pass
+
+## convertRemote() sends an SVG (its text) to a server and returns the text of
+##  the script, or if 'stats' is set, a tuple of (script, stats report). The
+##  server is on 'port' of localhost, or on the Unix socket 'socketPath'.
+##  'options' are Converter options, as for SVG2SCR.convert().
+def convertRemote(svg, port=DEFAULT_PORT, socketPath=None, stats=False,
+                  timeout=None, **options):
+    query = dict((name, value) for name, value in options.iteritems()
+                 if value is not None)
+    if stats:
+        query["stats"] = 1
+    if socketPath is not None:
+        connection = UnixHTTPConnection(socketPath, timeout)
+    else:
+        connection = httplib.HTTPConnection("127.0.0.1", port, timeout=timeout)
+    try:
+        connection.request("POST", "/convert?" + urlencode(query), svg,
+                           {"Content-Type": "image/svg+xml"})
+        response = connection.getresponse()
+        body = response.read()
+    finally:
+        connection.close()
+    if response.status != 200:
+        raise ServerError(body.strip())
+    if stats:
+        result = json.loads(body)
+        return result["script"].encode("utf-8"), result["stats"]
+    return body
+
+## main() is the command line entry point: "serve" to run a server, "convert"
+##  to send it files.
+def main(argv=None):
+    argParser = argparse.ArgumentParser(
+            description="Run SVG2SCR as a local service, or use one.")
+    argParser.add_argument("--port", type=int, default=DEFAULT_PORT,
+            help="localhost port to serve on or connect to (default: %d)"
+                 % DEFAULT_PORT)
+    argParser.add_argument("--socket", default=None, metavar="PATH",
+            help="serve on or connect to this Unix socket instead")
+    commands = argParser.add_subparsers(dest="command")
+    server = commands.add_parser("serve", help="run the server")
+    server.add_argument("-j", "--jobs", type=int, default=None,
+            help="number of worker processes (default: one per core)")
+    server.add_argument("--cache", default=None, metavar="FILE",
+            help="cache file for the workers to share; see SVG2SCR.py")
+    client = commands.add_parser("convert",
+            help="convert SVG files with a running server")
+    client.add_argument("inputs", nargs="+", metavar="input",
+            help="SVG file; the script is written next to it")
+    client.add_argument("-t", "--tolerance", type=float, default=None)
+    client.add_argument("-s", "--simplify", type=float, default=None)
+    client.add_argument("-a", "--arcs", type=float, default=None)
+    client.add_argument("-g", "--group", action="store_true", default=None)
+    client.add_argument("--stitch", action="store_true", default=None)
+    client.add_argument("--union", action="store_true", default=None)
+    client.add_argument("--region", default=None, metavar="L,B,R,T")
+    client.add_argument("--clip", action="store_true", default=None)
+    client.add_argument("--parser", choices=sorted(parsers), default=None)
+    client.add_argument("--stats", action="store_true",
+            help="print each conversion's statistics as JSON")
+    args = argParser.parse_args(argv)
+
+    if args.command == "serve":
+        serve(args.port, args.socket, args.jobs, args.cache)
+        return 0
+
+    failures = 0
+    for filename in args.inputs:
+        with open(filename) as f:
+            svg = f.read()
+        try:
+            result = convertRemote(svg, args.port, args.socket, args.stats,
+                                   tolerance=args.tolerance,
+                                   simplify=args.simplify, arcs=args.arcs,
+                                   group=args.group, stitch=args.stitch,
+                                   union=args.union, region=args.region,
+                                   clip=args.clip, parser=args.parser)
+        except (ServerError, socket.error) as e:
+            sys.stderr.write("FAIL  %s: %s\n" % (filename, e))
+            failures += 1
+            continue
+        if args.stats:
+            result, stats = result
+            print json.dumps({filename: stats}, indent=2, sort_keys=True)
+        with open(os.path.splitext(filename)[0] + ".scr", 'w') as f:
+            f.write(result)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,299 @@
+from SVGConstants import ARGUMENTS
+from transforms import IDENTITY, applyMatrix, conformal, mirrors
+from array import array
+import math
+
+## PathInterpreter turns the path data of one SVGPath (see SVGPath.py) into an
+##  array of points in EAGLE coordinates.
+##  Each command is looked up once to find the number of arguments it takes
+##  (ARGUMENTS in SVGConstants.py) and its handler (the dispatch table below);
+##  the handler is then run over the command's arguments a group at a time.
+##  All of the state that carries from one command to the next (the current
+##  point and the control points that smooth curves reflect) lives in the
+##  interpreter object.
+##
+##  The whole path is worked out in its own coordinates, just as they are in
+##  the SVG, and then taken to EAGLE's in one go by the path's transform (see
+##  transforms.py), which takes care of the groups it's in, the px to mm
+##  scale and the Y flip all at once.
+##
+##  Straight lines go straight into the point array. The control points of
+##  curves go into an array of their own, and are transformed along with the
+##  points; only then is each curve added to a BezierBatch (see beziers.py),
+##  so that it's flattened to the tolerance in mm. The handle the batch gives
+##  back is recorded along with the position in the point array where the
+##  curve belongs, so that the curve can be spliced in once the batch is
+##  flattened.
+##
+##  Arcs normally just go straight to their end point. When drawing arcs, a
+##  circular arc (one whose two radii are the same, and which the transform
+##  leaves circular) is also recorded as a (position in the point array,
+##  curve in degrees) pair, so that its end point can be given a bend (see
+##  EAGLEPath in SCRSupport.py).
+class PathInterpreter:
+    ## constructor. 'transform' is the matrix that takes the path to EAGLE.
+    def __init__(self, batch, transform=IDENTITY, arcs=False):
+        self.batch = batch
+        self.transform = transform
+        self.cpx = 0         ## The current point, in the path's coordinates.
+        self.cpy = 0
+        self.chcx = 0        ## The point a following cubic smooth curve
+        self.chcy = 0        ##  (s/S) uses as its first control point.
+        self.chqx = 0        ## The point a following quadratic smooth curve
+        self.chqy = 0        ##  (t/T) uses as its control point.
+        self.points = None   ## The point array being built, X then Y for each
+                             ##  point.
+        self.curves = None   ## (position in points, position in controls)
+                             ##  for each curve, until run() adds them to the
+                             ##  batch; then (position in points, batch
+                             ##  handle).
+        self.controls = None ## The start, control and end points of each
+                             ##  curve, X then Y for each.
+        self.arcs = [] if arcs else None  ## (position in points, curve) for
+                             ##  each circular arc, if we're drawing arcs.
+
+    ## run() interprets the path data of an SVGPath and returns the resulting
+    ##  point array and list of curves. Any circular arcs are left in
+    ##  self.arcs.
+    def run(self, shape):
+        self.trace(shape)
+        return self.finish()
+
+    ## trace() follows the path data of an SVGPath, filling in the points,
+    ##  curves, controls and arcs in the path's own coordinates.
+    def trace(self, shape):
+        self.points = points = array('d')
+        self.curves = []
+        self.controls = array('d')
+        if self.arcs is not None:
+            self.arcs = []
+            ## A circle that the transform squashes into an ellipse can't be
+            ##  drawn as an arc.
+            if not conformal(self.transform):
+                self.arcs = None
+        args = shape.args
+        first = True
+        for command, start, end in shape.records():
+            ## A close path command draws back to the first point. Paths are
+            ##  expected to hold a single closed shape, so we stop here.
+            if command == 'z' or command == 'Z':
+                if points:
+                    points.extend(points[0:2])
+                break
+            ## When a relative MOVETO is the first command in a path, treat
+            ##  its first point as absolute, although any following
+            ##  parameters should still be treated as relative LINETO
+            ##  parameters.
+            arity = ARGUMENTS[command]
+            handler = repeat = dispatch[command]
+            if first and command == 'm':
+                handler = lineAbs
+            first = False
+            if end - start >= arity:
+                handler(self, args, start)
+            for i in xrange(start + arity, end - arity + 1, arity):
+                repeat(self, args, i)
+
+    ## finish() takes the points and curves to EAGLE's coordinates, in one
+    ##  pass over all of them, hands the curves to the batch and returns the
+    ##  point array and the list of curves.
+    def finish(self):
+        count = len(self.points)
+        both = applyMatrix(self.transform, self.points + self.controls)
+        self.points = points = both[:count]
+        controls = both[count:].tolist()
+        curves = []
+        for position, i in self.curves:
+            if i < 0:
+                i = -i - 1
+                handle = self.batch.addQuad(controls[i:i+2],
+                                            controls[i+2:i+4],
+                                            controls[i+4:i+6])
+            else:
+                handle = self.batch.addCubic(controls[i:i+2],
+                                             controls[i+2:i+4],
+                                             controls[i+4:i+6],
+                                             controls[i+6:i+8])
+            curves.append((position, handle))
+        self.curves = curves
+        return points, curves
+
+    ## bounds() returns the box (left, bottom, right, top), in EAGLE's
+    ##  coordinates, that an SVGPath is drawn inside of, or None if it draws
+    ##  nothing. Nothing is flattened: a curve never strays outside the shape
+    ##  its control points make, so the box is worked out from those and the
+    ##  points. An arc (when drawing arcs) may bulge out of the box of its two
+    ##  ends, by as much as its radius, so the box is made big enough for that.
+    def bounds(self, shape):
+        self.trace(shape)
+        both = applyMatrix(self.transform, self.points + self.controls)
+        if not both:
+            return None
+        xs = both[0::2]
+        ys = both[1::2]
+        box = [min(xs), min(ys), max(xs), max(ys)]
+        for position, curve in self.arcs or ():
+            if position < 2 or not curve:
+                continue
+            x0, y0, x1, y1 = both[position-2:position+2]
+            theta = math.radians(abs(curve))
+            radius = math.hypot(x1 - x0, y1 - y0) / 2 / math.sin(theta / 2)
+            if theta <= math.pi:
+                bulge = radius * (1 - math.cos(theta / 2))
+            else:
+                bulge = 2 * radius
+            box[0] = min(box[0], min(x0, x1) - bulge)
+            box[1] = min(box[1], min(y0, y1) - bulge)
+            box[2] = max(box[2], max(x0, x1) + bulge)
+            box[3] = max(box[3], max(y0, y1) + bulge)
+        return tuple(box)
+
+    ## lineTo() draws a straight line to a point and resets both
+    ##  reflection points to it, as every command other than a curve does.
+    def lineTo(self, x, y):
+        self.cpx = self.chcx = self.chqx = x
+        self.cpy = self.chcy = self.chqy = y
+        self.points.append(x)
+        self.points.append(y)
+
+    ## absolute() and relative() return a coordinate pair from the SVG as a
+    ##  point: either as it is (absolute) or measured from the current point
+    ##  (relative).
+    def absolute(self, x, y):
+        return [x, y]
+
+    def relative(self, x, y):
+        return [x + self.cpx, y + self.cpy]
+
+    ## cubicTo() and quadTo() add a curve from the current point, given its
+    ##  control points and end point, and update the reflection points. A
+    ##  quadratic curve's place in the controls is stored as -1 - position,
+    ##  to tell the two apart.
+    def cubicTo(self, h1, h2, ep):
+        self.curves.append((len(self.points), len(self.controls)))
+        self.controls.extend((self.cpx, self.cpy))
+        self.controls.extend(h1 + h2 + ep)
+        self.cpx = self.chqx = ep[0]
+        self.cpy = self.chqy = ep[1]
+        self.chcx = (2*self.cpx) - h2[0]
+        self.chcy = (2*self.cpy) - h2[1]
+
+    def quadTo(self, h1, ep):
+        self.curves.append((len(self.points), -1 - len(self.controls)))
+        self.controls.extend((self.cpx, self.cpy))
+        self.controls.extend(h1 + ep)
+        self.cpx = self.chcx = ep[0]
+        self.cpy = self.chcy = ep[1]
+        self.chqx = (2*self.cpx) - h1[0]
+        self.chqy = (2*self.cpy) - h1[1]
+
+    ## arcTo() draws an arc from the current point to 'ep', given the
+    ##  arc's arguments starting at args[i]. It's a straight line unless we're
+    ##  drawing arcs and the arc is part of a circle, in which case the curve
+    ##  of the arc is worked out from its radius and flags. (The radius may be
+    ##  too small to reach the end point, in which case SVG says to scale it
+    ##  up until it just does, making a half circle.)
+    def arcTo(self, args, i, ep):
+        rx = abs(args[i])
+        ry = abs(args[i+1])
+        if self.arcs is not None and rx and abs(rx - ry) <= 1e-9 * rx:
+            half = math.hypot(ep[0] - self.cpx, ep[1] - self.cpy) / 2
+            if half:
+                theta = 2 * math.asin(min(1.0, half / rx))
+                if args[i+3]:
+                    theta = 2*math.pi - theta
+                ## The sweep flag picks clockwise as seen, which with Y
+                ##  flipped (as the document's transform does) is a negative
+                ##  curve in EAGLE.
+                if bool(args[i+4]) == mirrors(self.transform):
+                    theta = -theta
+                self.arcs.append((len(self.points), math.degrees(theta)))
+        self.lineTo(*ep)
+
+## The handlers. Each takes the interpreter, the argument array and the index of
+##  the first argument of the group to handle.
+def lineRel(state, args, i):
+    state.lineTo(*state.relative(args[i], args[i+1]))
+
+def lineAbs(state, args, i):
+    state.lineTo(*state.absolute(args[i], args[i+1]))
+
+def lineHRel(state, args, i):
+    state.lineTo(args[i] + state.cpx, state.cpy)
+
+def lineHAbs(state, args, i):
+    state.lineTo(args[i], state.cpy)
+
+def lineVRel(state, args, i):
+    state.lineTo(state.cpx, args[i] + state.cpy)
+
+def lineVAbs(state, args, i):
+    state.lineTo(state.cpx, args[i])
+
+def curveRel(state, args, i):
+    state.cubicTo(state.relative(args[i], args[i+1]),
+                  state.relative(args[i+2], args[i+3]),
+                  state.relative(args[i+4], args[i+5]))
+
+def curveAbs(state, args, i):
+    state.cubicTo(state.absolute(args[i], args[i+1]),
+                  state.absolute(args[i+2], args[i+3]),
+                  state.absolute(args[i+4], args[i+5]))
+
+def smoothRel(state, args, i):
+    state.cubicTo([state.chcx, state.chcy],
+                  state.relative(args[i], args[i+1]),
+                  state.relative(args[i+2], args[i+3]))
+
+def smoothAbs(state, args, i):
+    state.cubicTo([state.chcx, state.chcy],
+                  state.absolute(args[i], args[i+1]),
+                  state.absolute(args[i+2], args[i+3]))
+
+def quadRel(state, args, i):
+    state.quadTo(state.relative(args[i], args[i+1]),
+                 state.relative(args[i+2], args[i+3]))
+
+def quadAbs(state, args, i):
+    state.quadTo(state.absolute(args[i], args[i+1]),
+                 state.absolute(args[i+2], args[i+3]))
+
+def smoothQuadRel(state, args, i):
+    state.quadTo([state.chqx, state.chqy],
+                 state.relative(args[i], args[i+1]))
+
+def smoothQuadAbs(state, args, i):
+    state.quadTo([state.chqx, state.chqy],
+                 state.absolute(args[i], args[i+1]))
+
+## The x,y of the end of an arc are the 6th and 7th parameters; see arcTo()
+##  for the rest.
+def arcRel(state, args, i):
+    state.arcTo(args, i, state.relative(args[i+5], args[i+6]))
+
+def arcAbs(state, args, i):
+    state.arcTo(args, i, state.absolute(args[i+5], args[i+6]))
+
+## The dispatch table: the handler for each group of arguments of each command.
+##  Note that MOVETO only moves on its first pair; any pairs after that are
+##  LINETO parameters, which is exactly what the line handlers do anyway.
+dispatch = {
+    'm': lineRel,
+    'M': lineAbs,
+    'l': lineRel,
+    'L': lineAbs,
+    'h': lineHRel,
+    'H': lineHAbs,
+    'v': lineVRel,
+    'V': lineVAbs,
+    'c': curveRel,
+    'C': curveAbs,
+    's': smoothRel,
+    'S': smoothAbs,
+    'q': quadRel,
+    'Q': quadAbs,
+    't': smoothQuadRel,
+    'T': smoothQuadAbs,
+    'a': arcRel,
+    'A': arcAbs,
+}
@@ -0,0 +1,203 @@
+from array import array
+import os, time, sqlite3, hashlib
+
+## PathCache keeps the flattened points of paths on disk between runs, so that
+##  a drawing which has only changed a little since last time only has its
+##  changed paths flattened again. Each path is looked up by a hash of
+##  everything that goes into flattening it: its path data, its total offset,
+##  its type, weight and layer, and the conversion options (see key()). The
+##  points are stored as raw doubles, exactly as they sit in EAGLEPath.path.
+##
+##  The cache is an SQLite database, so any number of processes (such as the
+##  workers of a batch conversion) can share one cache file. It's kept under a
+##  size limit by throwing away whichever paths were used least recently. The
+##  total size of the points is kept in a table of its own (cacheSize), and
+##  updated along with every change to the paths, so that it never has to be
+##  added up again.
+
+## Default size limit, in bytes of point data.
+DEFAULT_SIZE = 256 * 1024 * 1024
+
+## Bump this whenever the way paths are flattened changes, so that points
+##  cached by an older version aren't used.
+VERSION = 3
+
+## How many keys to put in one SQL statement.
+_CHUNK = 500
+
+class PathCache:
+    ## constructor. The database isn't opened until it's first needed, and is
+    ##  opened again in any process that inherits the object (SQLite
+    ##  connections mustn't be shared across a fork).
+    def __init__(self, filename, maxBytes=DEFAULT_SIZE):
+        self.filename = filename
+        self.maxBytes = maxBytes
+        self.db = None
+        self.pid = None
+
+    def connect(self):
+        if self.db is not None and self.pid == os.getpid():
+            return self.db
+        self.db = sqlite3.connect(self.filename, timeout=60)
+        self.pid = os.getpid()
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS paths (key TEXT PRIMARY "
+                        "KEY, points BLOB, size INTEGER, used REAL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS paths_used ON paths(used)")
+        ## A cache made before cacheSize was kept has its total added up once,
+        ##  the first time it's opened.
+        self.db.execute("CREATE TABLE IF NOT EXISTS cacheSize (id INTEGER "
+                        "PRIMARY KEY CHECK (id = 0), bytes INTEGER)")
+        self.db.execute("INSERT OR IGNORE INTO cacheSize SELECT 0, "
+                        "COALESCE(SUM(size), 0) FROM paths")
+        self.db.commit()
+        return self.db
+
+    def close(self):
+        if self.db is not None and self.pid == os.getpid():
+            self.db.close()
+        self.db = None
+
+    ## key() returns the cache key for an SVGPath, drawn with its transform,
+    ##  with the given conversion options (a tuple of anything whose repr()
+    ##  pins down how the path will be flattened).
+    def key(self, shape, options):
+        h = hashlib.sha1()
+        h.update(repr((VERSION, options, shape.transform, shape.pathType,
+                       shape.pathWeight, shape.pathLayer)))
+        h.update("".join(shape.commands))
+        h.update(shape.starts.tostring())
+        h.update(shape.args.tostring())
+        return h.hexdigest()
+
+    ## get() looks up a list of keys and returns a dictionary mapping each key
+    ##  that was found to its point array. Everything found is marked as just
+    ##  used.
+    def get(self, keys):
+        db = self.connect()
+        found = {}
+        keys = list(set(keys))
+        for i in xrange(0, len(keys), _CHUNK):
+            chunk = keys[i:i+_CHUNK]
+            marks = ",".join("?" * len(chunk))
+            for key, points in db.execute("SELECT key, points FROM paths "
+                                          "WHERE key IN (%s)" % marks, chunk):
+                flat = array('d')
+                flat.fromstring(str(points))
+                found[key] = flat
+        if found:
+            hits = list(found)
+            now = time.time()
+            for i in xrange(0, len(hits), _CHUNK):
+                chunk = hits[i:i+_CHUNK]
+                marks = ",".join("?" * len(chunk))
+                db.execute("UPDATE paths SET used=? WHERE key IN (%s)" % marks,
+                           [now] + chunk)
+            db.commit()
+        return found
+
+    ## put() stores a list of (key, point array) pairs, then trims the cache
+    ##  back under its size limit. Any of the paths that were already there
+    ##  (put by another process since we looked) are replaced, and their size
+    ##  taken off the total first, all in the same transaction.
+    def put(self, items):
+        items = dict(items)
+        if not items:
+            return
+        db = self.connect()
+        now = time.time()
+        self.release(list(items))
+        rows = [(key, sqlite3.Binary(points.tostring()),
+                 len(points) * points.itemsize, now)
+                for key, points in items.iteritems()]
+        db.executemany("INSERT OR REPLACE INTO paths VALUES (?, ?, ?, ?)",
+                       rows)
+        db.execute("UPDATE cacheSize SET bytes = bytes + ?",
+                   (sum(row[2] for row in rows),))
+        db.commit()
+        self.evict()
+
+    ## release() takes the size of whichever of 'keys' are in the cache off
+    ##  the total, ready for them to be replaced or deleted. It starts a
+    ##  transaction (if there isn't one already), which the caller commits
+    ##  once that's done, so that another process can't get in between.
+    def release(self, keys):
+        db = self.connect()
+        for i in xrange(0, len(keys), _CHUNK):
+            chunk = keys[i:i+_CHUNK]
+            marks = ",".join("?" * len(chunk))
+            db.execute("UPDATE cacheSize SET bytes = bytes - (SELECT "
+                       "COALESCE(SUM(size), 0) FROM paths WHERE key IN (%s))"
+                       % marks, chunk)
+
+    ## size() returns the total size of the points in the cache, in bytes.
+    def size(self):
+        db = self.connect()
+        return db.execute("SELECT bytes FROM cacheSize").fetchone()[0]
+
+    ## evict() throws away the least recently used paths until the total size
+    ##  is within the limit.
+    def evict(self):
+        excess = self.size() - self.maxBytes
+        if excess <= 0:
+            return
+        db = self.connect()
+        doomed = []
+        for key, size in db.execute("SELECT key, size FROM paths "
+                                    "ORDER BY used"):
+            doomed.append(key)
+            excess -= size
+            if excess <= 0:
+                break
+        self.release(doomed)
+        db.executemany("DELETE FROM paths WHERE key=?",
+                       [(key,) for key in doomed])
+        db.commit()
+
+## MemoryCache keeps flattened paths in memory instead, for watch mode (see
+##  WatchConvert.py), where the same drawing is converted over and over with
+##  only a few paths changing in between. Anything it hasn't got is looked for
+##  in 'backing', an ordinary PathCache, if there is one. sweep() forgets every
+##  path that hasn't been used since the last sweep, so only the paths of the
+##  latest version of the drawing are kept.
+class MemoryCache(PathCache):
+    ## constructor
+    def __init__(self, backing=None):
+        self.backing = backing
+        self.paths = {}
+        self.used = set()
+
+    def close(self):
+        if self.backing is not None:
+            self.backing.close()
+
+    def get(self, keys):
+        found = {}
+        missing = []
+        for key in keys:
+            if key in self.paths:
+                found[key] = self.paths[key]
+            else:
+                missing.append(key)
+        if missing and self.backing is not None:
+            fetched = self.backing.get(missing)
+            self.paths.update(fetched)
+            found.update(fetched)
+        self.used.update(found)
+        return found
+
+    def put(self, items):
+        for key, points in items:
+            self.paths[key] = points
+            self.used.add(key)
+        if self.backing is not None:
+            self.backing.put(items)
+
+    def evict(self):
+        pass
+
+    def sweep(self):
+        for key in self.paths.keys():
+            if key not in self.used:
+                del self.paths[key]
+        self.used = set()
@@ -0,0 +1,91 @@
+import sys, time, json
+
+## ConversionStats collects figures about one conversion: what was in the SVG
+##  (paths per layer, path commands by type), what flattening made of it
+##  (curves, Bezier segments and points), how many points were thrown away on
+##  the way out (by simplifying, arc fitting and the filter that drops points
+##  that round to the same 0.01mm as the one before) and how long each stage
+##  took. It's what --stats writes out, and it's meant to explain why a
+##  conversion is slow or a script is huge.
+##
+##  The conversion code only ever touches a ConversionStats when it's been
+##  given one, and then only once per stage or per path, never per point, so
+##  there's no cost at all when --stats isn't used.
+class ConversionStats:
+    ## constructor
+    def __init__(self):
+        self.counts = {}     ## Name to number, or to a dictionary of numbers
+                             ##  for counts broken down by layer, command etc.
+        self.seconds = {}    ## Stage name to time spent in it.
+        self.started = None  ## When the conversion started, and when the
+        self.last = None     ##  last stage finished.
+
+    ## add() adds 'n' to a count, or to one entry of a broken down count if
+    ##  'key' is given.
+    def add(self, name, n=1, key=None):
+        if key is None:
+            self.counts[name] = self.counts.get(name, 0) + n
+        else:
+            group = self.counts.setdefault(name, {})
+            key = str(key)
+            group[key] = group.get(key, 0) + n
+
+    ## start() marks the start of the conversion, and lap() the end of a stage:
+    ##  the time since the last call to either goes to that stage.
+    def start(self):
+        self.started = self.last = time.time()
+
+    def lap(self, stage):
+        now = time.time()
+        if self.last is None:
+            self.started = self.last = now
+        self.seconds[stage] = self.seconds.get(stage, 0) + now - self.last
+        self.last = now
+
+    ## merge() adds in the counts and stage times of another report, such as
+    ##  one made by a worker process for part of this conversion. Times spent
+    ##  in worker processes are added up, so with several workers the stages
+    ##  can add up to more than the total.
+    def merge(self, report):
+        report = dict(report)
+        seconds = dict(report.pop("seconds", {}))
+        seconds.pop("total", None)
+        _merge(self.counts, report)
+        _merge(self.seconds, seconds)
+
+    ## report() returns everything collected, as a dictionary ready to be
+    ##  written out as JSON.
+    def report(self):
+        report = dict(self.counts)
+        report["seconds"] = dict(self.seconds)
+        if self.started is not None:
+            report["seconds"]["total"] = self.last - self.started
+        return report
+
+## mergeReports() adds up a list of reports into one, for the totals of a
+##  batch.
+def mergeReports(reports):
+    total = {}
+    for report in reports:
+        _merge(total, report)
+    return total
+
+def _merge(total, report):
+    for name, value in report.iteritems():
+        if isinstance(value, dict):
+            _merge(total.setdefault(name, {}), value)
+        else:
+            total[name] = total.get(name, 0) + value
+
+## writeReports() writes the reports for a set of files, plus their totals, as
+##  JSON to 'destination': a filename, or "-" for stderr. 'reports' maps each
+##  SVG's name to its report.
+def writeReports(reports, destination):
+    text = json.dumps({"files": reports,
+                       "total": mergeReports(reports.values())},
+                      indent=2, sort_keys=True) + "\n"
+    if destination == "-":
+        sys.stderr.write(text)
+    else:
+        with open(destination, 'w') as f:
+            f.write(text)
@@ -1,5 +1,21 @@
-## this class represents the massaged data ready to be sent to EAGLE. 
-class EAGLEPath:
+from array import array
+from itertools import izip
+from decimal import Decimal, ROUND_HALF_EVEN
+import math
+
+## NumPy is optional; without it quantize() works one value at a time.
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+## this class represents the massaged data ready to be sent to EAGLE. The points
+##  are kept in a single flat array of doubles, X then Y for each point, rather
+##  than as a list of little lists; use the methods below rather than poking at
+##  it directly where possible.
+class EAGLEPath(object):
+    __slots__ = ("pathType", "pathWeight", "pathLayer", "path", "bends")
+
     ## constructor- called whenever a copy of EAGLEPath is created.
     def __init__(self):
         self.pathType = []   ## "POLYGON" or "WIRE".
@@ -14,8 +30,179 @@ class EAGLEPath:
                              ##  silk). This data is encoded by the red value of
                              ##  the stroke- by default it will be set to 20, if
                              ##  the red value of the stroke is 0.
-        self.path = []       ## This is a list containing the actual points for
-                             ##  the lines that will be drawn in EAGLE. All
+        self.path = array('d')  ## This is an array containing the actual points
+                             ##  for the lines that will be drawn in EAGLE. All
                              ##  offsets will be applied before data goes in
                              ##  here- this is absolute coordinate data and each
-                             ##  item in this list is one X Y pair.
+                             ##  pair of items in this array is one X Y pair.
+        self.bends = None    ## Only used when drawing arcs (see arcs.py):
+                             ##  an array with the curve, in degrees
+                             ##  anticlockwise, of the segment that ends at
+                             ##  each point, 0 for a straight one. None means
+                             ##  every segment is straight.
+
+    ## append() adds one point to the end of the path.
+    def append(self, x, y):
+        self.path.append(x)
+        self.path.append(y)
+
+    ## point() returns point number 'i' as an (x, y) tuple. Negative numbers
+    ##  count back from the end, as with lists.
+    def point(self, i):
+        if i < 0:
+            i += len(self)
+        return (self.path[2*i], self.path[2*i+1])
+
+    ## points() iterates over the path's points as (x, y) tuples.
+    def points(self):
+        it = iter(self.path)
+        return izip(it, it)
+
+    ## The number of points in the path.
+    def __len__(self):
+        return len(self.path) // 2
+
+    ## translated() returns a copy of the path moved dx, dy mm.
+    def translated(self, dx, dy):
+        copy = EAGLEPath()
+        copy.pathType = self.pathType
+        copy.pathWeight = self.pathWeight
+        copy.pathLayer = self.pathLayer
+        if self.bends is not None:
+            copy.bends = array('d', self.bends)
+        if numpy is not None and self.path:
+            moved = numpy.frombuffer(self.path).reshape(-1, 2) + (dx, dy)
+            copy.path.fromstring(moved.tostring())
+        else:
+            it = iter(self.path)
+            for x, y in izip(it, it):
+                copy.path.append(x + dx)
+                copy.path.append(y + dy)
+        return copy
+
+    ## reversed() returns a copy of the path drawn the other way round, from
+    ##  its last point to its first. Each curved segment keeps its bend, but
+    ##  as it now goes round the other way, the bend changes sign, and it
+    ##  moves to the other end of the segment.
+    def reversed(self):
+        copy = EAGLEPath()
+        copy.pathType = self.pathType
+        copy.pathWeight = self.pathWeight
+        copy.pathLayer = self.pathLayer
+        copy.path = array('d', self.path)
+        copy.path[0::2] = self.path[-2::-2]
+        copy.path[1::2] = self.path[::-2]
+        if self.bends is not None:
+            copy.bends = array('d', [0.0])
+            copy.bends.extend(-bend for bend in self.bends[:0:-1])
+        return copy
+
+## Writing the script. Coordinates in an EAGLE script are written to 0.01mm,
+##  and a point is left out when it would come out the same as the one before
+##  it. Rather than format every coordinate as text and compare strings, each
+##  coordinate is quantized once into an integer number of hundredths of a mm
+##  (a "key", see quantize()), duplicates are dropped by comparing keys, and
+##  only the points that survive are turned into text.
+##
+##  Keys have to give exactly the same text as '{:.2f}'.format() would, and
+##  that includes its habit of writing small negative values as "-0.00"
+##  (which isn't the same text as "0.00", so isn't a duplicate of it). A key is
+##  therefore twice the number of hundredths, except for negative zero, which
+##  is 1. keyHundredths() turns a key back into a plain number of hundredths.
+
+NEGATIVE_ZERO = 1
+
+## Multiplying by 100 in floating point can be out by a hair, which only
+##  matters for values that land within a hair of half a hundredth. Those are
+##  rounded exactly instead (see _exactKey()).
+_HALF_BAND = 1e-7
+
+## quantize() returns the list of keys for an array of coordinates.
+def quantize(values):
+    if numpy is not None and len(values):
+        x = numpy.frombuffer(values)
+        v = x * 100.0
+        low = numpy.floor(v)
+        q = numpy.floor(v + 0.5)
+        keys = 2 * q.astype(numpy.int64)
+        keys[(q == 0) & numpy.signbit(x)] = NEGATIVE_ZERO
+        keys = keys.tolist()
+        for i in numpy.flatnonzero(abs(v - low - 0.5) < _HALF_BAND).tolist():
+            keys[i] = _exactKey(values[i])
+        return keys
+    keys = []
+    for x in values:
+        v = x * 100.0
+        low = math.floor(v)
+        if abs(v - low - 0.5) < _HALF_BAND:
+            keys.append(_exactKey(x))
+            continue
+        q = int(math.floor(v + 0.5))
+        if q == 0 and math.copysign(1.0, x) < 0:
+            keys.append(NEGATIVE_ZERO)
+        else:
+            keys.append(2 * q)
+    return keys
+
+## _exactKey() rounds the exact binary value of x to hundredths, half to even,
+##  which is what '{:.2f}'.format() does.
+def _exactKey(x):
+    q = int((Decimal(x) * 100).to_integral_value(ROUND_HALF_EVEN))
+    if q == 0 and math.copysign(1.0, x) < 0:
+        return NEGATIVE_ZERO
+    return 2 * q
+
+def keyHundredths(key):
+    return key >> 1
+
+## keyValues() turns a list of keys back into coordinates that print exactly
+##  as the originals did under '%.2f' (so -0.00 comes back as -0.0). Points are
+##  formatted from these rather than from the keys themselves, since one '%'
+##  per point is a lot quicker than putting the digits together by hand.
+def keyValues(keys):
+    if numpy is not None and keys:
+        k = numpy.array(keys, dtype=numpy.int64)
+        values = (k >> 1) / 100.0
+        values[k == NEGATIVE_ZERO] = -0.0
+        return values.tolist()
+    return [-0.0 if k == NEGATIVE_ZERO else (k >> 1) / 100.0 for k in keys]
+
+## pathText() returns the script commands that draw one EAGLEPath: the layer,
+##  the command and its width, then each point that differs from the one
+##  before it, and finally (for polygons, which may not otherwise close) the
+##  first point again. A point at the end of a curved segment has the curve
+##  written in front of it, which is how EAGLE takes it. If 'stats' (see
+##  SCRStats.py) is given, the points written and dropped are counted in it.
+##  Without 'header', the layer and width are left out, for a path drawn
+##  with whatever layer and width were last set (see ordering.py).
+def pathText(eaglePath, stats=None, header=True):
+    keys = quantize(eaglePath.path)
+    values = keyValues(keys)
+    bends = eaglePath.bends
+    if header:
+        text = ["LAYER ", '{}'.format(eaglePath.pathLayer), ";\n",
+                eaglePath.pathType, ' {:.3f}'.format(eaglePath.pathWeight),
+                "\n"]
+    else:
+        text = [eaglePath.pathType, "\n"]
+    head = len(text)
+    lastX = lastY = None
+    for i in xrange(0, len(keys), 2):
+        x = keys[i]
+        y = keys[i+1]
+        if x != lastX or y != lastY:
+            if bends is not None and abs(bends[i >> 1]) >= 0.005:
+                text.append("%+.2f (%.2f %.2f)\n"
+                            % (bends[i >> 1], values[i], values[i+1]))
+            else:
+                text.append("(%.2f %.2f)\n" % (values[i], values[i+1]))
+            lastX = x
+            lastY = y
+    if stats is not None:
+        written = len(text) - head  ## One line per point after the header.
+        stats.add("pointsWritten", written)
+        stats.add("duplicatePointsDropped", len(keys) // 2 - written)
+    if eaglePath.pathType == "POLYGON":
+        text.append("(%.2f %.2f)\n" % (values[0], values[1]))
+    text.append(";\n")
+    return "".join(text)
@@ -1,428 +1,838 @@
-from SVGPath import SVGPath
-from SvgParser import SvgParser
-from beziers import cubicBezier, quadBezier
-from SCRSupport import EAGLEPath
-from SVGConstants import *
-import os, sys, re, math
-
-## Filename specification section. Can be an absolute path, a relative path, or
-##  by using sys.argv[1], can be a file which is dropped onto the script.
-filename = sys.argv[1]
-##filename = "test25.svg"
-f = open(filename, 'r')   ## Open the file in question.
-svg_data = f.read()       ## Read the data into a holding structure.
-f.close()                 ## Be a good resident of the OS and close the file.
-parser = SvgParser()      ## Instantiate an object of the SvgParser class.
-parser.feed(svg_data)     ## Run the data we collected from the file through
-                          ##  the SvgParser we just created.
-
-## Uncomment this during debugging to display the results of the parsing. Note
-##  that a good file will produce a ridiculously large amount of data, since
-##  the curves must be kept short to make modeling them as straight segments
-##  aesthetically pleasing!
-
-##print "Offset:", parser.xOffset, parser.yOffset
-##for i in parser.pathData:
-##    i.display()
-
-## Okay, now we have a list of SVGPath objects, each of which contains the
-##  information necessary to describe one path from the drawing, plus a couple
-##  of sundry data points needed to properly describe the location of those
-##  paths in an absolute coordinate system in EAGLE. We now have to interpret
-##  that list from curves to endpoints of straight lines, and that's a bit of
-##  more work.
-
-pathList = []  ## This will become a list of items of type EAGLEPath, which is
-               ##  effectively a list of points ready to get written to an SCR
-               ##  file with minimum fuss.
-
-## Here's our iteration across all the paths we picked out of the SVG file.
-##  parser.pathData is a list of SVGPath objects; see the SVGPath file for deets
-##  on that object.
-for shape in parser.pathData:
-    pathList.append(EAGLEPath())  ## Create a new EAGLEPath for this shape
-
-    ## In a well-stuctured SVG (that is, one where all the objects are in one
-    ##  group), there are two offsets: the total group offset and the offset of
-    ##  each individual shape. We want to create a single offset for our start
-    ##  point in the SCR file.
-    xOffset = shape.xOffset + parser.xOffset
-    yOffset = shape.yOffset + parser.yOffset
-    ## We need to convert information from the SVGPath object to the
-    ##  corresponding field in the EAGLEPath object that we just appended to the
-    ##  pathList object.
-    pathList[-1].pathType=shape.pathType
-    pathList[-1].pathWeight = shape.pathWeight
-    pathList[-1].pathLayer = shape.pathLayer
-
-    ## This while loop looks awkward but there's a reason: we aren't going to
-    ##  look at every item in the list, and sometimes we'll want to skip forward
-    ##  by more items than others. Doing it this way lets us do that easily. Also,
-    ##  if you *really* want to grok this, you'll need to read up on how SVG paths
-    ##  are defined.
-    i = -1
-    while i < (len(shape.path)-1):
-        i = i+1
-        ## First let's parse out any actual commands. These only get sent ONCE
-        ##  and then subsequent elements are treated as continuations of the last
-        ##  command, so we need a way to track what the last command WAS. We'll
-        ##  deal with non-command strings after we've handled the command cases.
-
-        ## The model for this is simple: discover and set a mode, then grab the
-        ##  data for the current mode, adjust it for offsets, create a
-        ##  coordinate pair for the current EAGLE path and append it to the
-        ##  list. Then, we jump to the next unknown parameter and go back to the
-        ##  beginning of the while loop.
-        if (shape.path[i] == 'm'):
-            if i == 0:          ## When a relative MOVETO is first command in a
-                mode = MOVEABS  ##  path, treat it as absolute, although any
-                                ##  following parameters should be treated as
-                                ##  relative LINETO parameters.
-            else:
-                mode = MOVE
-            continue
-        if (shape.path[i] == 'M'):
-            mode = REALMOVEABS
-            continue
-        if (shape.path[i] == 'l'):
-            mode = LINE
-            continue
-        if (shape.path[i] == 'L'):
-            mode = LINEABS
-            continue
-        if (shape.path[i] == 'h'):
-            mode = LINEH
-            continue
-        if (shape.path[i] == 'H'):
-            mode = LINEHABS
-            continue
-        if (shape.path[i] == 'v'):
-            mode = LINEV
-            continue
-        if (shape.path[i] == 'V'):
-            mode = LINEVABS
-            continue
-        if (shape.path[i] == 'c'):
-            mode = CURVE
-            continue
-        if (shape.path[i] == 'C'):
-            mode = CURVEABS
-            continue
-        if (shape.path[i] == 's'):
-            mode = SMOOTH
-            continue
-        if (shape.path[i] == 'S'):
-            mode = SMOOTHABS
-            continue
-        if (shape.path[i] == 'q'):
-            mode = QUADRATIC
-            continue
-        if (shape.path[i] == 'Q'):
-            mode = QUADRATICABS
-            continue
-        if (shape.path[i] == 't'):
-            mode = SMOOTHQUAD
-            continue
-        if (shape.path[i] == 'T'):
-            mode = SMOOTHQUADABS
-            continue
-        if (shape.path[i] == 'a'):
-            mode = ARC
-            continue
-        if (shape.path[i] == 'A'):
-            mode = ARCABS
-            continue
-        if (shape.path[i] == 'z'):
-            pathList[-1].path.append(pathList[-1].path[0])
-            break
-        if (shape.path[i] == 'Z'):
-            pathList[-1].path.append(pathList[-1].path[0])
-            break
-        ## Okay, now let's deal with cases where we DON'T have a command, based on
-        ##  what the most recent command seen was. Basically, we want to grab
-        ##  x and y data, convert it to a float, adjust it for offset, convert
-        ##  to mm, convert it into a two-element list and append that list to
-        ##  the path[] element of the most recent entry in pathList[].
-        if (mode == MOVE):
-            cpx = (float(shape.path[i])/3.54) + cpx
-            i = i+1
-            cpy = (float(shape.path[i])/-3.54) + cpy
-            pathList[-1].path.append([cpx,cpy])
-            mode = LINE
-            chqx = cpx
-            chqy = cpy
-            chcx = cpx
-            chcy = cpy
-            continue
-        if (mode == MOVEABS):
-            cpx = (float(shape.path[i]) + xOffset)/3.54
-            i = i+1
-            cpy = (float(shape.path[i]) + yOffset)/-3.54
-            pathList[-1].path.append([cpx,cpy])
-            if (i == 2):
-                mode = LINE
-            else:
-                mode = LINEABS
-            chqx = cpx
-            chqy = cpy
-            chcx = cpx
-            chcy = cpy
-            continue
-        if (mode == REALMOVEABS):
-            cpx = (float(shape.path[i]) + xOffset)/3.54
-            i = i+1
-            cpy = (float(shape.path[i]) + yOffset)/-3.54
-            pathList[-1].path.append([cpx,cpy])
-            if (i == 1):
-                mode = LINE
+from SVGPath import SVGPath, SVGInstance
+from SvgParser import SvgHandler, parsers
+from beziers import BezierBatch
+from SCRSupport import EAGLEPath, pathText
+from ordering import groupPaths
+from stitch import stitchWires
+from union import unionPolygons, overlapWarning
+from clip import VIEWBOX, parseRegion, shapeBounds, overlaps, clipPath
+from PathInterpreter import PathInterpreter
+from simplify import simplifyPath
+from arcs import fitArcs
+from SCRCache import PathCache, DEFAULT_SIZE
+from SCRStats import ConversionStats, writeReports
+from SVGConstants import ARGUMENTS
+from StringIO import StringIO
+from collections import deque
+from itertools import islice
+from array import array
+import os, sys, re, math, gzip, mmap, argparse, multiprocessing
+
+## This module can be run as a script (see main() at the bottom) or imported.
+##  When imported, the simplest entry point is convert(), which takes the SVG
+##  (the name of a file, or an open file) plus any options accepted by
+##  Converter and returns the text of the EAGLE script. convertText() does the
+##  same for an SVG that's already in memory, as a string:
+##
+##      import SVG2SCR
+##      script = SVG2SCR.convert("logo.svg", tolerance=0.02)
+##      script = SVG2SCR.convertText(svgText, tolerance=0.02)
+##
+##  A string is always taken to be one or the other as asked, never guessed
+##  at from what's in it.
+##
+##  To convert lots of files with the same options, make one Converter and
+##  reuse it. Nothing is shared between calls; every conversion gets its own
+##  parser and curve batch.
+##
+##  Every stage also takes an optional ConversionStats (see SCRStats.py), which
+##  is filled in with counts and timings as the conversion goes:
+##
+##      stats = ConversionStats()
+##      script = SVG2SCR.Converter().convert("logo.svg", stats)
+##      print stats.report()
+
+## The SVG is read and handed to the parser a piece at a time (see
+##  readChunks()), so its text never has to be in memory all at once; this is
+##  the size of each piece, in bytes.
+CHUNK_SIZE = 1024 * 1024
+
+## How many paths convertFile() flattens and writes out at a time. Only that
+##  many flattened paths are ever in memory at once.
+STREAM_PATHS = 1000
+
+## With pathJobs set (see Converter.flattenChunks()), how many chunks of paths
+##  beyond the one being written out are handed to the workers ahead of time,
+##  and the fewest paths worth sending a worker in one go.
+PATH_CHUNKS_AHEAD = 2
+MIN_PATH_SHARE = 50
+
+## The first two bytes of a gzip file, which is what an .svgz file is.
+GZIP_MAGIC = "\x1f\x8b"
+
+## The byte order mark some editors put at the start of a UTF-8 file.
+UTF8_BOM = "\xef\xbb\xbf"
+
+## Converter holds the options for a conversion and runs the three stages of it:
+##  parsing the SVG into SVGPath objects, interpreting those into flattened
+##  EAGLEPath objects, and writing the EAGLEPath objects out as a script.
+class Converter:
+    ## constructor
+    def __init__(self, tolerance=None, parser="expat", simplify=None,
+                 cache=None, cacheSize=DEFAULT_SIZE, arcs=None,
+                 pathJobs=None, group=False, stitch=False, union=False,
+                 region=None, clip=False):
+        self.tolerance = tolerance  ## Maximum chord deviation in mm for curve
+                                    ##  flattening, or None to use about one
+                                    ##  segment per mm (see beziers.py).
+        self.simplify = simplify    ## Tolerance in mm for thinning out
+                                    ##  near-collinear points after
+                                    ##  flattening, or None to keep them all
+                                    ##  (see simplify.py).
+        self.parser = parsers[parser]  ## The class used to scan the SVG;
+                                       ##  "expat" (fast, needs well-formed
+                                       ##  XML) or "html" (the HTMLParser-based
+                                       ##  original). See SvgParser.py.
+        self.arcs = arcs            ## Tolerance in mm for fitting circular
+                                    ##  arcs to flattened curves, or None to
+                                    ##  draw straight segments only. When set,
+                                    ##  circular SVG arcs are drawn as arcs
+                                    ##  too (see arcs.py).
+        self.pathJobs = pathJobs    ## Number of worker processes to flatten
+                                    ##  each document's paths on, or None
+                                    ##  (or 1) to flatten them right here.
+                                    ##  See iterFlatten().
+        self.group = group          ## Whether to write the paths grouped by
+                                    ##  layer and width, each group in
+                                    ##  spatial order, rather than in
+                                    ##  document order (see ordering.py).
+        self.stitch = stitch        ## Whether to join WIREs that meet end
+                                    ##  to end into single WIREs (see
+                                    ##  stitch.py).
+        self.union = union          ## Whether to merge POLYGONs on the
+                                    ##  same layer that touch or overlap
+                                    ##  (see union.py).
+        if isinstance(region, basestring):
+            region = parseRegion(region)
+        if clip and region is None:
+            region = VIEWBOX
+        self.region = region        ## The box (left, bottom, right, top),
+                                    ##  in mm, to convert only the paths
+                                    ##  inside of, VIEWBOX for the drawing's
+                                    ##  own frame, or None for everything.
+                                    ##  See clip.py.
+        self.clip = clip            ## Whether to cut paths that cross the
+                                    ##  edge of the region off at it, rather
+                                    ##  than keep them whole.
+        self.cache = None   ## A PathCache holding flattened paths from
+        if cache:           ##  earlier runs, if we've been given the name of
+                            ##  a cache file. See SCRCache.py.
+            self.cache = PathCache(cache, cacheSize)
+
+    ## parse() runs the SVG through a fresh parser and returns the parser,
+    ##  whose pathData holds the SVGPath objects found in the file.
+    def parse(self, source, stats=None):
+        if stats is not None and stats.last is None:
+            stats.start()
+        parser = self.parser()    ## Instantiate a parser object and run the
+        for chunk in readChunks(source):  ##  data through it.
+            parser.feed(chunk)
+        parser.close()
+        if stats is not None:
+            stats.lap("parse")
+        return parser
+
+    ## flatten() returns the list of EAGLEPath objects for an SVG. 'source'
+    ##  may be anything parse() accepts, or a parser that has already been fed.
+    def flatten(self, source, stats=None, clip=True):
+        return list(self.iterFlatten(source, stats, clip=clip))
+
+    ## iterFlatten() does the same job a piece at a time: it yields the
+    ##  EAGLEPath objects one by one, in document order. The SVG is read a
+    ##  piece at a time too, and each path is passed on as soon as its tag
+    ##  has been read: 'chunkSize' paths are flattened at a go, and handed on
+    ##  before any more of the SVG is read than it takes to find the next lot
+    ##  (see streamPaths()). That holds for everything except a <use> of
+    ##  something that comes later in the document (or of a group the <use>
+    ##  is inside of): nothing after such a <use> can be passed on until the
+    ##  rest of the document has been read, so a forward reference near the
+    ##  start of a file means all of it is held in memory (see
+    ##  SvgHandler.ready() in SvgParser.py). Paths are cut off at the edge of
+    ##  the region if the converter is set to clip them, unless 'clip' is
+    ##  False, in which case there's exactly one EAGLEPath for each drawn path
+    ##  (see drawnPaths()).
+    def iterFlatten(self, source, stats=None, chunkSize=STREAM_PATHS,
+                    clip=True):
+        if isinstance(source, SvgHandler):
+            parser = source
+            drawn = self.drawnPaths(parser, stats)
+        else:
+            parser = self.parser()
+            drawn = self.streamPaths(parser, source, stats)
+        return self.flattenDrawn(drawn, parser, stats, chunkSize, clip)
+
+    ## streamPaths() runs the SVG through 'parser' a piece at a time, and
+    ##  yields what each piece draws (see drawnPaths()) before reading the
+    ##  next.
+    def streamPaths(self, parser, source, stats=None):
+        if stats is not None and stats.last is None:
+            stats.start()
+        for chunk in readChunks(source):
+            parser.feed(chunk)
+            if stats is not None:
+                stats.lap("parse")
+            for record in self.drawnPaths(parser, stats):
+                yield record
+        parser.close()
+        if stats is not None:
+            stats.lap("parse")
+        for record in self.drawnPaths(parser, stats):
+            yield record
+
+    ## flattenDrawn() flattens the records from drawnPaths() (or
+    ##  streamPaths()) and yields the EAGLEPath objects for them, in the same
+    ##  order, 'chunkSize' at a go. 'parser' is the parser they came from.
+    def flattenDrawn(self, drawn, parser, stats=None, chunkSize=STREAM_PATHS,
+                     clip=True):
+
+        ## Uncomment this during debugging to display the results of the
+        ##  parsing. Note that a good file will produce a ridiculously large
+        ##  amount of data, since the curves must be kept short to make
+        ##  modeling them as straight segments aesthetically pleasing!
+
+        ##for shape, dx, dy, shared in drawn:
+        ##    shape.display()
+
+        ## A path that's drawn more than once is only flattened once; the
+        ##  other copies are made by moving its points. Only a path drawn by a
+        ##  <use> is likely to be drawn again, so those are the ones whose
+        ##  points are kept (in 'flattened') once their chunk has been placed;
+        ##  the points of every other path are let go of there and then. (If
+        ##  a <use> further on draws one of those after all, it's flattened
+        ##  again, or found in the cache.) chunkShapes() works out which paths
+        ##  need flattening for each chunk by the same rule.
+        flattened = {}
+        placed = set()
+        kept = set()
+        region = None
+        for chunk, shapes, paths in self.flattenChunks(
+                self.chunkShapes(drawn, chunkSize), stats):
+            if region is None and self.clip and clip:
+                region = self.regionOf(parser)
+            for shape, path in zip(shapes, paths):
+                flattened[shape] = path
+                placed.discard(shape)
+
+            pathList = []
+            for shape, dx, dy, shared in chunk:
+                path = flattened[shape]
+                if dx or dy or shape in placed:
+                    path = path.translated(dx, dy)
+                placed.add(shape)
+                if shared:
+                    kept.add(shape)
+                if region is not None:
+                    pieces = clipPath(path, region)
+                    if stats is not None and pieces != [path]:
+                        stats.add("pathsClipped")
+                    pathList.extend(pieces)
+                else:
+                    pathList.append(path)
+            for shape, dx, dy, shared in chunk:
+                if shape not in kept and shape in flattened:
+                    del flattened[shape]
+                    placed.discard(shape)
+            if stats is not None:
+                for path in pathList:
+                    stats.add("paths")
+                    stats.add("pathsPerLayer", key=path.pathLayer)
+                    stats.add("pathTypes", key=path.pathType)
+                stats.add("copies", len(chunk) - len(shapes))
+                stats.lap("place")
+            for path in pathList:
+                yield path
+
+    ## drawnPaths() works out what's drawn by the items in a parser's pathData
+    ##  (and takes them out of it): every path in the document (other than
+    ##  those tucked away in <defs> or <symbol>), plus whatever each <use> tag
+    ##  refers to, less any that are entirely outside the region if there is
+    ##  one. It returns a list of (SVGPath, dx, dy, shared) records, where dx
+    ##  and dy are the extra offset, in mm, each one is drawn at, and 'shared'
+    ##  says whether it was drawn by a <use>.
+    def drawnPaths(self, parser, stats=None):
+        drawn = []
+        for item in parser.pathData:
+            shared = isinstance(item, SVGInstance)
+            for shape, dx, dy in parser.resolve(item):
+                drawn.append((shape, dx, dy, shared))
+        del parser.pathData[:]
+        if drawn and self.region is not None:
+            drawn = self.cull(drawn, self.regionOf(parser), stats)
+        return drawn
+
+    ## regionOf() returns the region (see clip.py) as a box in mm for a
+    ##  parsed document, or None if the whole drawing is wanted.
+    def regionOf(self, parser):
+        if self.region != VIEWBOX:
+            return self.region
+        frame = parser.frame()
+        if frame is None:
+            raise ValueError("the SVG has no viewBox, width or height to "
+                             "take the region from")
+        return frame
+
+    ## cull() returns the records from 'drawn' (see drawnPaths()) that are at
+    ##  least partly inside 'region', going by the box each path is drawn in
+    ##  (widened by half its line width). The box of a path that's drawn more
+    ##  than once is only worked out once.
+    def cull(self, drawn, region, stats=None):
+        boxes = {}
+        kept = []
+        for record in drawn:
+            shape, dx, dy, shared = record
+            if shape not in boxes:
+                boxes[shape] = shapeBounds(shape, self.arcs is not None)
+            box = boxes[shape]
+            if box is None:
+                continue
+            pad = shape.pathWeight / 2
+            if overlaps((box[0] + dx - pad, box[1] + dy - pad,
+                         box[2] + dx + pad, box[3] + dy + pad), region):
+                kept.append(record)
+        if stats is not None:
+            stats.add("pathsCulled", len(drawn) - len(kept))
+            stats.lap("cull")
+        return kept
+
+    ## cacheKey() returns the key an SVGPath is cached under (see SCRCache.py):
+    ##  it covers the path itself, its transform and every option that changes
+    ##  how it's flattened.
+    def cacheKey(self, shape):
+        return self.cache.key(shape, (self.tolerance, self.simplify, self.arcs))
+
+    ## chunkShapes() splits the drawn paths (a list or an iterator of records
+    ##  from drawnPaths()) into chunks of 'chunkSize' and yields a (chunk,
+    ##  shapes) pair for each, where 'shapes' are the SVGPath objects in that
+    ##  chunk that have to be flattened before it can be placed: all of them,
+    ##  less those that have been drawn by a <use> in an earlier chunk, whose
+    ##  points flattenDrawn() keeps.
+    def chunkShapes(self, drawn, chunkSize):
+        drawn = iter(drawn)
+        kept = set()
+        while True:
+            chunk = list(islice(drawn, chunkSize))
+            if not chunk:
+                return
+            seen = set()
+            shapes = []
+            for shape, dx, dy, shared in chunk:
+                if shape not in seen and shape not in kept:
+                    seen.add(shape)
+                    shapes.append(shape)
+            kept.update(shape for shape, dx, dy, shared in chunk if shared)
+            yield chunk, shapes
+
+    ## flattenChunks() flattens the shapes of each (chunk, shapes) pair from
+    ##  chunkShapes() and yields (chunk, shapes, paths) triples, in the same
+    ##  order, where 'paths' are the flattened EAGLEPath objects. With
+    ##  pathJobs set, the flattening is shared out among a pool of worker
+    ##  processes: each chunk's shapes are split between the workers, and a
+    ##  few chunks are kept in hand so that the workers have something to get
+    ##  on with while the paths of the first are being placed and written.
+    ##  Whatever order the workers finish in, the paths come out in the order
+    ##  they're in the document, so the script is the same either way.
+    def flattenChunks(self, chunks, stats=None):
+        if (not self.pathJobs or self.pathJobs < 2
+                or multiprocessing.current_process().daemon):
+            ## Without worker processes (or inside one: a pool's workers
+            ##  aren't allowed pools of their own) it's all done here.
+            for chunk, shapes in chunks:
+                yield chunk, shapes, self.flattenShapes(shapes, stats)
+            return
+
+        pool = multiprocessing.Pool(self.pathJobs, _startPathWorker,
+                                    (self.tolerance, self.simplify, self.arcs))
+        try:
+            pending = deque()
+            for item in chunks:
+                pending.append(self.submitShapes(pool, item, stats))
+                if len(pending) > PATH_CHUNKS_AHEAD:
+                    yield self.collectShapes(pending.popleft(), stats)
+            while pending:
+                yield self.collectShapes(pending.popleft(), stats)
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+
+    ## submitShapes() looks up a chunk's shapes in the cache and hands the
+    ##  ones that aren't there to the pool's workers, a share each. It
+    ##  returns what collectShapes() needs to put the chunk's paths together
+    ##  once the workers are done.
+    def submitShapes(self, pool, item, stats=None):
+        chunk, shapes = item
+        keys, found = self.lookup(shapes, stats)
+        fresh = [shape for shape, key in zip(shapes, keys)
+                 if key not in found]
+        share = max(MIN_PATH_SHARE, -(-len(fresh) // self.pathJobs))
+        results = [pool.apply_async(_flattenShare,
+                                    (fresh[i:i + share], stats is not None))
+                   for i in xrange(0, len(fresh), share)]
+        return chunk, shapes, keys, found, fresh, results
+
+    ## collectShapes() waits for the workers to finish a chunk submitted by
+    ##  submitShapes() and returns its (chunk, shapes, paths) triple.
+    def collectShapes(self, submitted, stats=None):
+        chunk, shapes, keys, found, fresh, results = submitted
+        paths = []
+        for result in results:
+            counts, values, report = result.get()
+            counts = array('l', counts)
+            values = array('d', values)
+            start = 0
+            for count in counts:
+                paths.append(values[start:start + count])
+                start += count
+            if report is not None:
+                stats.merge(report)
+        paths = [self.unpackPath(shape, points)
+                 for shape, points in zip(fresh, paths)]
+        if stats is not None:
+            stats.lap("flatten")
+        return chunk, shapes, self.assemble(shapes, keys, found, paths, stats)
+
+    ## flattenShapes() returns a flattened EAGLEPath for each SVGPath in
+    ##  'shapes', in the same order.
+    def flattenShapes(self, shapes, stats=None):
+        keys, found = self.lookup(shapes, stats)
+        fresh = self.flattenFresh([shape for shape, key in zip(shapes, keys)
+                                   if key not in found], stats)
+        return self.assemble(shapes, keys, found, fresh, stats)
+
+    ## lookup() returns the cache key of each SVGPath in 'shapes' (all None
+    ##  without a cache) and a dictionary of the points found in the cache for
+    ##  them, by key.
+    def lookup(self, shapes, stats=None):
+        keys = [None] * len(shapes)
+        found = {}
+        if self.cache:
+            keys = [self.cacheKey(shape) for shape in shapes]
+            found = self.cache.get(keys)
+        if stats is not None:
+            countCommands(shapes, stats)
+            stats.add("cacheHits", len(found))
+        return keys, found
+
+    ## unpackPath() makes the EAGLEPath for an SVGPath out of its flattened
+    ##  points, as they're kept in the cache and sent back by the workers:
+    ##  when drawing arcs, each path's bends come straight after its points.
+    def unpackPath(self, shape, points):
+        path = newEAGLEPath(shape)
+        path.path = points
+        if self.arcs is not None:
+            count = len(points) // 3
+            path.bends = points[2*count:]
+            path.path = points[:2*count]
+        return path
+
+    ## assemble() puts together the paths for 'shapes' from the points found
+    ##  in the cache and the 'fresh' paths flattened for the rest, and puts
+    ##  the fresh ones in the cache.
+    def assemble(self, shapes, keys, found, fresh, stats=None):
+        pathList = []
+        store = []
+        fresh = iter(fresh)
+        for shape, key in zip(shapes, keys):
+            if key in found:
+                path = self.unpackPath(shape, found[key])
             else:
-                mode = LINEABS
-            chqx = cpx
-            chqy = cpy
-            chcx = cpx
-            chcy = cpy
-            continue
-        if (mode == LINE):
-            cpx = (float(shape.path[i])/3.54) + cpx
-            i = i+1
-            cpy = (float(shape.path[i])/-3.54) + cpy
-            pathList[-1].path.append([cpx,cpy])
-            chqx = cpx
-            chqy = cpy
-            chcx = cpx
-            chcy = cpy
-            continue
-        if (mode == LINEABS):
-            cpx = (float(shape.path[i]) + xOffset)/3.54
-            i = i+1
-            cpy = (float(shape.path[i]) + yOffset)/-3.54
-            pathList[-1].path.append([cpx,cpy])
-            chqx = cpx
-            chqy = cpy
-            chcx = cpx
-            chcy = cpy
-            continue
-        if (mode == LINEH):
-            cpx = (float(shape.path[i])/3.54) + cpx
-            pathList[-1].path.append([cpx,cpy])
-            chqx = cpx
-            chqy = cpy
-            chcx = cpx
-            chcy = cpy
-            continue
-        if (mode == LINEHABS):
-            cpx = (float(shape.path[i]) + xOffset)/3.54
-            pathList[-1].path.append([cpx,cpy])
-            chqx = cpx
-            chqy = cpy
-            chcx = cpx
-            chcy = cpy
-            continue
-        if (mode == LINEV):
-            cpy = (float(shape.path[i])/-3.54) + cpy
-            pathList[-1].path.append([cpx,cpy])
-            chqx = cpx
-            chqy = cpy
-            chcx = cpx
-            chcy = cpy
-            continue
-        if (mode == LINEVABS):
-            cpy = (float(shape.path[i]) + yOffset)/-3.54
-            pathList[-1].path.append([cpx,cpy])
-            chqx = cpx
-            chqy = cpy
-            chcx = cpx
-            chcy = cpy
-            continue
-        if (mode == CURVE):
-            h1x = (float(shape.path[i])/3.54)+cpx
-            h1y = (float(shape.path[i+1])/-3.54)+cpy
-            h2x = (float(shape.path[i+2])/3.54)+cpx
-            h2y = (float(shape.path[i+3])/-3.54)+cpy
-            epx = (float(shape.path[i+4])/3.54)+cpx
-            epy = (float(shape.path[i+5])/-3.54)+cpy
-            curve = cubicBezier([cpx,cpy], [h1x,h1y], [h2x, h2y], [epx, epy])
-            i = i + 5
-            cpx = epx
-            cpy = epy
-            chqx = cpx
-            chqy = cpy
-            chcx = (2*cpx) - h2x
-            chcy = (2*cpy) - h2y
-            pathList[-1].path.extend(curve.list)
-            continue
-        if (mode == CURVEABS):
-            h1x = (float(shape.path[i]) + xOffset)/3.54
-            h1y = (float(shape.path[i+1]) + yOffset)/-3.54
-            h2x = (float(shape.path[i+2]) + xOffset)/3.54
-            h2y = (float(shape.path[i+3]) + yOffset)/-3.54
-            epx = (float(shape.path[i+4]) + xOffset)/3.54
-            epy = (float(shape.path[i+5]) + yOffset)/-3.54
-            curve = cubicBezier([cpx,cpy], [h1x,h1y], [h2x, h2y], [epx, epy])
-            i = i + 5
-            cpx = epx
-            cpy = epy
-            chqx = cpx
-            chqy = cpy
-            chcx = (2*cpx) - h2x
-            chcy = (2*cpy) - h2y
-            pathList[-1].path.extend(curve.list)
-            continue
-        if (mode == SMOOTH):
-            h1x = chcx
-            h1y = chcy
-            h2x = (float(shape.path[i+2])/3.54)+cpx
-            h2y = (float(shape.path[i+3])/-3.54)+cpy
-            epx = (float(shape.path[i+4])/3.54)+cpx
-            epy = (float(shape.path[i+5])/-3.54)+cpy
-            curve = cubicBezier([cpx,cpy], [h1x,h1y], [h2x, h2y], [epx, epy])
-            i = i + 3
-            cpx = epx
-            cpy = epy
-            chqx = cpx
-            chqy = cpy
-            chcx = (2*cpx) - h2x
-            chcy = (2*cpy) - h2y
-            pathList[-1].path.extend(curve.list)
-            continue
-        if (mode == SMOOTHABS):
-            h1x = chcx
-            h1y = chcy
-            h2x = (float(shape.path[i+2]) + xOffset)/3.54
-            h2y = (float(shape.path[i+3]) + yOffset)/-3.54
-            epx = (float(shape.path[i+4]) + xOffset)/3.54
-            epy = (float(shape.path[i+5]) + yOffset)/-3.54
-            curve = cubicBezier([cpx,cpy], [h1x,h1y], [h2x, h2y], [epx, epy])
-            i = i + 3
-            cpx = epx
-            cpy = epy
-            chqx = cpx
-            chqy = cpy
-            chcx = (2*cpx) - h2x
-            chcy = (2*cpy) - h2y
-            pathList[-1].path.extend(curve.list)
-            continue
-        if (mode == QUADRATIC):
-            h1x = (float(shape.path[i])/3.54)+cpx
-            h1y = (float(shape.path[i+1])/-3.54)+cpy
-            epx = (float(shape.path[i+2])/3.54)+cpx
-            epy = (float(shape.path[i+3])/-3.54)+cpy
-            curve = quadBezier([cpx,cpy], [h1x,h1y], [epx, epy])
-            i = i + 3
-            cpx = epx
-            cpy = epy
-            chqx = (2*cpx) - h1x
-            chqy = (2*cpy) - h1y
-            chcx = cpx
-            chcy = cpy
-            pathList[-1].path.extend(curve.list)
-            continue
-        if (mode == QUADRATICABS):
-            h1x = (float(shape.path[i]) + xOffset)/3.54
-            h1y = (float(shape.path[i+1]) + yOffset)/-3.54
-            epx = (float(shape.path[i+2]) + xOffset)/3.54
-            epy = (float(shape.path[i+3]) + yOffset)/-3.54
-            curve = quadBezier([cpx,cpy], [h1x,h1y], [epx, epy])
-            i = i + 3
-            cpx = epx
-            cpy = epy
-            chqx = (2*cpx) - h1x
-            chqy = (2*cpy) - h1y
-            chcx = cpx
-            chcy = cpy
-            pathList[-1].path.extend(curve.list)
-            continue
-        if (mode == SMOOTHQUAD):
-            h1x = chqx
-            h1y = chqy
-            epx = (float(shape.path[i])/3.54)+cpx
-            epy = (float(shape.path[i+1])/-3.54)+cpy
-            curve = quadBezier([cpx,cpy], [h1x,h1y], [epx, epy])
-            i = i + 1
-            cpx = epx
-            cpy = epy
-            chqx = (2*cpx) - h1x
-            chqy = (2*cpy) - h1y
-            chcx = cpx
-            chcy = cpy
-            pathList[-1].path.extend(curve.list)
-            continue
-        if (mode == SMOOTHQUADABS):
-            h1x = chqx
-            h1y = chqy
-            epx = (float(shape.path[i]) + xOffset)/3.54
-            epy = (float(shape.path[i+1]) + yOffset)/-3.54
-            curve = quadBezier([cpx,cpy], [h1x,h1y], [epx, epy])
-            i = i + 1
-            cpx = epx
-            cpy = epy
-            chqx = (2*cpx) - h1x
-            chqy = (2*cpy) - h1y
-            chcx = cpx
-            chcy = cpy
-            pathList[-1].path.extend(curve.list)
-            continue
-        if (mode == ARC):
-            i = i+5
-            cpx = (float(shape.path[i])/3.54) + cpx
-            i = i+1
-            cpy = (float(shape.path[i])/-3.54) + cpy
-            pathList[-1].path.append([cpx,cpy])
-            chqx = cpx
-            chqy = cpy
-            chcx = cpx
-            chcy = cpy
-            continue
-        if (mode == ARCABS):
-            i = i+5
-            cpx = (float(shape.path[i]) + xOffset)/3.54
-            i = i+1
-            cpy = (float(shape.path[i]) + yOffset)/-3.54
-            pathList[-1].path.append([cpx,cpy])
-            chqx = cpx
-            chqy = cpy
-            chcx = cpx
-            chcy = cpy
-            continue
-
-## By this point, we've parsed every shape we extracted from the SVG file. We can
-##  now create a new EAGLE .scr file and start adding stuff to it.
-scriptName = filename[:-4] + ".scr"
-
-with open(scriptName, 'w') as f:
-    ## Preliminaries. We *always* want to be drawing in mm, and wire bend 2 is the
-    ##  "here-to-there" mode, rather than any default bends.
-    f.write("GRID MM;\n")
-    f.write("SET WIRE_BEND 2;\n")
+                path = next(fresh)
+                if key is not None:
+                    store.append((key, packPoints(path)))
+            pathList.append(path)
+        if self.cache:
+            self.cache.put(store)
+        if stats is not None:
+            stats.lap("finish")
+        return pathList
+
+    ## flattenFresh() interprets and flattens each SVGPath in 'shapes',
+    ##  without going anywhere near the cache, and returns the EAGLEPath
+    ##  objects in the same order.
+    def flattenFresh(self, shapes, stats=None):
+        ## Curves aren't interpolated as we find them; they're collected in
+        ##  the batch and flattened all in one go once every path has been
+        ##  interpreted. Until then, each path just keeps a note of where its
+        ##  curves go.
+        batch = BezierBatch(self.tolerance)
+        interpreted = [interpretPath(shape, batch, self.arcs is not None)
+                       for shape in shapes]
+        if stats is not None:
+            stats.lap("interpret")
+
+        ## Now flatten every curve in the document at once and splice the
+        ##  points of each curve into its path.
+        batch.flatten()
+        if stats is not None:
+            stats.add("cubicCurves", len(batch.cubics))
+            stats.add("quadCurves", len(batch.quads))
+            stats.add("bezierSegments",
+                      sum(len(points) // 2 - 1 for points in batch.lists))
+            stats.lap("bezier")
+        pathList = []
+        for path, curves, arcs in interpreted:
+            path.path = batch.expand(path.path, curves)
+            if stats is not None:
+                stats.add("pointsGenerated", len(path))
+            ## When drawing arcs, every path gets bends, even one whose
+            ##  transform kept the interpreter from finding any arcs of its
+            ##  own (see PathInterpreter.run()): the flattened points are
+            ##  already in EAGLE's coordinates, so arcs can still be fitted to
+            ##  them, and unpackPath() counts on the bends being there.
+            if self.arcs is not None:
+                path.bends = batch.expandBends(len(path), arcs or (), curves)
+                removed = fitArcs(path, self.arcs)
+                if stats is not None:
+                    stats.add("pointsArcFitted", removed)
+            if self.simplify:
+                removed = simplifyPath(path, self.simplify)
+                if stats is not None:
+                    stats.add("pointsSimplified", removed)
+            pathList.append(path)
+        return pathList
+
+    ## render() returns the EAGLE script for a list of EAGLEPath objects as a
+    ##  string.
+    def render(self, pathList, stats=None):
+        f = StringIO()
+        self.write(pathList, f, stats)
+        return f.getvalue()
+
+    ## write() writes the EAGLE script for a list (or iterator) of EAGLEPath
+    ##  objects to the open file 'f', merging POLYGONs and joining up WIREs
+    ##  first if asked to. Like grouping, those need the whole drawing in
+    ##  hand.
+    def write(self, pathList, f, stats=None):
+        if self.union:
+            pathList = unionPolygons(pathList, stats)
+            if stats is not None:
+                stats.lap("union")
+        if self.stitch:
+            pathList = stitchWires(pathList, stats)
+            if stats is not None:
+                stats.lap("stitch")
+        writeScript(pathList, f, stats, self.group)
+
+    ## convert() takes an SVG and returns the text of its EAGLE script.
+    ##  'source' may be anything parse() accepts: the name of a file or an
+    ##  open file.
+    def convert(self, source, stats=None):
+        return self.render(self.flatten(source, stats), stats)
+
+    ## convertText() does the same for the SVG itself, as a string (gzipped
+    ##  or not).
+    def convertText(self, text, stats=None):
+        return self.convert(StringIO(text), stats)
+
+    ## convertFile() converts an SVG (or .svgz) file and writes the script to
+    ##  'scriptName', by default the same name as the SVG with the extension
+    ##  swapped for .scr. It returns the name of the script written. The
+    ##  paths are flattened and written out a chunk at a time (see
+    ##  iterFlatten()), into a temporary file that only takes the script's
+    ##  name once it's complete.
+    def convertFile(self, filename, scriptName=None, stats=None):
+        if scriptName is None:
+            scriptName = os.path.splitext(filename)[0] + ".scr"
+        partName = scriptName + ".part"
+        try:
+            with open(partName, 'w') as f:
+                self.write(self.iterFlatten(filename, stats), f, stats)
+            os.rename(partName, scriptName)
+        finally:
+            if os.path.exists(partName):
+                os.remove(partName)
+        return scriptName
+
+## convert() is a shortcut for Converter(**options).convert(source).
+def convert(source, **options):
+    return Converter(**options).convert(source)
+
+## convertText() is a shortcut for Converter(**options).convertText(text).
+def convertText(text, **options):
+    return Converter(**options).convertText(text)
+
+## readChunks() yields the SVG text, a piece of up to 'size' bytes at a time,
+##  for either of the things a Converter accepts: an open file (or anything
+##  else with a read() method, such as a StringIO holding the SVG itself), or
+##  the name of an SVG file. Anything that's gzipped (an .svgz), going by the
+##  first two bytes rather than the name, is decompressed as it's read; any
+##  other file is memory-mapped, so that the pieces come straight from the
+##  file without it ever being read in whole. A byte order mark at the start
+##  is dropped.
+def readChunks(source, size=CHUNK_SIZE):
+    first = True
+    for chunk in _readRaw(source, size):
+        if first and chunk.startswith(UTF8_BOM):
+            chunk = chunk[len(UTF8_BOM):]
+        first = False
+        yield chunk
+
+def _readRaw(source, size):
+    if hasattr(source, "read"):
+        chunk = source.read(size)
+        if chunk[:2] == GZIP_MAGIC:
+            ## GzipFile needs to be able to seek in what it reads, which a
+            ##  socket or a pipe can't do, so the gzipped data is read in whole
+            ##  (it's the uncompressed SVG that's big).
+            compressed = StringIO(chunk + source.read())
+            for chunk in _readRaw(gzip.GzipFile(fileobj=compressed), size):
+                yield chunk
+            return
+        while chunk:
+            yield chunk
+            chunk = source.read(size)
+        return
+    with open(source, 'rb') as f:
+        if f.read(2) == GZIP_MAGIC:
+            f.seek(0)
+            for chunk in _readRaw(gzip.GzipFile(fileobj=f), size):
+                yield chunk
+            return
+        if not os.fstat(f.fileno()).st_size:
+            return
+        m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            for i in xrange(0, len(m), size):
+                yield m[i:i+size]
+        finally:
+            m.close()
+
+## Okay, once the parser has run we have a list of SVGPath objects, each of
+##  which contains the information necessary to describe one path from the
+##  drawing, plus a couple of sundry data points needed to properly describe the
+##  location of those paths in an absolute coordinate system in EAGLE. We now
+##  have to interpret that list from curves to endpoints of straight lines, and
+##  that's a bit of more work. interpretPath() does that for one SVGPath and
+##  returns the corresponding EAGLEPath, along with the list of (position,
+##  handle) pairs for the curves it added to 'batch' (see BezierBatch.expand()
+##  in beziers.py) and, if 'arcs' is set, the list of (position, curve) pairs
+##  for its circular arcs (None otherwise).
+def interpretPath(shape, batch, arcs=False):
+    eaglePath = newEAGLEPath(shape)  ## Create a new EAGLEPath for this shape
+
+    ## The shape holds the command letters of the path along with all of the
+    ##  numbers that follow them. PathInterpreter works through them and
+    ##  gives us back the points; if you *really* want to grok this, you'll
+    ##  need to read up on how SVG paths are defined. Where the path ends up
+    ##  (the groups it's in, their transforms and its own) was all worked out
+    ##  by the parser and folded into the one matrix, shape.transform.
+    interpreter = PathInterpreter(batch, shape.transform, arcs)
+    eaglePath.path, curves = interpreter.run(shape)
+    return eaglePath, curves, interpreter.arcs
+
+## countCommands() counts the path commands in a list of SVGPath objects by
+##  type. A command letter followed by several groups of arguments counts once
+##  for each group, as that's how many times it's carried out.
+def countCommands(shapes, stats):
+    for shape in shapes:
+        for command, start, end in shape.records():
+            arity = ARGUMENTS[command]
+            stats.add("commands", max(1, (end - start) // arity) if arity
+                      else 1, command)
+
+## packPoints() returns a path's points as they're kept in the cache and sent
+##  back by the workers: a single array of doubles, with the bends after the
+##  points when drawing arcs (every path has them then; see flattenFresh()).
+##  See Converter.unpackPath().
+def packPoints(eaglePath):
+    if eaglePath.bends is not None:
+        return eaglePath.path + eaglePath.bends
+    return eaglePath.path
+
+## The worker side of Converter.flattenChunks(). Each worker process keeps a
+##  Converter with the same options as the one that started it, less the
+##  cache, which stays with the main process.
+_pathConverter = None
+
+def _startPathWorker(tolerance, simplify, arcs):
+    global _pathConverter
+    _pathConverter = Converter(tolerance, simplify=simplify, arcs=arcs)
+
+## _flattenShare() flattens a list of SVGPath objects and sends them back as
+##  compactly as it can: a string
+##  holding an array of the number of values for each path and a string
+##  holding an array of all those values (see packPoints()), one path after
+##  another. The third item is a stats report if 'wantStats' is set, None
+##  otherwise.
+def _flattenShare(shapes, wantStats):
+    stats = None
+    if wantStats:
+        stats = ConversionStats()
+        stats.start()
+    counts = array('l')
+    values = array('d')
+    for path in _pathConverter.flattenFresh(shapes, stats):
+        points = packPoints(path)
+        counts.append(len(points))
+        values.extend(points)
+    if stats is None:
+        return counts.tostring(), values.tostring(), None
+    stats.lap("finish")
+    return counts.tostring(), values.tostring(), stats.report()
+
+## newEAGLEPath() creates an empty EAGLEPath for an SVGPath. We need to convert
+##  information from the SVGPath object to the corresponding field in the
+##  EAGLEPath object.
+def newEAGLEPath(shape):
+    eaglePath = EAGLEPath()
+    eaglePath.pathType=shape.pathType
+    eaglePath.pathWeight = shape.pathWeight
+    eaglePath.pathLayer = shape.pathLayer
+    return eaglePath
+
+## Preliminaries. We *always* want to be drawing in mm, and wire bend 2 is the
+##  "here-to-there" mode, rather than any default bends.
+SCRIPT_HEADER = "GRID MM;\nSET WIRE_BEND 2;\n"
+
+## writeScript() writes the EAGLE script for a list of EAGLEPath objects to the
+##  open file 'f'. With 'group' set, the paths are sorted into groups that
+##  share a layer and width (see ordering.py), and each group sets its layer
+##  and width once, for all of its paths. That needs every path in hand
+##  before the first can be written, so the whole drawing is kept in memory.
+def writeScript(pathList, f, stats=None, group=False):
+    f.write(SCRIPT_HEADER)
+    if group:
+        groups = groupPaths(pathList)
+        if stats is not None:
+            stats.lap("order")
+        layer = None
+        for pathLayer, width, paths in groups:
+            if pathLayer != layer:
+                f.write("LAYER %s;\n" % pathLayer)
+                layer = pathLayer
+            f.write("CHANGE WIDTH %s;\n" % width)
+            for path in paths:
+                f.write(pathText(path, stats, False))
+            if stats is not None:
+                stats.add("groups")
+                stats.lap("emit")
+        return
     ## We now need to iterate over the EAGLE path list, setting layers and weights
-    ##  and then creating points.
+    ##  and then creating points. Each path's commands are put together in one
+    ##  go (see pathText() in SCRSupport.py) and written out in one go.
     for path in pathList:
-        f.write("LAYER ")
-        f.write('{}'.format(path.pathLayer))
-        f.write(";\n")
-        f.write(path.pathType)
-        f.write(' {:.3f}'.format(path.pathWeight))
-        f.write("\n")
-        i = 0
-        lastPoint = []
-        for point in path.path:
-            shortPoint = ['{:.2f}'.format(point[0]), '{:.2f}'.format(point[1])]
-            if shortPoint != lastPoint:
-                f.write('(')
-                f.write(shortPoint[0])
-                f.write(' ')
-                f.write(shortPoint[1])
-                f.write(')\n')
-                lastPoint = shortPoint
-        ## This last little if statement serves to close paths that may not
-        ##  otherwise close, but only if they're polygons.
-        if path.pathType == "POLYGON":
-            point = path.path[0]
-            shortPoint = ['{:.2f}'.format(point[0]), '{:.2f}'.format(point[1])]
-            f.write('(')
-            f.write(shortPoint[0])
-            f.write(' ')
-            f.write(shortPoint[1])
-            f.write(')\n')
-        
-        f.write(';\n')
+        f.write(pathText(path, stats))
+        if stats is not None:
+            stats.lap("emit")
+
+## region() reads the --region option for argparse.
+def region(text):
+    try:
+        return parseRegion(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+## main() is the command line entry point. Each input can be an absolute path,
+##  a relative path, or a file which is dropped onto the script; directories
+##  and glob patterns are converted as a batch (see BatchConvert.py).
+##  Everything else is optional.
+def main(argv=None):
+    argParser = argparse.ArgumentParser(
+            description="Convert Inkscape SVGs into EAGLE scripts.")
+    argParser.add_argument("inputs", nargs="+", metavar="input",
+            help="SVG file, directory of SVG files or glob pattern")
+    argParser.add_argument("-t", "--tolerance", type=float, default=None,
+            help="flatten curves so that no point is further than this many "
+                 "mm from the true curve, instead of using about one segment "
+                 "per mm")
+    argParser.add_argument("-s", "--simplify", type=float, default=None,
+            help="drop points that are within this many mm of the line "
+                 "through their neighbours (POLYGONs are never allowed to "
+                 "self-intersect or collapse)")
+    argParser.add_argument("-a", "--arcs", type=float, default=None,
+            metavar="MM",
+            help="draw circular arcs as curved wires, and replace runs of "
+                 "points on flattened curves that lie within this many mm "
+                 "of a circular arc with a single curved segment")
+    argParser.add_argument("--cache", default=None, metavar="FILE",
+            help="keep flattened paths in this cache file and reuse them "
+                 "for paths that haven't changed since the last run")
+    argParser.add_argument("--cache-size", type=float, default=None,
+            metavar="MB", help="size limit of the cache (default: %d MB)"
+                               % (DEFAULT_SIZE // (1024 * 1024)))
+    argParser.add_argument("--stats", default=None, metavar="FILE",
+            help="write counts and timings for each conversion to FILE as "
+                 "JSON ('-' for stderr)")
+    argParser.add_argument("--parser", choices=sorted(parsers),
+            default="expat",
+            help="SVG parser to use; 'html' is slower but copes with "
+                 "markup that isn't well-formed XML (default: expat)")
+    argParser.add_argument("-o", "--output-dir", default=None,
+            help="write scripts into this directory instead of next to "
+                 "their SVGs")
+    argParser.add_argument("-j", "--jobs", type=int, default=None,
+            help="number of files to convert at once (default: one per core)")
+    argParser.add_argument("-g", "--group", action="store_true",
+            help="write the paths grouped by layer and width, each group in "
+                 "spatial order, so that each layer and width is only set "
+                 "once (the whole drawing is then held in memory)")
+    argParser.add_argument("--stitch", action="store_true",
+            help="join WIREs on the same layer and of the same width that "
+                 "meet end to end into single WIREs, and those that close "
+                 "up into POLYGONs (the whole drawing is then held in "
+                 "memory)")
+    argParser.add_argument("--union", action="store_true",
+            help="merge POLYGONs on the same layer and of the same width "
+                 "that share an edge (or, with Shapely installed, that touch "
+                 "or overlap) into single POLYGONs (the whole drawing is then "
+                 "held in memory)")
+    argParser.add_argument("--region", type=region, default=None,
+            metavar="L,B,R,T",
+            help="only convert the paths inside this box, given as its "
+                 "left, bottom, right and top edges in mm, or 'viewbox' for "
+                 "the drawing's own frame; paths entirely outside it are "
+                 "skipped before they're flattened")
+    argParser.add_argument("--clip", action="store_true",
+            help="cut paths that cross the edge of the region off at it "
+                 "(the region is the drawing's frame if --region isn't given)")
+    argParser.add_argument("--path-jobs", type=int, default=None,
+            metavar="N",
+            help="flatten the paths of each file on N worker processes, for "
+                 "big drawings (default: flatten them in one process)")
+    argParser.add_argument("-w", "--watch", action="store_true",
+            help="keep running, and convert each input again whenever it "
+                 "changes, redoing only the paths that changed")
+    argParser.add_argument("--delta", action="store_true",
+            help="with --watch, also write NAME.delta.scr, drawing only the "
+                 "paths that changed in the last conversion")
+    argParser.add_argument("--interval", type=float, default=0.5,
+            help="with --watch, how often to look for changes, in seconds "
+                 "(default: 0.5)")
+    args = argParser.parse_args(argv)
+    options = {"tolerance": args.tolerance, "parser": args.parser,
+               "simplify": args.simplify, "cache": args.cache,
+               "arcs": args.arcs, "pathJobs": args.path_jobs,
+               "group": args.group, "stitch": args.stitch,
+               "union": args.union, "region": args.region,
+               "clip": args.clip}
+    if args.cache_size is not None:
+        options["cacheSize"] = int(args.cache_size * 1024 * 1024)
+
+    if args.watch:
+        import WatchConvert
+        WatchConvert.watch(args.inputs, options, args.output_dir, args.delta,
+                           args.interval)
+        return 0
+
+    ## The plain old one-file case doesn't need a worker pool or a report.
+    ##  Statistics are still kept with --union, for the sake of the warning
+    ##  about POLYGONs it couldn't merge.
+    if (len(args.inputs) == 1 and os.path.isfile(args.inputs[0])
+            and args.output_dir is None):
+        stats = ConversionStats() if args.stats or args.union else None
+        Converter(**options).convertFile(args.inputs[0], stats=stats)
+        if stats is not None:
+            warning = overlapWarning(stats.counts)
+            if warning is not None:
+                sys.stderr.write(warning + "\n")
+        if args.stats:
+            writeReports({args.inputs[0]: stats.report()}, args.stats)
+        return 0
+
+    import BatchConvert
+    failures = BatchConvert.run(args.inputs, options, args.output_dir,
+                                args.jobs, stats=args.stats)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
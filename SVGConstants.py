@@ -54,3 +54,19 @@ ARCABS          =17     ## A (absolute elliptical ARC)
 REALMOVEABS     =18     ## For when it's a REAL absolute move, instead of an
                         ##  implied absolute move caused by it being first in
                         ##  the path.
+
+## The number of parameters each command takes. A command may be followed by
+##  any number of groups of this many parameters, each of which is treated as
+##  a repeat of the command (except for MOVETO; see above).
+ARGUMENTS = {
+    'm': 2, 'M': 2,     ## x y
+    'l': 2, 'L': 2,     ## x y
+    'h': 1, 'H': 1,     ## x
+    'v': 1, 'V': 1,     ## y
+    'c': 6, 'C': 6,     ## x1 y1 x2 y2 x y
+    's': 4, 'S': 4,     ## x2 y2 x y
+    'q': 4, 'Q': 4,     ## x1 y1 x y
+    't': 2, 'T': 2,     ## x y
+    'a': 7, 'A': 7,     ## rx ry x-axis-rotation large-arc-flag sweep-flag x y
+    'z': 0, 'Z': 0,
+}
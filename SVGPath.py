@@ -1,12 +1,23 @@
-## this class represents the raw data plucked from the SVG file. 
-class SVGPath:
+from SVGConstants import ARGUMENTS
+from transforms import IDENTITY, multiply, scaleFactor
+from array import array
+import re
+
+## this class represents the raw data plucked from the SVG file. To keep memory
+##  down on big drawings, the numbers from the path data are all packed into one
+##  array of doubles rather than kept as separate objects; see addCommand()
+##  and records() for how to get them in and out.
+class SVGPath(object):
+    __slots__ = ("transform", "pathType", "pathWeight", "pathLayer",
+                 "commands", "starts", "args", "pathId")
+
     ## constructor- called whenever a copy of SVGPath is created.
     def __init__(self):
-        self.xOffset = 0     ## Floating point values, in mm, of the offset of
-        self.yOffset = 0     ##  the current path. Note that values in the SVG
-                             ##  file are all given in px, and 1mm ~= 3.54px.
-                             ##  This offset is ONLY local- there may be other
-                             ##  offsets that get applied as well.
+        self.transform = IDENTITY  ## The matrix that takes the path's
+                             ##  coordinates (in px) to where it's drawn in
+                             ##  EAGLE (in mm): its own transform, those of
+                             ##  all the groups it's in and the document's,
+                             ##  all in one. See transforms.py.
         self.pathType = "WIRE" ## Do we want to create a polygon or just a wire
                              ##  in the EAGLE script? Defined by whether the
                              ##  path is filled (fill color has no impact) or
@@ -22,14 +33,138 @@ class SVGPath:
                              ##  silk). This data is encoded by the red value of
                              ##  the stroke- by default it will be set to 20, if
                              ##  the red value of the stroke is 0.
-        self.path = []       ## This is a list containing the actual path data.
-                             ##  we strip away all the white space and commas
-                             ##  before packing it away here.
+        self.commands = []   ## The actual path data: the command letters, in
+        self.starts = array('l')  ##  order, the index in args of the first
+        self.args = array('d')    ##  argument of each command, and all of the
+                             ##  arguments of all of the commands, one after
+                             ##  the other.
+        self.pathId = None   ## The id attribute of the <path>, if it had one.
+
+    ## addCommand() appends one command and its arguments to the path data.
+    def addCommand(self, command, args):
+        self.commands.append(command)
+        self.starts.append(len(self.args))
+        self.args.extend(args)
+
+    ## extend() appends all of the (command, arguments) records from an
+    ##  iterable, such as the one tokenizePath() returns.
+    def extend(self, records):
+        for command, args in records:
+            self.addCommand(command, args)
+
+    ## records() returns a (command, start, end) record for each command, where
+    ##  args[start:end] are its arguments.
+    def records(self):
+        ends = self.starts[1:]
+        ends.append(len(self.args))
+        return zip(self.commands, self.starts, ends)
+
+    ## transformed() returns a copy of the path drawn with 'matrix' applied
+    ##  on top of its own transform, for a <use> that turns or scales it. The
+    ##  path data is shared, not copied; the line gets thicker or thinner
+    ##  along with the rest of the path.
+    def transformed(self, matrix):
+        shape = SVGPath()
+        shape.transform = multiply(matrix, self.transform)
+        shape.pathType = self.pathType
+        shape.pathWeight = self.pathWeight * scaleFactor(matrix)
+        shape.pathLayer = self.pathLayer
+        shape.commands = self.commands
+        shape.starts = self.starts
+        shape.args = self.args
+        shape.pathId = self.pathId
+        return shape
+
+    ## The number of commands in the path.
+    def __len__(self):
+        return len(self.commands)
 
     ## display() is a handy little debugging tool that lets you print out the
     ##  packed values in an SVGPath class object.
     def display(self):
         print self.pathType[0], "Weight:", self.pathWeight, \
                 "Layer:", self.pathLayer
-        print "Offset:", self.xOffset, self.yOffset
-        print self.path
+        print "Transform:", self.transform
+        for command, start, end in self.records():
+            print command, list(self.args[start:end])
+
+## this class represents a <use> tag: a copy of whatever has the id 'href',
+##  drawn with the matrix 'transform' (which, as for an SVGPath, includes the
+##  groups the <use> is in, its x and y and the document's matrix).
+##  SvgHandler.resolve() turns it into the SVGPath objects it stands for.
+class SVGInstance(object):
+    __slots__ = ("href", "transform")
+
+    ## constructor
+    def __init__(self):
+        self.href = None
+        self.transform = IDENTITY
+
+## Path data ("d" attributes) is a series of single-character commands, each
+##  followed by its numbers. Numbers can be separated by whitespace, commas or
+##  nothing at all, as long as it's unambiguous: "1.5-2" is 1.5 and -2, ".5.5"
+##  is .5 and .5, and "1e-3" is a single number. The one exception to the usual
+##  number grammar is the pair of flags in an elliptical arc, which are always
+##  a single 0 or 1 and so may be run together with what follows ("0 0110,10"
+##  is 0, 0, 1, 10, 10). _token matches the next command or number, whatever
+##  separates it from the last; _flag matches the next arc flag.
+_number = r"[-+]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][-+]?[0-9]+)?"
+_token = re.compile(r"[\s,]*(?:([MmZzLlHhVvCcSsQqTtAa])|(%s))" % _number)
+_flag = re.compile(r"[\s,]*([01])")
+
+## tokenizePath() scans path data once, from start to finish, and yields a
+##  (command, arguments) record for each command in it, where 'arguments' is a
+##  tuple of floats holding every number that follows the command up to the
+##  next one. As the SVG spec asks, path data with an error in it (anything
+##  that isn't a command or a number where one is due, numbers before the
+##  first command, or a command that's short of numbers) is drawn up to the
+##  last whole segment before the error, and the rest is ignored.
+def tokenizePath(d):
+    token = _token.match
+    flag = _flag.match
+    command = None
+    arc = False
+    args = []
+    append = args.append
+    pos = 0
+    while True:
+        if arc and len(args) % 7 in (3, 4):
+            match = flag(d, pos)
+            if match is None:
+                break
+            append(float(match.group(1)))
+        else:
+            match = token(d, pos)
+            if match is None:
+                break
+            if match.lastindex == 2:
+                if command is None:
+                    return
+                append(float(match.group(2)))
+            else:
+                if command is not None:
+                    if not _complete(command, args):
+                        break
+                    yield command, tuple(args)
+                command = match.group(1)
+                arc = command in ('a', 'A')
+                args = []
+                append = args.append
+        pos = match.end()
+    ## Whatever stopped us (the end of the data or an error), the last command
+    ##  keeps only its whole segments, if it has any.
+    if command is None:
+        return
+    arity = ARGUMENTS[command]
+    if not arity:
+        yield command, ()
+    elif len(args) >= arity:
+        yield command, tuple(args[:len(args) - len(args) % arity])
+
+## _complete() reports whether a command has the right number of arguments:
+##  none for a close path, and one or more whole groups for the rest.
+def _complete(command, args):
+    arity = ARGUMENTS[command]
+    if not arity:
+        return not args
+    return bool(args) and not len(args) % arity
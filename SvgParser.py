@@ -1,36 +1,75 @@
 from HTMLParser import HTMLParser
-from SVGPath import SVGPath
+from xml.parsers import expat
+from SVGPath import SVGPath, SVGInstance, tokenizePath
+from transforms import (IDENTITY, PX_PER_MM, documentMatrix, multiply, invert,
+                        translation, isTranslation, scaleFactor, parseTransform,
+                        applyMatrix)
+from array import array
 import re
 
-## We use a re-defined instance of the HTMLParser class to scan the SVG doc and
-##  make some sense of it. It turns out SVG stores all the data in the tag, so
-##  there's no need to implement anything but a handle_starttag() function.
-class SvgParser(HTMLParser):
-
-    pathData = []   ## This empty list will be populated with SVGPath class
-                    ##  objects as they are discovered in the SVG file.
-    xOffset = 0     ## These values will be populated based on the information
-    yOffset = 0     ##  found in the <g> tag (which defines the X and Y offset
-                    ##  of all paths in a group), and a Y offset
-                    ##  based on the dimensions of the document from the <svg>
-                    ##  tag. NB- Inkscape puts the origin in the lower left but
-                    ##  SVG treats the upper left as the origin; thus, to get
-                    ##  the EAGLE path to look right, we have to multiply all
-                    ##  Y coordinates by -1 and then add the Y dimension of the
-                    ##  drawing as an offset. :-P
+## SvgHandler holds everything we need to know about an SVG doc once it's been
+##  scanned, and the code that makes some sense of it. It turns out SVG stores
+##  all the data in the tag, so almost everything happens in handle_starttag();
+##  handle_endtag() only keeps track of which groups we're in. The scanning
+##  itself is left to one of the two parsers below, which call those two
+##  functions for each tag they find.
+class SvgHandler:
+
+    ## constructor- all of the parser's state belongs to the instance, so
+    ##  each parser starts out empty no matter how many came before it.
+    def __init__(self):
+        self.pathData = []  ## This empty list will be populated with SVGPath
+                            ##  (and SVGInstance) class objects as they are
+                            ##  discovered in the SVG file, ready to be drawn.
+                            ##  They can be taken away as soon as they turn up
+                            ##  (see Converter.iterFlatten() in SVG2SCR.py),
+                            ##  so the whole drawing never has to be held
+                            ##  at once.
+        self.waiting = []   ## Items that can't go into pathData yet, because
+                            ##  they come after a <use> of something that
+                            ##  hasn't been read in full (see ready()).
+        self.transforms = [documentMatrix()]  ## The transform stack: the
+                            ##  matrix (see transforms.py) that takes the
+                            ##  coordinates inside each group we're currently
+                            ##  in to EAGLE's. The bottom one is the
+                            ##  document's, which scales px to mm and, once
+                            ##  we know the height of the drawing from the
+                            ##  <svg> tag, flips it the right way up. NB-
+                            ##  Inkscape puts the origin in the lower left but
+                            ##  SVG treats the upper left as the origin; thus,
+                            ##  to get the EAGLE path to look right, we have
+                            ##  to multiply all Y coordinates by -1 and then
+                            ##  add the Y dimension of the drawing. :-P Each
+                            ##  group's matrix is worked out once, when the
+                            ##  group starts, from the one above it.
+        self.frames = {}    ## For each id, the matrix of whatever the
+                            ##  element with that id is in; see resolve().
+        self.definitions = {}  ## Everything that a <use> tag can refer to:
+                            ##  for each id, the list of SVGPath (and
+                            ##  SVGInstance) objects it stands for. A path
+                            ##  with an id is listed under that id, and also
+                            ##  under the id of every <g> or <symbol> it's in.
+        self.containers = []  ## The ids (or None) of the <g>, <symbol> and
+                            ##  <defs> tags we're currently inside.
+        self.hidden = 0     ## How many of those are <defs> or <symbol>, whose
+                            ##  contents are only drawn where they're used.
+        self.styles = {}    ## Every style we've worked out so far; see
+                            ##  pathStyle().
+        self.viewBox = None ## The drawing's frame, (x, y, width, height) in
+                            ##  px, from the viewBox of the <svg> tag or
+                            ##  failing that its width and height; see
+                            ##  frame().
 
     ## Re-implement the handle_starttag function for our purposes. We're
-    ##  interested in three tags: <path>, <g>, and <svg>. The <svg> tag contains
-    ##  info on the size of the document, and that is important for reasons
-    ##  discussed above. <g> contains info about groups, and while this script
-    ##  assumes that none of the paths are in sub-groups, Inkscape creates one
-    ##  big master group which it uses to define each layer, so we need to worry
-    ##  about at least one (although we're going to say "no groups and one layer
-    ##  only" in the spec for SVG files to run through this script). Finally,
-    ##  <path> defines the actual path itself. All of these tags have all of
-    ##  their "data" defined within the attributes ("attrs") of the tag itself,
-    ##  so we only need to iterate over the list of attributes to figure out
-    ##  what we need to do.
+    ##  interested in three tags above all: <path>, <g>, and <svg>. The <svg>
+    ##  tag contains info on the size of the document, and that is important
+    ##  for reasons discussed above. <g> contains info about groups: Inkscape
+    ##  creates one big master group which it uses to define each layer, and
+    ##  groups can be nested as deep as anyone likes, each with its own
+    ##  transform. Finally, <path> defines the actual path itself. All of these
+    ##  tags have all of their "data" defined within the attributes ("attrs")
+    ##  of the tag itself, so we only need to iterate over the list of
+    ##  attributes to figure out what we need to do.
     def handle_starttag(self, tag, attrs):
         ## Following both logic and likely order-of-encounter in the document,
         ##  let's deal with the <svg> tag first:
@@ -46,150 +85,356 @@ class SvgParser(HTMLParser):
             for i in attrs:
                 ## We only really care about one thing in the <svg> tag: the
                 ##  height of the document. We need to make that into a float
-                ##  and subtract it from the overall yOffset because of the dumb
-                ##  "lower-left" origin thing in Inkscape.
-                if i[0] == 'height':
+                ##  and build the document matrix from it because of the dumb
+                ##  "lower-left" origin thing in Inkscape. Only an <svg> that
+                ##  isn't inside a group counts.
+                if i[0] == 'height' and len(self.transforms) == 1:
                     ## Sometimes, particularly with files that come from Adobe
                     ##  illustrator, the height will be denoted with a trailing
                     ##  "px". If that's the case, we need to ignore it.
                     if "px" in i[1]:
-                        self.yOffset = self.yOffset - float(i[1][0:-2])
+                        height = float(i[1][0:-2])
                     else:
-                        self.yOffset = self.yOffset - float(i[1])
-                        
-
-        ## Next, let's handle the <g> tag. We only expect to see one of these-
-        ##  if our users can't adhere to the spec that's not our problem. The
-        ##  one we expect to see represents the supergroup that Inkscape uses
-        ##  to define a "layer", and there will ALWAYS be at least one layer in
-        ##  an Inkscape SVG.
-        if tag == 'g':
-            ## See above for a discussion of attrs and our iteration over it.
-            for i in attrs:
-                ## The attribute within <g> that we care about is a "transform"
-                ##  of type "translate". The syntax for such a thing is
-                ##  'transform="translate(x,y)". We first look for "transform"
-                ##  in the name field of each item in the attrs list...
-                if i[0] == "transform":
-                    ## ...and then look to make sure it is a "translate"
-                    ##  transform (other types of transforms are defined but
-                    ##  disallowed by our specification; Inkscape doesn't appear
-                    ##  to make heavy use of them anyway)...
-                    if "translate" in i[1]:
-                        ## ...and finally, pluck the numeric values out of the
-                        ##  string, split them in two around the comma, and
-                        ##  convert them to floating point.
-                        self.xOffset = float(i[1][10:-1].split(',')[0])
-                        self.yOffset = self.yOffset + \
-                                float(i[1][10:-1].split(',')[1])
+                        height = float(i[1])
+                    self.transforms[0] = documentMatrix(height)
+            ## We also keep the frame of the drawing, in case we're only
+            ##  asked for what's inside it. The viewBox says where it is; an
+            ##  <svg> without one is taken to start at 0,0 and be as wide and
+            ##  high as it says. (HTMLParser lowercases the name.)
+            attributes = dict(attrs)
+            if len(self.transforms) == 1:
+                box = attributes.get('viewBox', attributes.get('viewbox'))
+                numbers = [float(n) for n in _number.findall(box or "")]
+                width = _number.match(attributes.get('width', ""))
+                height = _number.match(attributes.get('height', ""))
+                if len(numbers) == 4:
+                    self.viewBox = tuple(numbers)
+                elif width is not None and height is not None:
+                    self.viewBox = (0.0, 0.0, float(width.group()),
+                                    float(height.group()))
+
+
+        ## Next, let's handle the <g> tag. There will ALWAYS be at least one
+        ##  of these in an Inkscape SVG, as Inkscape uses a supergroup to
+        ##  define each "layer", and there may be any number more inside it.
+        ##  <g>, <symbol> and <defs> can all contain paths, and we need to keep
+        ##  track of which ones we're in so that we know what a <use> tag that
+        ##  refers to one of them means (and whether a path should be drawn
+        ##  where it is or only where it's used). Each one's transform (any of
+        ##  the forms SVG allows, see parseTransform() in transforms.py) goes
+        ##  on top of the one it's in, and applies to everything inside it.
+        if tag in ('g', 'symbol', 'defs'):
+            attributes = dict(attrs)
+            self.containers.append(attributes.get('id'))
+            if tag != 'g':
+                self.hidden += 1
+            self.enter(attributes.get('id'))
+            self.transforms.append(multiply(
+                self.transforms[-1], parseTransform(attributes.get('transform'))))
 
         ## Last of all we'll start discovering paths. Each path will have two,
         ##  maybe three, attributes that we are interested in: "d", "style", and
-        ##  POSSIBLY a "transform" similar to the one discussed above.
+        ##  POSSIBLY a "transform" like the one a group can have.
         if tag == "path":
-            ## With each new path we discover, we want to append the list of
-            ##  paths that exists in this class to include one more. We'll
-            ##  spend the rest of this path parsing session referring simply to
-            ##  the last path in the list.
-            self.pathData.append(SVGPath())
-            ## See above for a discussion of attrs and our iteration over it.
-            for i in  attrs:
-                ## The meat is in the "d" attribute. This is the actual path
-                ##  data and its format is too complex to get too into here.
-                ##  Briefly, it will be a series of single-character commands
-                ##  followed by numerical values seperated by either a space or
-                ##  a comma. We want to parse each one of those items into its
-                ##  own seperate list entry...
-                if i[0] == "d":
-                    ## ...so we use re.findall() (a function of the regular
-                    ##  expression library, which is also too complex to get
-                    ##  into here) to generate a list of items broken apart by
-                    ##  commas or spaces, then we extend the empty path list
-                    ##  with the values in that list. Shrewd observers will note
-                    ##  that we've created another problem here- the items in
-                    ##  that list are all strings, but we need at least some
-                    ##  of them to be floating point values to express the
-                    ##  coordinate data of each point. We'll cope with that
-                    ##  later.
-
-                    ## Some tools do not add spaces or commas around the
-                    ## command characters. This re.sub command is supposed
-                    ## to resolve this.
-                    temp = re.sub(r"(M|L|H|V|C|S|Q|T|A|Z)", r" \1 ", i[1],
-                                    flags=re.IGNORECASE)
-
-                    ## Some tools do not separate numbers followed by a negative
-                    ## number. This re.sub command is supposed to resolve this
-                    ## specific issue.
-                    temp = re.sub(r"([0-9]+)(-[0-9+])", r"\1 \2", temp)
-
-                    self.pathData[-1].path.extend(re.findall(r'[^,\s]+',temp))
-                ## The "style" attribute defines thigs like opacity, line
-                ##  weight, fill and line colors, etc etc. We use it to encode
-                ##  the type of entity we're going to create (a polygon or an
-                ##  outline, depending on whether the fill is "none" or not),
-                ##  the line weight (directly converts to thickness in EAGLE),
-                ##  and the layer it'll be drawn in (based on the red channel of
-                ##  the RGB color of the stroke). The crappy thing is, the
-                ##  attribute data is just one long string formatted as
-                ##  "style1:value1;style2:value2;style3:value3" etc etc, so we
-                ##  need to break it up a bit.
-                if i[0] == "style":
-                    ## Start with an empty list...
-                    temp = []
-                    ## ...and then populate it with the various items from the
-                    ##  string by splitting them around the semicolons.
-                    temp.extend(i[1].split(';'))
-                    for i in temp:
-                        ## "fill" tells us whether we're dealing with a
-                        ##  polygon or just a path. If there's ANYTHING as a
-                        ##  fill at all, we're treating it as a polygon. NB:
-                        ##  the colon is included because there may be more than
-                        ##  one style entry that contains the string "fill".
-                        ##  This is true for all three of the style items we're
-                        ##  looking for.
-                        if "fill:" in i:
-                            if (i != "fill:none"):
-                                self.pathData[-1].pathType="POLYGON"
-                            else:
-                                self.pathData[-1].pathType="WIRE"
-                        ## "stroke" encodes the layer in the red value.
-                        if "stroke:" in i:
-                            ## The red value is two characters buried in this
-                            ##  string, and is expressed as a hex value, so we
-                            ##  must first extract those characters and then
-                            ##  convert them to a base 10 integer value.
-                            ##  If the user hasn't made a stroke style yet, we
-                            ##  need to catch that.
-                            if "none" in i:
-                                print "You didn't specify a stroke somewhere!"
-                            self.pathData[-1].pathLayer = int(i[-6:-4],16)
-                            ## A sanity check- if the user neglected to set a
-                            ##  layer, be a pal and assume that "dimension" is a
-                            ##  good layer to stick it on. This saves an error
-                            ##  in EAGLE later.
-                            if self.pathData[-1].pathLayer == 0:
-                                self.pathData[-1].pathLayer = 20
-                        ## "stroke-width" encodes the line thickness. The syntax
-                        ##  here is "stroke-width:Npx" where 'N' represents a
-                        ##  floating point number of arbitrary precision. We'll
-                        ##  pluck the digits out of the middle of that string,
-                        ##  convert to mm and store it away.
-                                re.findall(r'\d+\.*\d*',i)[0]
-                        if "stroke-width:" in i:
-                            ##print re.findall(r'\d+\.*\d*',i)[0]
-                            self.pathData[-1].pathWeight = \
-                                    float(re.findall(r'\d+\.*\d*',i)[0])/3.54
-                ## The last attribute in the <path> tag that we need to be
-                ##  concerned with is "transform". There MAY not be a transform
-                ##  attribute; in that case, we'll just never worry about it.
-                ##  However, if there IS a transform attribute, we need to
-                ##  account for that and store away the x and y offsets implied
-                ##  by that transform. For more info on how this is done, see
-                ##  the comments for the <g> tag above.
-                if i[0] == "transform":
-                    if "translate" in i[1]:
-                        self.pathData[-1].xOffset = \
-                                float(i[1][10:-1].split(',')[0])
-                        self.pathData[-1].yOffset = \
-                                float(i[1][10:-1].split(',')[1])
+            ## With each new path we discover, we create a new SVGPath and
+            ##  spend the rest of this path parsing session filling it in.
+            ##  At the end, place() puts it where it belongs.
+            shape = SVGPath()
+            ## See above for a discussion of attrs; this time it's easier to
+            ##  look them up by name.
+            attributes = dict(attrs)
+            ## The meat is in the "d" attribute. This is the actual path
+            ##  data and its format is too complex to get too into here.
+            ##  Briefly, it will be a series of single-character commands
+            ##  followed by numerical values seperated by either a space or
+            ##  a comma. We hand the string to tokenizePath(), which breaks
+            ##  it into commands, each with a tuple of the numbers that
+            ##  follow it already converted to floating point. See SVGPath.py
+            ##  for the details; it copes with tools that leave out the
+            ##  spaces and commas around command characters and between
+            ##  numbers.
+            if 'd' in attributes:
+                shape.extend(tokenizePath(attributes['d']))
+            ## The "style" attribute (and the "fill", "stroke" and
+            ##  "stroke-width" attributes, which say the same things one at a
+            ##  time) tell us the type of entity we're going to create, the
+            ##  line weight and the layer. See pathStyle().
+            shape.pathType, shape.pathLayer, shape.pathWeight = \
+                    self.pathStyle(attributes)
+
+            ## The last attribute in the <path> tag that we need to be
+            ##  concerned with is "transform". There MAY not be a transform
+            ##  attribute, but if there is, it goes on top of the groups'. The
+            ##  result is the one matrix that takes this path to EAGLE, and
+            ##  the line weight is scaled along with it.
+            shape.pathId = attributes.get('id')
+            self.enter(shape.pathId)
+            shape.transform = multiply(
+                self.transforms[-1], parseTransform(attributes.get('transform')))
+            scale = scaleFactor(shape.transform) * PX_PER_MM
+            if abs(scale - 1) > 1e-9:
+                shape.pathWeight *= scale
+            self.place(shape, shape.pathId)
+
+        ## A <use> tag draws a copy of something defined elsewhere in the
+        ##  document (often in <defs>), with its transform and then moved by
+        ##  its x and y attributes. It's recorded as an SVGInstance and only
+        ##  resolved into paths once the whole document has been read, since
+        ##  it may refer to something further on.
+        if tag == "use":
+            instance = SVGInstance()
+            x = y = 0.0
+            for name, value in attrs:
+                if name in ("href", "xlink:href") and value.startswith("#"):
+                    instance.href = value[1:]
+                elif name == "x":
+                    x = float(value)
+                elif name == "y":
+                    y = float(value)
+            attributes = dict(attrs)
+            self.enter(attributes.get('id'))
+            instance.transform = multiply(multiply(
+                self.transforms[-1], parseTransform(attributes.get('transform'))),
+                translation(x, y))
+            if instance.href is not None:
+                self.place(instance, attributes.get('id'))
+
+    def handle_endtag(self, tag):
+        if tag in ('g', 'symbol', 'defs') and self.containers:
+            self.containers.pop()
+            self.transforms.pop()
+            if tag != 'g':
+                self.hidden -= 1
+            ## A <use> that was waiting for this container may be ready now.
+            while self.waiting and self.ready(self.waiting[0]):
+                self.pathData.append(self.waiting.pop(0))
+
+    ## finish() is called once the whole document has been read. Anything
+    ##  still waiting goes into pathData; a <use> of something that never
+    ##  turned up draws nothing.
+    def finish(self):
+        self.pathData.extend(self.waiting)
+        self.waiting = []
+
+    ## enter() notes the matrix that an element with the id 'itemId' is
+    ##  drawn inside of, for resolve().
+    def enter(self, itemId):
+        if itemId is not None:
+            self.frames[itemId] = self.transforms[-1]
+
+    ## place() files away a newly found SVGPath or SVGInstance: into pathData
+    ##  to be drawn, unless it's inside <defs> or <symbol>, and into the
+    ##  definitions of its own id and of every container it's in. Only items
+    ##  that something may refer to (those with an id, or inside a container
+    ##  with one) are kept in the definitions; once taken from pathData, the
+    ##  rest are gone for good. So that the drawing comes out in document
+    ##  order, nothing goes into pathData while there's a <use> waiting for
+    ##  the rest of the document.
+    def place(self, item, itemId):
+        if not self.hidden:
+            if self.waiting or not self.ready(item):
+                self.waiting.append(item)
+            else:
+                self.pathData.append(item)
+        for name in [itemId] + self.containers:
+            if name is not None:
+                self.definitions.setdefault(name, []).append(item)
+
+    ## ready() reports whether an item can be drawn yet: an SVGPath always
+    ##  can, but an SVGInstance only once whatever it refers to (and whatever
+    ##  that refers to in turn) has been read in full. That's never the case
+    ##  for a reference to something further on in the document, or to a
+    ##  container the <use> is inside of.
+    def ready(self, item, depth=0):
+        if not isinstance(item, SVGInstance) or depth > 32:
+            return True
+        if item.href not in self.frames or item.href in self.containers:
+            return False
+        return all(self.ready(member, depth + 1)
+                   for member in self.definitions.get(item.href, [])
+                   if member is not item)
+
+    ## pathStyle() returns the (pathType, pathLayer, pathWeight) tuple for a
+    ##  path with the given attributes (see parseStyle()). Exported artwork
+    ##  tends to use the same few styles over and over, so each one is only
+    ##  worked out the first time it's seen, and kept in self.styles after
+    ##  that.
+    def pathStyle(self, attributes):
+        key = (attributes.get('style'), attributes.get('fill'),
+               attributes.get('stroke'), attributes.get('stroke-width'))
+        style = self.styles.get(key)
+        if style is None:
+            style = self.styles[key] = parseStyle(*key)
+        return style
+
+    ## frame() returns the drawing's frame (see viewBox) as a box (left,
+    ##  bottom, right, top) in EAGLE's mm, or None if the <svg> tag didn't say
+    ##  where it is.
+    def frame(self):
+        if self.viewBox is None:
+            return None
+        x, y, width, height = self.viewBox
+        corners = applyMatrix(self.transforms[0],
+                              array('d', [x, y, x + width, y + height]))
+        return (min(corners[0::2]), min(corners[1::2]),
+                max(corners[0::2]), max(corners[1::2]))
+
+    ## resolve() turns an item from pathData into the list of (SVGPath, dx,
+    ##  dy) records that it draws, where dx and dy are an extra offset in mm
+    ##  to draw the path at. An SVGPath just draws itself; an SVGInstance draws
+    ##  everything listed under the id it refers to, as if it had been inside
+    ##  the <use> rather than where it is (and instances of instances are
+    ##  followed, up to a sensible depth, which also stops a <use> that refers
+    ##  to itself from going round forever). 'matrix' is what has to be done to
+    ##  the item, on top of its own transform, to get it there. When that only
+    ##  moves it, the path is drawn moved by dx, dy, so that it only has to be
+    ##  flattened once however many copies of it there are; otherwise it's
+    ##  drawn as a new SVGPath with the matrix folded into its own.
+    def resolve(self, item, matrix=IDENTITY, depth=0):
+        if not isinstance(item, SVGInstance):
+            if matrix is IDENTITY:
+                return [(item, 0, 0)]
+            if isTranslation(matrix):
+                return [(item, matrix[4], matrix[5])]
+            return [(item.transformed(matrix), 0, 0)]
+        if depth > 32:
+            return []
+        frame = invert(self.frames.get(item.href, IDENTITY))
+        if frame is None:
+            return []
+        matrix = multiply(matrix, multiply(item.transform, frame))
+        drawn = []
+        for member in self.definitions.get(item.href, []):
+            if member is item:
+                continue
+            drawn.extend(self.resolve(member, matrix, depth + 1))
+        return drawn
+
+## parseStyle() works out what a path's style means for EAGLE and returns a
+##  (pathType, pathLayer, pathWeight) tuple. We use the style to encode the
+##  type of entity we're going to create (a polygon or an outline, depending on
+##  whether the fill is "none" or not), the line weight (directly converts to
+##  thickness in EAGLE), and the layer it'll be drawn in (based on the red
+##  channel of the RGB color of the stroke). 'style' is the "style" attribute,
+##  which is just one long string formatted as
+##  "style1:value1;style2:value2;style3:value3" etc etc, so we need to break it
+##  up a bit. 'fill', 'stroke' and 'width' are the "fill", "stroke" and
+##  "stroke-width" attributes, which some tools write instead; as in SVG,
+##  anything in the style beats them. Any of them may be None.
+def parseStyle(style=None, fill=None, stroke=None, width=None):
+    properties = {"fill": fill, "stroke": stroke, "stroke-width": width}
+    for entry in (style or "").split(';'):
+        name, colon, value = entry.partition(':')
+        if colon:
+            properties[name.strip()] = value.strip()
+    ## Whatever the style doesn't say is left as SVGPath has it.
+    pathType, pathLayer, pathWeight = "WIRE", 1, 0
+    ## "fill" tells us whether we're dealing with a polygon or just a path.
+    ##  If there's ANYTHING as a fill at all, we're treating it as a polygon.
+    if properties["fill"] is not None:
+        if properties["fill"] != "none":
+            pathType = "POLYGON"
+    ## "stroke" encodes the layer in the red value. If the user hasn't made a
+    ##  stroke style yet, we need to catch that.
+    if properties["stroke"] is not None:
+        red = _red(properties["stroke"])
+        if properties["stroke"] == "none":
+            print "You didn't specify a stroke somewhere!"
+        elif red is not None:
+            pathLayer = red
+            ## A sanity check- if the user neglected to set a layer, be a pal
+            ##  and assume that "dimension" is a good layer to stick it on.
+            ##  This saves an error in EAGLE later.
+            if pathLayer == 0:
+                pathLayer = 20
+    ## "stroke-width" encodes the line thickness. The syntax here is
+    ##  "stroke-width:Npx" where 'N' represents a floating point number of
+    ##  arbitrary precision. We'll pluck the number out of that string and
+    ##  convert to mm.
+    if properties["stroke-width"] is not None:
+        number = _number.search(properties["stroke-width"])
+        if number is not None:
+            pathWeight = float(number.group())/PX_PER_MM
+    return (pathType, pathLayer, pathWeight)
+
+_number = re.compile(r"[-+]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][-+]?[0-9]+)?")
+_rgb = re.compile(r"rgb\(\s*([0-9]+)")
+
+## _red() returns the red value (0-255) of a color written as #rrggbb, #rgb or
+##  rgb(r, g, b), or None for anything else.
+def _red(color):
+    try:
+        if color.startswith("#") and len(color) == 7:
+            return int(color[1:3], 16)
+        if color.startswith("#") and len(color) == 4:
+            return int(color[1] * 2, 16)
+    except ValueError:
+        return None
+    match = _rgb.match(color)
+    if match is not None:
+        return min(int(match.group(1)), 255)
+    return None
+
+## We use a re-defined instance of the HTMLParser class to scan the SVG doc.
+##  It's slower than SvgExpatParser and lowercases tag and attribute names,
+##  but it will shrug off markup that isn't well-formed XML, so it's kept
+##  around as a fallback.
+class SvgParser(SvgHandler, HTMLParser):
+
+    ## constructor
+    def __init__(self):
+        HTMLParser.__init__(self)
+        SvgHandler.__init__(self)
+
+    def close(self):
+        HTMLParser.close(self)
+        self.finish()
+
+## SvgExpatParser scans the SVG doc with expat, which is a good deal faster than
+##  HTMLParser. Elements we have no use for (text, metadata and everything
+##  that belongs to another namespace, like sodipodi:namedview) are skipped
+##  along with everything inside them: expat still scans them and builds
+##  their attribute lists, but startElement() drops them straight away rather
+##  than pairing up the attributes and going through handle_starttag(). It
+##  has the same feed()/close() interface as HTMLParser.
+class SvgExpatParser(SvgHandler):
+
+    ## Elements whose whole subtree is ignored. Anything with a namespace
+    ##  prefix (sodipodi:, inkscape:, rdf: and so on) is ignored too.
+    skipTags = frozenset(["metadata", "title", "desc", "text", "flowRoot",
+                          "style", "script", "foreignObject"])
+
+    ## constructor
+    def __init__(self):
+        SvgHandler.__init__(self)
+        self.skipDepth = 0  ## How deep we are inside an ignored element.
+        self.expat = expat.ParserCreate()
+        self.expat.ordered_attributes = True
+        self.expat.StartElementHandler = self.startElement
+        self.expat.EndElementHandler = self.endElement
+
+    def feed(self, data):
+        self.expat.Parse(data, False)
+
+    def close(self):
+        self.expat.Parse("", True)
+        self.finish()
+
+    ## expat hands us the attributes as a flat [name, value, name, value...]
+    ##  list; handle_starttag() wants (name, value) pairs.
+    def startElement(self, tag, attrs):
+        if self.skipDepth:
+            self.skipDepth += 1
+        elif tag in self.skipTags or ":" in tag:
+            self.skipDepth = 1
+        else:
+            self.handle_starttag(tag, zip(attrs[0::2], attrs[1::2]))
+
+    def endElement(self, tag):
+        if self.skipDepth:
+            self.skipDepth -= 1
+        else:
+            self.handle_endtag(tag)
+
+## The parsers that Converter can be told to use, by name.
+parsers = {"expat": SvgExpatParser, "html": SvgParser}
@@ -0,0 +1,183 @@
+from SVG2SCR import Converter, SCRIPT_HEADER
+from SCRSupport import pathText
+from clip import clipPath
+from SCRCache import MemoryCache
+from SCRStats import ConversionStats
+from union import overlapWarning
+from BatchConvert import findSVGs, scriptNameFor
+import os, sys, time, traceback
+
+## WatchConvert keeps an eye on a set of SVGs and converts each one again as
+##  soon as it's saved, for when the drawing is still being worked on and the
+##  script keeps being re-imported into EAGLE. Between conversions it keeps
+##  everything it knows about each drawing in memory: the flattened points of
+##  every path (in a MemoryCache, see SCRCache.py) and the script text for
+##  each one. A path is only flattened and written again if it has changed,
+##  which is decided by its id and a hash of everything that goes into
+##  converting it (see Converter.cacheKey() in SVG2SCR.py).
+##
+##  Each conversion writes the whole script, as usual. It can also write a
+##  delta script (NAME.delta.scr) that only draws the paths that are new or
+##  have changed since the last conversion. EAGLE can't be told to delete a
+##  path by name, so the delta script lists the ids of the paths that changed
+##  or went away in comments, and the old versions of those have to be removed
+##  by hand (or by running the whole script into a clean layer).
+##
+##  The files are polled rather than waited on, as there's no portable way to
+##  be told about changes to a file from Python.
+
+## WatchedFile is the state kept for one SVG.
+class WatchedFile:
+    ## constructor
+    def __init__(self, filename, scriptName, converter):
+        self.filename = filename
+        self.scriptName = scriptName
+        self.converter = converter
+        self.stamp = None    ## (mtime, size) of the file when last converted.
+        self.texts = None    ## (identity, key) to script text for each path
+                             ##  drawn last time, where 'identity' is the
+                             ##  path's id and the offset it's drawn at, and
+                             ##  'key' its cache key.
+        self.region = None   ## The region the paths were cut off at last
+                             ##  time, if they were; see clip.py.
+        self.warning = None  ## What to say about the last conversion, if
+                             ##  anything; see overlapWarning() in union.py.
+
+    ## changed() reports whether the file has been saved since it was last
+    ##  converted.
+    def changed(self):
+        try:
+            st = os.stat(self.filename)
+        except OSError:
+            return False
+        return (st.st_mtime, st.st_size) != self.stamp
+
+    ## convert() converts the file again and returns a tuple of (number of
+    ##  paths added, number changed, number removed). Paths that are the same
+    ##  as last time reuse last time's points and text.
+    def convert(self, delta=False):
+        st = os.stat(self.filename)
+        self.stamp = (st.st_mtime, st.st_size)
+        converter = self.converter
+        parser = converter.parse(self.filename)
+        drawn = converter.drawnPaths(parser)
+        keys = dict((shape, converter.cacheKey(shape))
+                    for shape, dx, dy, shared in drawn)
+        ## The paths are cut off at the edge of the region here rather than
+        ##  by flattenDrawn(), so that each drawn path still has its own text.
+        pathList = list(converter.flattenDrawn(drawn, parser, clip=False))
+        region = converter.regionOf(parser) if converter.clip else None
+        converter.cache.sweep()
+
+        previous = self.texts or {}
+        previousIds = set(identity for identity, key in previous)
+        texts = {}
+        pieces = []
+        kept = []
+        fresh = []
+        added = updated = 0
+        for (shape, dx, dy, shared), path in zip(drawn, pathList):
+            parts = [path] if region is None else clipPath(path, region)
+            kept.extend(parts)
+            ## A path without an id can only be told apart from the others by
+            ##  its contents, so if it changes it counts as a new one.
+            key = keys[shape]
+            if shape.pathId is None:
+                identity = (None, dx, dy, key)
+            else:
+                identity = (shape.pathId, dx, dy)
+            signature = (identity, key)
+            text = texts.get(signature)
+            if text is None and region == self.region:
+                text = previous.get(signature)
+            if text is None:
+                text = "".join(pathText(part) for part in parts)
+                fresh.append((identity, text))
+                if identity in previousIds:
+                    updated += 1
+                else:
+                    added += 1
+            texts[signature] = text
+            pieces.append(text)
+        currentIds = set(identity for identity, key in texts)
+        removed = [identity for identity in previousIds
+                   if identity not in currentIds]
+
+        ## A grouped, stitched or merged script (see ordering.py, stitch.py
+        ##  and union.py) is put together afresh each time, as any one path
+        ##  can change what becomes of every other one.
+        stats = ConversionStats() if converter.union else None
+        with open(self.scriptName, 'w') as f:
+            if converter.group or converter.stitch or converter.union:
+                converter.write(kept, f, stats)
+            else:
+                f.write(SCRIPT_HEADER)
+                f.write("".join(pieces))
+        if delta and self.texts is not None:
+            with open(deltaName(self.scriptName), 'w') as f:
+                f.write(SCRIPT_HEADER)
+                for identity in sorted(removed, key=str):
+                    f.write("# removed: %s\n" % describe(identity))
+                for identity, text in fresh:
+                    if identity in previousIds:
+                        f.write("# changed: %s\n" % describe(identity))
+                    f.write(text)
+        self.texts = texts
+        self.region = region
+        self.warning = (overlapWarning(stats.counts) if stats is not None
+                        else None)
+        return added, updated, len(removed)
+
+## deltaName() returns the name of the delta script that goes with a script.
+def deltaName(scriptName):
+    return os.path.splitext(scriptName)[0] + ".delta.scr"
+
+## describe() turns a path identity into something readable for a comment.
+def describe(identity):
+    pathId, dx, dy = identity[:3]
+    text = pathId if pathId is not None else "(path without an id)"
+    if dx or dy:
+        text += " at +%g,%g mm" % (dx, dy)
+    return text
+
+## watch() converts every SVG in 'inputs' (files, directories or glob
+##  patterns, as for BatchConvert.py) whenever it changes, until interrupted.
+##  The inputs are looked through again on every poll, so new files are
+##  picked up as they appear. Each conversion gets a line in 'f'.
+def watch(inputs, options=None, outputDir=None, delta=False, interval=0.5,
+          f=sys.stdout):
+    options = options or {}
+    files = {}
+    try:
+        while True:
+            for filename, root in findSVGs(inputs):
+                watched = files.get(filename)
+                if watched is None:
+                    converter = Converter(**options)
+                    converter.cache = MemoryCache(converter.cache)
+                    watched = files[filename] = WatchedFile(
+                        filename, scriptNameFor(filename, root, outputDir),
+                        converter)
+                if not watched.changed():
+                    continue
+                start = time.time()
+                try:
+                    added, updated, removed = watched.convert(delta)
+                except Exception:
+                    ## Most likely the file is only half written; it'll be
+                    ##  tried again once it changes.
+                    error = traceback.format_exc().strip().splitlines()[-1]
+                    f.write("FAIL  %s: %s\n" % (filename, error))
+                else:
+                    f.write("ok    %8.3fs  %s -> %s (%d new, %d changed, "
+                            "%d removed)\n" % (time.time() - start, filename,
+                                               watched.scriptName, added,
+                                               updated, removed))
+                    if watched.warning is not None:
+                        f.write("      %s\n" % watched.warning)
+                f.flush()
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+    for watched in files.values():
+        watched.converter.cache.close()
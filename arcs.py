@@ -0,0 +1,130 @@
+from array import array
+import math
+
+## EAGLE can draw a wire (or polygon edge) as a circular arc in one go: the
+##  segment is given a "curve", the angle in degrees of the arc it follows,
+##  anticlockwise if positive. An EAGLEPath keeps these in its 'bends' array
+##  (see SCRSupport.py).
+##
+##  A flattened curve is a long run of short straight segments. fitArcs() looks
+##  for runs like that whose points all lie within a tolerance of one circular
+##  arc and replaces each with a single curved segment, which shrinks rounded
+##  outlines a great deal. Runs are grown greedily from the start of the path:
+##  a run keeps taking in the next point for as long as all of its points are
+##  still close to the circle through its first, middle and last points, and
+##  still go round that circle steadily in one direction.
+
+## A run has to replace at least this many segments to be worth an arc.
+MIN_SEGMENTS = 3
+
+## EAGLE can't draw a whole circle as one segment, so arcs stop short of that.
+MAX_CURVE = 359.0
+
+## fitArcs() fits arcs to an EAGLEPath in place, to within 'tolerance' mm, and
+##  returns the number of points removed. Segments that are already curved
+##  are kept as they are.
+def fitArcs(eaglePath, tolerance):
+    points = eaglePath.path
+    n = len(points) // 2
+    bends = eaglePath.bends
+    if bends is None:
+        bends = array('d', [0.0]) * n
+    if n <= MIN_SEGMENTS:
+        eaglePath.bends = bends
+        return 0
+    xs = points[0::2]
+    ys = points[1::2]
+    curved = bends if any(bends) else None
+    fitted = array('d', points[0:2])
+    fittedBends = array('d', [0.0])
+    i = 0
+    while i < n - 1:
+        end = i + 1
+        curve = bends[end]
+        ## Checking a run costs as much as the run is long, so rather than
+        ##  growing it a point at a time, the run is grown in bigger and bigger
+        ##  steps until it stops fitting, and then the longest run that fits is
+        ##  narrowed down by bisection.
+        j = i + MIN_SEGMENTS
+        step = 1
+        bad = n
+        while j < n:
+            found = _arcCurve(xs, ys, curved, i, j, tolerance)
+            if found is None:
+                bad = j
+                break
+            end = j
+            curve = found
+            j += step
+            step *= 2
+        if end > i + 1:
+            low = end + 1
+            high = bad - 1
+            while low <= high:
+                j = (low + high) // 2
+                found = _arcCurve(xs, ys, curved, i, j, tolerance)
+                if found is None:
+                    high = j - 1
+                else:
+                    end = j
+                    curve = found
+                    low = j + 1
+        fitted.append(xs[end])
+        fitted.append(ys[end])
+        fittedBends.append(curve)
+        i = end
+    eaglePath.path = fitted
+    eaglePath.bends = fittedBends
+    return n - len(fittedBends)
+
+## _arcCurve() returns the curve of the arc that points 'first' to 'last' lie
+##  on, or None if they don't all lie on one (within 'tolerance' mm), or if
+##  any of the segments between them is already curved ('bends' is None if
+##  none of the path is).
+def _arcCurve(xs, ys, bends, first, last, tolerance):
+    if bends is not None:
+        for k in xrange(first + 1, last + 1):
+            if bends[k]:
+                return None
+    ## The centre of the circle through the first, middle and last points,
+    ##  measured from the first one.
+    middle = (first + last) // 2
+    ax = xs[first]
+    ay = ys[first]
+    bx = xs[middle] - ax
+    by = ys[middle] - ay
+    cx = xs[last] - ax
+    cy = ys[last] - ay
+    d = 2 * (bx*cy - by*cx)
+    if abs(d) < 1e-12:
+        return None             ## In a straight line.
+    b2 = bx*bx + by*by
+    c2 = cx*cx + cy*cy
+    ux = (cy*b2 - by*c2) / d
+    uy = (bx*c2 - cx*b2) / d
+    radius = math.hypot(ux, uy)
+
+    ## Every point has to be on the circle, and every step from one point to
+    ##  the next has to go round it the same way as the arc as a whole (which
+    ##  is anticlockwise if d is positive). Each straight segment also has to
+    ##  stay close to the arc it's replaced by.
+    total = 0.0
+    px = -ux
+    py = -uy
+    for k in xrange(first + 1, last + 1):
+        qx = xs[k] - ax - ux
+        qy = ys[k] - ay - uy
+        if abs(math.hypot(qx, qy) - radius) > tolerance:
+            return None
+        step = math.atan2(px*qy - py*qx, px*qx + py*qy)
+        if step * d <= 0:
+            return None
+        if radius * (1 - math.cos(step / 2)) > tolerance:
+            return None
+        total += step
+        px = qx
+        py = qy
+    curve = math.degrees(total)
+    if abs(curve) > MAX_CURVE:
+        return None
+    return curve
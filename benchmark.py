@@ -0,0 +1,319 @@
+from SVG2SCR import Converter
+from SVGPath import tokenizePath
+from SCRSupport import quantize
+from StringIO import StringIO
+import sys, re, json, time, random, resource, platform, argparse
+import multiprocessing
+
+## benchmark.py times each stage of a conversion on synthetic SVGs, so that a
+##  change to the parser, the curve code or the script writer can be checked
+##  against the revision before it. The drawings are made up on the spot by
+##  generateSVG(), which writes the same kind of file Inkscape does (one layer
+##  group with a translate, paths styled the way SVG2SCR expects), with as many
+##  paths and commands as asked for and any mix of path commands.
+##
+##  The stages timed are:
+##      parse     - scanning the SVG into SVGPath objects (this includes
+##                  tokenizing the path data)
+##      tokenize  - tokenizing the path data on its own (see tokenizePath() in
+##                  SVGPath.py)
+##      flatten   - interpreting the paths and flattening their curves (plus
+##                  simplifying and fitting arcs, if those are turned on)
+##      dedup     - quantizing every point to 0.01mm, which is how repeated
+##                  points are found (see quantize() in SCRSupport.py)
+##      emit      - writing the script, dedup included
+##
+##  Each case is run in a process of its own, so that its peak memory use can
+##  be measured, and each stage is timed a few times with the best time kept.
+##  The results can be written out as JSON and compared with an earlier run:
+##
+##      python benchmark.py --json before.json
+##      (make some changes)
+##      python benchmark.py --json after.json --compare before.json
+
+## Format version of the JSON results.
+VERSION = 1
+
+## The stages, in the order they run.
+STAGES = ("parse", "tokenize", "flatten", "dedup", "emit")
+
+## Every path command generateSVG() can use. 'm' only ever starts a path.
+COMMANDS = "lhvcsqta"
+
+## The standard cases. Each is a set of generateSVG() arguments; 'mix' gives
+##  the relative weight of each command.
+SUITE = [
+    ("lines",    dict(paths=2000, commands=40, mix="l4h1v1", relative=0.5)),
+    ("cubics",   dict(paths=1000, commands=20, mix="c3s1", relative=0.0)),
+    ("relative", dict(paths=1000, commands=20, mix="c3s1", relative=1.0)),
+    ("quads",    dict(paths=1000, commands=20, mix="q3t1", relative=0.5)),
+    ("arcs",     dict(paths=1000, commands=20, mix="a3l1", relative=0.5)),
+    ("mixed",    dict(paths=3000, commands=30, mix="l2c2s1q1t1a1",
+                      relative=0.5)),
+]
+
+## parseMix() turns a mix such as "c3s1l2" into a list of commands to pick
+##  from, each one repeated by its weight (a missing weight counts as 1).
+def parseMix(mix):
+    choices = []
+    for command, weight in re.findall(r"([a-zA-Z])(\d*)", mix):
+        command = command.lower()
+        if command not in COMMANDS:
+            raise ValueError("can't generate '%s' commands" % command)
+        choices.extend([command] * int(weight or 1))
+    if not choices:
+        raise ValueError("empty command mix: %r" % mix)
+    return choices
+
+## generateSVG() returns the text of a synthetic Inkscape-style SVG with
+##  'paths' paths of 'commands' commands each, picked at random from 'mix'.
+##  'relative' is the fraction of paths written with relative commands; the
+##  rest use absolute ones. One path in five is filled (so becomes a POLYGON)
+##  and closed. The same seed always gives the same drawing.
+def generateSVG(paths=1000, commands=20, mix="l2c2s1q1t1a1", relative=0.5,
+                seed=1, size=1000.0):
+    rnd = random.Random(seed)
+    choices = parseMix(mix)
+    out = ['<?xml version="1.0" encoding="UTF-8" standalone="no"?>\n'
+           '<svg xmlns="http://www.w3.org/2000/svg"\n'
+           '   xmlns:inkscape="http://www.inkscape.org/namespaces/inkscape"\n'
+           '   width="%g" height="%g" version="1.1">\n'
+           '  <g inkscape:label="Layer 1" inkscape:groupmode="layer" '
+           'id="layer1" transform="translate(0,%g)">\n'
+           % (size, size, -size / 10)]
+    for n in xrange(paths):
+        filled = rnd.random() < 0.2
+        style = "fill:%s;stroke:#%02x0000;stroke-width:%gpx" % (
+            "#000000" if filled else "none", rnd.choice((1, 16, 20, 21, 22)),
+            rnd.choice((0.5, 1, 2, 3.54)))
+        d = _pathData(rnd, choices, commands, rnd.random() < relative, size)
+        if filled:
+            d += " z"
+        out.append('    <path style="%s" d="%s" id="path%d" '
+                   'inkscape:connector-curvature="0" />\n' % (style, d, n))
+    out.append('  </g>\n</svg>\n')
+    return "".join(out)
+
+## _pathData() makes up the "d" attribute of one path, wandering about the
+##  page from a random starting point.
+def _pathData(rnd, choices, commands, relative, size):
+    x = rnd.uniform(0, size)
+    y = rnd.uniform(0, size)
+    d = ["%s %.3f,%.3f" % ("m" if relative else "M", x, y)]
+    for i in xrange(commands):
+        command = rnd.choice(choices)
+        ## Each step stays within the page, so absolute drawings don't wander
+        ##  off it.
+        nx = min(max(x + rnd.uniform(-40, 40), 0), size)
+        ny = min(max(y + rnd.uniform(-40, 40), 0), size)
+        if command == "h":
+            ny = y
+        elif command == "v":
+            nx = x
+        ox = x if relative else 0
+        oy = y if relative else 0
+        points = []
+        if command in "cq":
+            points.append((x + rnd.uniform(-30, 30), y + rnd.uniform(-30, 30)))
+        if command in "cs":
+            points.append((nx + rnd.uniform(-30, 30),
+                           ny + rnd.uniform(-30, 30)))
+        points.append((nx, ny))
+        if command == "h":
+            args = "%.3f" % (nx - ox)
+        elif command == "v":
+            args = "%.3f" % (ny - oy)
+        elif command == "a":
+            r = rnd.uniform(20, 60)
+            ry = r if rnd.random() < 0.5 else rnd.uniform(20, 60)
+            args = "%.3f,%.3f %d %d,%d %.3f,%.3f" % (
+                r, ry, rnd.choice((0, 30)), rnd.randint(0, 1),
+                rnd.randint(0, 1), nx - ox, ny - oy)
+        else:
+            args = " ".join("%.3f,%.3f" % (px - ox, py - oy)
+                            for px, py in points)
+        d.append("%s %s" % (command if relative else command.upper(), args))
+        x = nx
+        y = ny
+    return " ".join(d)
+
+## timeCase() converts one SVG with the given Converter options, timing each
+##  stage 'repeat' times, and returns its results: the best time for each
+##  stage, the size of the input and output, and the throughput.
+def timeCase(svg, options=None, repeat=3):
+    converter = Converter(**(options or {}))
+    data = re.findall(r'\sd="([^"]*)"', svg)
+    best = dict((stage, None) for stage in STAGES)
+    for i in xrange(repeat):
+        start = time.time()
+        parser = converter.parse(StringIO(svg))
+        parsed = time.time()
+        for d in data:
+            for record in tokenizePath(d):
+                pass
+        tokenized = time.time()
+        pathList = converter.flatten(parser)
+        flattened = time.time()
+        for path in pathList:
+            quantize(path.path)
+        deduped = time.time()
+        script = converter.render(pathList)
+        emitted = time.time()
+        times = {"parse": parsed - start, "tokenize": tokenized - parsed,
+                 "flatten": flattened - tokenized, "dedup": deduped - flattened,
+                 "emit": emitted - deduped}
+        for stage in STAGES:
+            if best[stage] is None or times[stage] < best[stage]:
+                best[stage] = times[stage]
+    ## The conversion itself is parse, flatten and emit; tokenize and dedup
+    ##  are parts of parse and emit timed again on their own.
+    total = best["parse"] + best["flatten"] + best["emit"]
+    return {
+        "paths": len(pathList),
+        "points": sum(len(path) for path in pathList),
+        "inputBytes": len(svg),
+        "outputBytes": len(script),
+        "seconds": dict(best, total=total),
+        "pathsPerSecond": len(pathList) / total if total else None,
+        "megabytesPerSecond": len(svg) / total / 1e6 if total else None,
+    }
+
+## _runCase() generates and times a case in a worker process, and adds the
+##  process's peak memory use to the results.
+def _runCase(job):
+    name, generate, options, repeat = job
+    result = timeCase(generateSVG(**generate), options, repeat)
+    result["generator"] = generate
+    ## ru_maxrss is in kilobytes on Linux, but bytes on Mac OS X.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak /= 1024
+    result["peakMemoryMB"] = peak / 1024.0
+    return name, result
+
+## runSuite() runs each (name, generator arguments) case and returns the whole
+##  set of results, ready to be written out as JSON.
+def runSuite(cases, options=None, repeat=3):
+    try:
+        import numpy
+    except ImportError:
+        numpy = None
+    results = {"version": VERSION, "python": platform.python_version(),
+               "numpy": numpy.__version__ if numpy is not None else None,
+               "options": options or {}, "repeat": repeat, "cases": {}}
+    for case in cases:
+        ## A fresh process for every case, so that one case's memory use
+        ##  doesn't hide the next one's.
+        pool = multiprocessing.Pool(1, maxtasksperchild=1)
+        try:
+            name, result = pool.apply(_runCase,
+                                      ((case[0], case[1], options, repeat),))
+        finally:
+            pool.close()
+            pool.join()
+        results["cases"][name] = result
+    return results
+
+## report() prints a table of results, and if 'baseline' (an earlier set of
+##  results) is given, how each time compares with it: a ratio below 1 is
+##  faster than before.
+def report(results, baseline=None, f=sys.stdout):
+    columns = STAGES + ("total",)
+    f.write("%-10s" % "case" + "".join("%10s" % c for c in columns) +
+            "%10s%10s%10s\n" % ("paths/s", "MB/s", "peak MB"))
+    for name in sorted(results["cases"]):
+        case = results["cases"][name]
+        seconds = case["seconds"]
+        f.write("%-10s" % name +
+                "".join("%10.4f" % seconds[c] for c in columns) +
+                "%10.0f%10.2f%10.1f\n" % (case["pathsPerSecond"] or 0,
+                                          case["megabytesPerSecond"] or 0,
+                                          case["peakMemoryMB"]))
+        if baseline is None or name not in baseline["cases"]:
+            continue
+        before = baseline["cases"][name]
+        if before.get("generator") != case.get("generator"):
+            f.write("%-10s  (generated differently; not compared)\n" % "")
+            continue
+        ratios = []
+        for c in columns:
+            if before["seconds"].get(c):
+                ratios.append("%9.2fx" % (seconds[c] / before["seconds"][c]))
+            else:
+                ratios.append("%10s" % "-")
+        f.write("%-10s" % "  vs base" + "".join(ratios) + "%10s%10s%9.2fx\n"
+                % ("", "", case["peakMemoryMB"] / before["peakMemoryMB"]))
+
+## main() is the command line entry point.
+def main(argv=None):
+    argParser = argparse.ArgumentParser(
+            description="Time each stage of SVG2SCR on synthetic SVGs.")
+    argParser.add_argument("cases", nargs="*", metavar="case",
+            help="standard cases to run (default: all of them): %s"
+                 % ", ".join(name for name, generate in SUITE))
+    argParser.add_argument("--paths", type=int, default=None,
+            help="run a custom case with this many paths instead")
+    argParser.add_argument("--commands", type=int, default=20,
+            help="commands per path in the custom case (default: 20)")
+    argParser.add_argument("--mix", default="l2c2s1q1t1a1",
+            help="commands to use in the custom case, each followed by its "
+                 "weight (default: l2c2s1q1t1a1)")
+    argParser.add_argument("--relative", type=float, default=0.5,
+            help="fraction of paths in the custom case that use relative "
+                 "commands (default: 0.5)")
+    argParser.add_argument("--seed", type=int, default=1,
+            help="random seed for the drawings (default: 1)")
+    argParser.add_argument("-r", "--repeat", type=int, default=3,
+            help="times to run each stage; the best time is kept "
+                 "(default: 3)")
+    argParser.add_argument("--save-svg", default=None, metavar="FILE",
+            help="write the SVG for the first case to FILE and stop")
+    argParser.add_argument("--json", default=None, metavar="FILE",
+            help="write the results to FILE as JSON")
+    argParser.add_argument("--compare", default=None, metavar="FILE",
+            help="compare the results with an earlier --json file")
+    argParser.add_argument("-t", "--tolerance", type=float, default=None,
+            help="passed on to the converter; see SVG2SCR.py")
+    argParser.add_argument("-s", "--simplify", type=float, default=None,
+            help="passed on to the converter; see SVG2SCR.py")
+    argParser.add_argument("-a", "--arcs", type=float, default=None,
+            help="passed on to the converter; see SVG2SCR.py")
+    argParser.add_argument("--parser", default="expat",
+            help="passed on to the converter; see SVG2SCR.py")
+    args = argParser.parse_args(argv)
+
+    options = {"tolerance": args.tolerance, "simplify": args.simplify,
+               "arcs": args.arcs, "parser": args.parser}
+    if args.paths is not None:
+        custom = dict(paths=args.paths, commands=args.commands, mix=args.mix,
+                      relative=args.relative)
+        cases = [("custom", custom)]
+    else:
+        suite = dict(SUITE)
+        unknown = [name for name in args.cases if name not in suite]
+        if unknown:
+            argParser.error("unknown case: %s" % ", ".join(unknown))
+        cases = [(name, generate) for name, generate in SUITE
+                 if not args.cases or name in args.cases]
+    cases = [(name, dict(generate, seed=args.seed))
+             for name, generate in cases]
+
+    if args.save_svg:
+        with open(args.save_svg, 'w') as f:
+            f.write(generateSVG(**cases[0][1]))
+        return 0
+
+    results = runSuite(cases, options, args.repeat)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    report(results, baseline)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,95 +1,300 @@
+from array import array
 import math
 
+## NumPy is optional. When it's available, BezierBatch evaluates every sample
+##  point of every curve in one vectorized pass; when it isn't, we fall back to
+##  the same per-point arithmetic the cubicBezier and quadBezier classes use, so
+##  the output is the same either way.
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+## Every curve gets at least this many segments, no matter how short it is.
+MIN_SEGMENTS = 16
+
+## cubicSegments() works out how many straight segments a cubic Bezier should be
+##  broken into. It approximates the length of the Bezier (the approximation
+##  method is detailed at
+##  http://steve.hollasch.net/cgindex/curves/cbezarclen.html) and uses roughly
+##  one segment per unit of length.
+def cubicSegments(sp, h1, h2, ep):
+    spx = sp[0]
+    spy = sp[1]
+    h1x = h1[0]
+    h1y = h1[1]
+    h2x = h2[0]
+    h2y = h2[1]
+    epx = ep[0]
+    epy = ep[1]
+
+    sph1 = math.sqrt(((spx-h1x)*(spx-h1x)) + ((spy-h1y)*(spy-h1y)))
+    h1h2 = math.sqrt(((h1x-h2x)*(h1x-h2x)) + ((h1y-h2y)*(h1y-h2y)))
+    h2ep = math.sqrt(((h2x-epx)*(h2x-epx)) + ((h2y-epy)*(h2y-epy)))
+    spep = math.sqrt(((spx-epx)*(spx-epx)) + ((spy-epy)*(spy-epy)))
+
+    L1 = sph1 + h1h2 + h2ep
+    L0 = spep
+
+    length = .5*L0 + .5*L1
+
+    segments = int(math.ceil(length))
+    if segments < MIN_SEGMENTS:
+        segments = MIN_SEGMENTS
+    return segments
+
+## quadSegments() is the quadratic equivalent of cubicSegments(). The method
+##  used to determine the length of the Bezier is detailed at
+##  http://segfaultlabs.com/docs/quadratic-bezier-curve-length.
+def quadSegments(sp, h1, ep):
+    h1x = h1[0]
+    h1y = h1[1]
+    epx = ep[0]
+    epy = ep[1]
+
+    ax = sp[0] - 2*h1x + epx
+    ay = sp[1] - 2*h1y + epy
+    bx = -2*sp[0] + 2*h1x
+    by = -2*sp[1] + 2*h1y
+    A = 4*(ax*ax + ay*ay)
+    B = 4*(ax*bx + ay*by)
+    C = bx*bx + by*by
+
+    Sabc = 2*math.sqrt(A+B+C)
+    A2 = math.sqrt(A)
+    C2 = 2*math.sqrt(C)
+    BA = B/A2 if A2 else 0
+
+    ## The formula breaks down when the curve is a straight line with its
+    ##  control point on it (at the start point, say, as it is for a T that
+    ##  doesn't follow another quadratic curve). The length of the control
+    ##  polygon does just as well there.
+    if A2 < 1e-9 or BA + C2 < 1e-9:
+        length = (math.hypot(h1x-sp[0], h1y-sp[1]) +
+                  math.hypot(epx-h1x, epy-h1y))
+    else:
+        A32 = 2*A*A2
+        length = ((A32*Sabc) + ((A2*B)*(Sabc-C2)) + 
+                  ((4*C*A)-(B*B))*math.log(((2*A2)+BA+Sabc)/(BA+C2)))/(4*A32)
+
+    segments = int(math.ceil(length))
+    if segments < MIN_SEGMENTS:
+        segments = MIN_SEGMENTS
+    return segments
+
+## When a tolerance (in the same units as the points, so mm by the time curves
+##  get here) is given, the segment count is instead chosen so that no point on
+##  the curve is further than that from the straight segments standing in for
+##  it. The chord deviation of a curve split evenly in t into n pieces is at
+##  most max|B''|/(8*n*n), and B'' is bounded by the second differences of the
+##  control points, so the count comes from those differences alone: long,
+##  nearly straight curves get a handful of segments and small tight ones get
+##  as many as they need.
+def cubicFlatSegments(sp, h1, h2, ep, tolerance):
+    d1x = sp[0] - 2*h1[0] + h2[0]
+    d1y = sp[1] - 2*h1[1] + h2[1]
+    d2x = h1[0] - 2*h2[0] + ep[0]
+    d2y = h1[1] - 2*h2[1] + ep[1]
+    dd = max(math.sqrt(d1x*d1x + d1y*d1y), math.sqrt(d2x*d2x + d2y*d2y))
+    return max(1, int(math.ceil(math.sqrt(0.75*dd/tolerance))))
+
+def quadFlatSegments(sp, h1, ep, tolerance):
+    dx = sp[0] - 2*h1[0] + ep[0]
+    dy = sp[1] - 2*h1[1] + ep[1]
+    dd = math.sqrt(dx*dx + dy*dy)
+    return max(1, int(math.ceil(math.sqrt(0.25*dd/tolerance))))
+
+## cubicPoints() and quadPoints() do the actual interpolation: they return the
+##  start point followed by 'segments' points evenly spaced in t along the
+##  curve, ending at the end point.
+def cubicPoints(sp, h1, h2, ep, segments):
+    points = [sp]
+    h1x = h1[0]
+    h1y = h1[1]
+    h2x = h2[0]
+    h2y = h2[1]
+    epx = ep[0]
+    epy = ep[1]
+    p = 1.0/segments
+    for pts in range(1,segments+1):
+        t = pts*p
+        u = 1-t
+        tt = t*t
+        uu = u*u
+        uuu = uu * u
+        ttt = tt * t
+        points.append([((uuu*sp[0])+(3*uu*t*h1x)+(3*u*tt*h2x)+(ttt*epx)),
+                       ((uuu*sp[1])+(3*uu*t*h1y)+(3*u*tt*h2y)+(ttt*epy))])
+    return points
+
+def quadPoints(sp, h1, ep, segments):
+    points = [sp]
+    h1x = h1[0]
+    h1y = h1[1]
+    epx = ep[0]
+    epy = ep[1]
+    p = 1.0/segments
+    for pts in range(1,segments+1):
+        t = pts*p
+        u = 1-t
+        tt = t*t
+        uu = u*u
+        points.append([((uu*sp[0])+(2*u*t*h1x)+(tt*epx)),
+                       ((uu*sp[1])+(2*u*t*h1y)+(tt*epy))])
+    return points
+
 ## This class is implemented to create a list of points to interpolate a cubic
 ##  Bezier into a list of sub-lines. It takes as an argument to the
 ##  constructor the four points needed to calculate points within the curve,
-##  approximates the length of the Bezier (the approximation method is detailed
-##  at http://steve.hollasch.net/cgindex/curves/cbezarclen.html; it's the 
+##  approximates the length of the Bezier (see cubicSegments()) and uses that
+##  to decide how many sub-lines to create. If a tolerance is given, the
+##  number of sub-lines is set by cubicFlatSegments() instead.
 class cubicBezier:
     ## constructor
-    def __init__(self, sp, h1, h2, ep):
-        self.list = [sp]
-        spx = sp[0]
-        spy = sp[1]
-        h1x = h1[0]
-        h1y = h1[1]
-        h2x = h2[0]
-        h2y = h2[1]
-        epx = ep[0]
-        epy = ep[1]
-
-        sph1 = math.sqrt(((spx-h1x)*(spx-h1x)) + ((spy-h1y)*(spy-h1y)))
-        h1h2 = math.sqrt(((h1x-h2x)*(h1x-h2x)) + ((h1y-h2y)*(h1y-h2y)))
-        h2ep = math.sqrt(((h2x-epx)*(h2x-epx)) + ((h2y-epy)*(h2y-epy)))
-        spep = math.sqrt(((spx-epx)*(spx-epx)) + ((spy-epy)*(spy-epy)))
-
-        L1 = sph1 + h1h2 + h2ep
-        L0 = spep
-
-        length = .5*L0 + .5*L1
-        error = L1-L0
-        
-        point = [0,0]
-        segments = int(math.ceil(length))
-        if segments < 16:
-            segments = 16
-        p = 1.0/segments
-        ##for pts in range(1,int(math.ceil(length))):
-        for pts in range(1,segments+1):
-            t = pts*p
-            u = 1-t
-            tt = t*t
-            uu = u*u
-            uuu = uu * u
-            ttt = tt * t
-            point[0]=((uuu*sp[0])+(3*uu*t*h1x)+(3*u*tt*h2x)+(ttt*epx))
-            point[1]=((uuu*sp[1])+(3*uu*t*h1y)+(3*u*tt*h2y)+(ttt*epy))
-            self.list.append([point[0],point[1]])
+    def __init__(self, sp, h1, h2, ep, tolerance=None):
+        if tolerance is None:
+            segments = cubicSegments(sp, h1, h2, ep)
+        else:
+            segments = cubicFlatSegments(sp, h1, h2, ep, tolerance)
+        self.list = cubicPoints(sp, h1, h2, ep, segments)
 
 ## This class is implemented to create a list of points to interpolate a 
 ##  quadratic Bezier into a list of sub-lines. It takes as an argument to the
-##  constructor the three points needed to calculate points within the curve.
-##  The method used to determine the length of the Bezier is detailed at
-##  http://segfaultlabs.com/docs/quadratic-bezier-curve-length.
+##  constructor the three points needed to calculate points within the curve,
+##  and an optional tolerance (see quadFlatSegments()).
 class quadBezier:
     ## constructor
-    def __init__(self, sp, h1, ep):
-        self.list = [sp]
-        spx = sp[0]
-        spy = sp[1]
-        h1x = h1[0]
-        h1y = h1[1]
-        epx = ep[0]
-        epy = ep[1]
-
-        ax = sp[0] - 2*h1x + epx
-        ay = sp[1] - 2*h1y + epy
-        bx = -2*sp[0] + 2*h1x
-        by = -2*sp[1] + 2*h1y
-        A = 4*(ax*ax + ay*ay)
-        B = 4*(ax*bx + ay*by)
-        C = bx*bx + by*by
-
-        Sabc = 2*math.sqrt(A+B+C)
-        A2 = math.sqrt(A)
-        A32 = 2*A*A2
-        C2 = 2*math.sqrt(C)
-        BA = B/A2
+    def __init__(self, sp, h1, ep, tolerance=None):
+        if tolerance is None:
+            segments = quadSegments(sp, h1, ep)
+        else:
+            segments = quadFlatSegments(sp, h1, ep, tolerance)
+        self.list = quadPoints(sp, h1, ep, segments)
 
-        length = ((A32*Sabc) + ((A2*B)*(Sabc-C2)) + 
-                  ((4*C*A)-(B*B))*math.log(((2*A2)+BA+Sabc)/(BA+C2)))/(4*A32)
-        
-        point = [0,0]
-        segments = int(math.ceil(length))
-        if segments < 16:
-            segments = 16
-        p = 1.0/segments
-        ##for pts in range(1,int(math.ceil(length))):
-        for pts in range(1,segments+1):
-            t = pts*p
-            u = 1-t
-            tt = t*t
-            uu = u*u
-            point[0]=((uu*sp[0])+(2*u*t*h1x)+(tt*epx))
-            point[1]=((uu*sp[1])+(2*u*t*h1y)+(tt*epy))
-            self.list.append([point[0],point[1]])
+## BezierBatch collects every curve in a path (or a whole document) and then
+##  flattens them all at once. addCubic() and addQuad() return an integer
+##  handle which the caller keeps, along with the place in its point array
+##  where the curve goes; after flatten() has been called, expand() splices
+##  the points of each curve into the point array. The points produced are the
+##  same as cubicBezier and quadBezier would produce for the same curve and
+##  tolerance, but are kept as flat arrays of doubles (X then Y for each point)
+##  rather than lists of lists.
+class BezierBatch:
+    ## constructor
+    def __init__(self, tolerance=None):
+        self.tolerance = tolerance  ## Maximum chord deviation, or None to use
+                                    ##  the length-based segment count.
+        self.cubics = []     ## (sp, h1, h2, ep, handle) for each cubic curve.
+        self.quads = []      ## (sp, h1, ep, handle) for each quadratic curve.
+        self.lists = []      ## Flattened point array for each handle; filled
+                             ##  in by flatten().
+
+    def addCubic(self, sp, h1, h2, ep):
+        handle = len(self.lists)
+        self.cubics.append((sp, h1, h2, ep, handle))
+        self.lists.append(None)
+        return handle
+
+    def addQuad(self, sp, h1, ep):
+        handle = len(self.lists)
+        self.quads.append((sp, h1, ep, handle))
+        self.lists.append(None)
+        return handle
+
+    ## flatten() interpolates every curve added so far. Curves that have
+    ##  already been flattened are left alone, so it's safe to keep adding
+    ##  curves and calling flatten() again.
+    def flatten(self):
+        cubics = [c for c in self.cubics if self.lists[c[-1]] is None]
+        quads = [q for q in self.quads if self.lists[q[-1]] is None]
+        if self.tolerance is None:
+            cubicCounts = [cubicSegments(*c[:4]) for c in cubics]
+            quadCounts = [quadSegments(*q[:3]) for q in quads]
+        else:
+            cubicCounts = [cubicFlatSegments(*(c[:4] + (self.tolerance,)))
+                           for c in cubics]
+            quadCounts = [quadFlatSegments(*(q[:3] + (self.tolerance,)))
+                          for q in quads]
+        if numpy is None:
+            for curve, segments in zip(cubics, cubicCounts):
+                self.lists[curve[-1]] = array('d', [c for point in
+                        cubicPoints(*(curve[:4] + (segments,))) for c in point])
+            for curve, segments in zip(quads, quadCounts):
+                self.lists[curve[-1]] = array('d', [c for point in
+                        quadPoints(*(curve[:3] + (segments,))) for c in point])
+            return
+        if cubics:
+            self._store(cubics, cubicCounts, _cubicSamples)
+        if quads:
+            self._store(quads, quadCounts, _quadSamples)
+
+    ## _store() runs one vectorized evaluation over a set of curves and splits
+    ##  the resulting points back out per curve.
+    def _store(self, curves, counts, samples):
+        control = numpy.array([c[:-1] for c in curves], dtype=float)
+        counts = numpy.array(counts)
+        starts = numpy.cumsum(counts) - counts
+        index = numpy.repeat(numpy.arange(len(curves)), counts)
+        k = numpy.arange(1, int(counts.sum())+1) - numpy.repeat(starts, counts)
+        t = k * (1.0/counts)[index]
+        points = samples(control[index], t).ravel()
+        for curve, start, count in zip(curves, starts.tolist(),
+                                       counts.tolist()):
+            flat = array('d', curve[0])
+            flat.fromstring(points[2*start:2*(start+count)].tostring())
+            self.lists[curve[-1]] = flat
+
+    ## expand() takes a point array and a list of (position, handle) pairs
+    ##  saying where in it each curve belongs, and returns a new point array
+    ##  with the points of every curve spliced in.
+    def expand(self, path, curves):
+        if not curves:
+            return path
+        points = array('d')
+        last = 0
+        for position, handle in curves:
+            points.extend(path[last:position])
+            points.extend(self.lists[handle])
+            last = position
+        points.extend(path[last:])
+        return points
+
+    ## expandBends() builds the bend array (see EAGLEPath in SCRSupport.py)
+    ##  for a path of 'count' points once expand() has spliced its curves in.
+    ##  'arcs' is a list of (position, curve) pairs in the path as it was
+    ##  before, so each position has to be moved along by the points of every
+    ##  curve spliced in ahead of it. Curves themselves are straight segments.
+    def expandBends(self, count, arcs, curves):
+        bends = array('d', [0.0]) * count
+        shift = 0
+        c = 0
+        for position, curve in arcs:
+            while c < len(curves) and curves[c][0] <= position:
+                shift += len(self.lists[curves[c][1]])
+                c += 1
+            bends[(position + shift) // 2] = curve
+        return bends
+
+## Vectorized versions of the arithmetic in cubicPoints() and quadPoints().
+##  'control' is an array of shape (samples, control points, 2) and 't' is the
+##  parameter for each sample. The operations are done in the same order as in
+##  the scalar code so the results match.
+def _cubicSamples(control, t):
+    u = 1-t
+    tt = t*t
+    uu = u*u
+    uuu = uu * u
+    ttt = tt * t
+    return numpy.column_stack(
+        ((uuu*control[:,0,0])+(3*uu*t*control[:,1,0])+
+         (3*u*tt*control[:,2,0])+(ttt*control[:,3,0]),
+         (uuu*control[:,0,1])+(3*uu*t*control[:,1,1])+
+         (3*u*tt*control[:,2,1])+(ttt*control[:,3,1])))
+
+def _quadSamples(control, t):
+    u = 1-t
+    tt = t*t
+    uu = u*u
+    return numpy.column_stack(
+        ((uu*control[:,0,0])+(2*u*t*control[:,1,0])+(tt*control[:,2,0]),
+         (uu*control[:,0,1])+(2*u*t*control[:,1,1])+(tt*control[:,2,1])))
@@ -0,0 +1,254 @@
+from SCRSupport import EAGLEPath
+from PathInterpreter import PathInterpreter
+from array import array
+import math
+
+## Sometimes only part of a drawing is wanted: one board out of a panel, or
+##  whatever falls inside the drawing's own frame. With a region set (see
+##  Converter in SVG2SCR.py), every path is checked against it before it's
+##  flattened, and those that are entirely outside it are dropped there and
+##  then, so they cost no more than the parsing. The check is made with a box
+##  worked out from the path's points and control points (see
+##  PathInterpreter.bounds()), which a path never strays outside of; it's only
+##  worked out once for a path that's drawn many times.
+##
+##  Paths that are partly inside the region are kept whole, unless clipping
+##  is turned on too, in which case they're cut off at its edges: a WIRE is
+##  cut into the pieces that are inside, and a POLYGON is cut down to the
+##  part of it that's inside. A curved segment (see arcs.py) that's entirely
+##  inside is kept as it is; one that crosses the edge is followed with short
+##  straight segments (ARC_STEP degrees each), which are then cut like any
+##  other.
+
+## A region is a box (left, bottom, right, top) in mm, in EAGLE's coordinates.
+##  VIEWBOX stands for the drawing's own frame (see SvgHandler.frame()).
+VIEWBOX = "viewBox"
+
+## How many degrees of a curved segment each straight segment follows, when
+##  it has to be cut.
+ARC_STEP = 5.0
+
+## parseRegion() reads a region from the command line or a query: four
+##  numbers, "left,bottom,right,top" in mm, or "viewbox". It raises ValueError
+##  for anything else.
+def parseRegion(text):
+    if text.strip().lower() == VIEWBOX.lower():
+        return VIEWBOX
+    try:
+        left, bottom, right, top = [float(n) for n in text.split(",")]
+    except ValueError:
+        raise ValueError("region must be 'left,bottom,right,top' in mm or "
+                         "'viewbox': %s" % text)
+    if left >= right or bottom >= top:
+        raise ValueError("region is empty: %s" % text)
+    return (left, bottom, right, top)
+
+## shapeBounds() returns the box that an SVGPath is drawn inside of, or None
+##  if it draws nothing. 'arcs' says whether circular arcs are drawn as arcs.
+def shapeBounds(shape, arcs=False):
+    return PathInterpreter(None, shape.transform, arcs).bounds(shape)
+
+## overlaps() reports whether two boxes have anything in common; inside()
+##  whether the first is entirely within the second.
+def overlaps(box, region):
+    return not (box[0] > region[2] or box[2] < region[0] or
+                box[1] > region[3] or box[3] < region[1])
+
+def inside(box, region):
+    return (box[0] >= region[0] and box[2] <= region[2] and
+            box[1] >= region[1] and box[3] <= region[3])
+
+## pathBox() returns the box around an EAGLEPath, curved segments and all.
+def pathBox(path):
+    if path.bends is not None and any(path.bends):
+        points = _outline(path)
+        xs = [x for x, y in points]
+        ys = [y for x, y in points]
+    else:
+        xs = path.path[0::2]
+        ys = path.path[1::2]
+    return (min(xs), min(ys), max(xs), max(ys))
+
+## clipPath() returns the list of EAGLEPath objects that are left of 'path'
+##  once it's been cut off at the edges of 'region': the path itself if it's
+##  entirely inside, nothing if it's entirely outside.
+def clipPath(path, region):
+    if not len(path):
+        return []
+    box = pathBox(path)
+    if inside(box, region):
+        return [path]
+    if not overlaps(box, region):
+        return []
+    if path.pathType == "POLYGON":
+        return _clipPolygon(path, region)
+    return _clipWire(path, region)
+
+## _clipWire() cuts a WIRE into the pieces of it that are inside the region.
+##  Each segment is cut down to the part inside (if any); where one segment's
+##  part doesn't start where the last one's finished, a new piece starts.
+def _clipWire(path, region):
+    pieces = []
+    piece = None
+    for start, end, bend in _segments(path, region):
+        if bend:
+            cut = (start, end)
+        else:
+            cut = _clipSegment(start, end, region)
+        if cut is None:
+            piece = None
+            continue
+        if piece is None or piece.point(-1) != cut[0]:
+            piece = _newPiece(path)
+            piece.append(*cut[0])
+            piece.bends.append(0.0)
+            pieces.append(piece)
+        piece.append(*cut[1])
+        piece.bends.append(bend)
+    for piece in pieces:
+        if not any(piece.bends):
+            piece.bends = None
+    return [piece for piece in pieces if len(piece) >= 2]
+
+## _clipSegment() returns the part of the segment from 'start' to 'end' that's
+##  inside the region, as a (start, end) pair, or None if none of it is. It's
+##  the Liang-Barsky method: the segment is start + t * (end - start) for t
+##  from 0 to 1, and each edge of the region cuts a bit off one end of that.
+def _clipSegment(start, end, region):
+    x0, y0 = start
+    dx = end[0] - x0
+    dy = end[1] - y0
+    low, high = 0.0, 1.0
+    for p, q in ((-dx, x0 - region[0]), (dx, region[2] - x0),
+                 (-dy, y0 - region[1]), (dy, region[3] - y0)):
+        if not p:
+            if q < 0:
+                return None
+            continue
+        t = q / p
+        if p < 0:
+            low = max(low, t)
+        else:
+            high = min(high, t)
+        if low > high:
+            return None
+    return ((x0 + low*dx, y0 + low*dy) if low > 0 else start,
+            (x0 + high*dx, y0 + high*dy) if high < 1 else end)
+
+## _clipPolygon() cuts a POLYGON down to the part of it inside the region, by
+##  the Sutherland-Hodgman method: the outline is cut by each edge of the
+##  region in turn, keeping what's on the inside of it, with a corner added
+##  wherever the outline crosses the edge. It returns an empty list if
+##  nothing's left.
+def _clipPolygon(path, region):
+    points = _outline(path)
+    closed = len(points) > 1 and points[0] == points[-1]
+    if closed:
+        points.pop()
+    left, bottom, right, top = region
+    for keep, cross in ((lambda p: p[0] >= left,
+                         lambda p, q: _atX(p, q, left)),
+                        (lambda p: p[0] <= right,
+                         lambda p, q: _atX(p, q, right)),
+                        (lambda p: p[1] >= bottom,
+                         lambda p, q: _atY(p, q, bottom)),
+                        (lambda p: p[1] <= top,
+                         lambda p, q: _atY(p, q, top))):
+        kept = []
+        for n, q in enumerate(points):
+            p = points[n - 1]
+            if keep(q):
+                if not keep(p):
+                    kept.append(cross(p, q))
+                kept.append(q)
+            elif keep(p):
+                kept.append(cross(p, q))
+        points = kept
+        if not points:
+            return []
+    if len(points) < 3:
+        return []
+    clipped = _newPiece(path)
+    clipped.bends = None
+    for x, y in points:
+        clipped.append(x, y)
+    if closed:
+        clipped.append(*points[0])
+    return [clipped]
+
+## _segments() yields a (start, end, bend) triple for each segment of a path,
+##  except that a curved segment that isn't entirely inside the region comes
+##  out as the straight segments that follow it.
+def _segments(path, region):
+    points = list(path.points())
+    for n in xrange(1, len(points)):
+        bend = path.bends[n] if path.bends is not None else 0.0
+        if not bend:
+            yield points[n - 1], points[n], 0.0
+            continue
+        arc = _arcPoints(points[n - 1], points[n], bend)
+        if all(_within(point, region) for point in arc):
+            yield points[n - 1], points[n], bend
+            continue
+        for m in xrange(1, len(arc)):
+            yield arc[m - 1], arc[m], 0.0
+
+## _outline() returns the points of a path, with each curved segment followed
+##  by straight segments.
+def _outline(path):
+    points = list(path.points())
+    outline = points[:1]
+    for n in xrange(1, len(points)):
+        bend = path.bends[n] if path.bends is not None else 0.0
+        if bend:
+            outline.extend(_arcPoints(points[n - 1], points[n], bend)[1:])
+        else:
+            outline.append(points[n])
+    return outline
+
+## _arcPoints() returns points along a curved segment from 'start' to 'end'
+##  that curves 'bend' degrees anticlockwise, ARC_STEP degrees apart, from
+##  'start' to 'end' inclusive. The centre is off to the side of the middle of
+##  the segment, by half its length over tan(bend / 2).
+def _arcPoints(start, end, bend):
+    theta = math.radians(bend)
+    dx = end[0] - start[0]
+    dy = end[1] - start[1]
+    offset = 0.5 / math.tan(theta / 2)
+    cx = (start[0] + end[0]) / 2 - dy * offset
+    cy = (start[1] + end[1]) / 2 + dx * offset
+    steps = max(2, int(math.ceil(abs(bend) / ARC_STEP)))
+    points = [start]
+    for n in xrange(1, steps):
+        angle = theta * n / steps
+        cos, sin = math.cos(angle), math.sin(angle)
+        x = start[0] - cx
+        y = start[1] - cy
+        points.append((cx + x*cos - y*sin, cy + x*sin + y*cos))
+    points.append(end)
+    return points
+
+## _atX() and _atY() return where the segment from p to q crosses a vertical
+##  or horizontal line.
+def _atX(p, q, x):
+    t = (x - p[0]) / (q[0] - p[0])
+    return (x, p[1] + t * (q[1] - p[1]))
+
+def _atY(p, q, y):
+    t = (y - p[1]) / (q[1] - p[1])
+    return (p[0] + t * (q[0] - p[0]), y)
+
+## _within() reports whether a point is inside the region.
+def _within(point, region):
+    return (region[0] <= point[0] <= region[2] and
+            region[1] <= point[1] <= region[3])
+
+## _newPiece() returns an empty path of the same type and on the same layer,
+##  and with the same width, as 'template', ready to take bends.
+def _newPiece(template):
+    piece = EAGLEPath()
+    piece.pathType = template.pathType
+    piece.pathWeight = template.pathWeight
+    piece.pathLayer = template.pathLayer
+    piece.bends = array('d')
+    return piece
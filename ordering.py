@@ -0,0 +1,105 @@
+## NumPy is optional; without it the curve index is worked out one path at a
+##  time.
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+## EAGLE spends most of the time it takes to run a script on the number of
+##  commands in it, and a script written in document order switches layer
+##  before every path, even when every path is on the same layer. With
+##  grouping turned on (see writeScript() in SVG2SCR.py), the paths are
+##  sorted into groups that share a layer and a line width, so that each
+##  group needs one LAYER and one CHANGE WIDTH however many paths are in it.
+##
+##  Within a group, paths are put in the order of their first points along a
+##  Hilbert curve: a path that fills a square by visiting every cell of it,
+##  never jumping from one cell to one that isn't next to it. Points that are
+##  close together on the board end up mostly close together in the script,
+##  so the paths are drawn one neighbourhood at a time, and the sort is
+##  O(n log n), where finding the nearest path each time would be O(n^2).
+
+## The Hilbert curve covers a grid of 2^ORDER by 2^ORDER cells spread over
+##  the group's bounding box.
+ORDER = 16
+
+## groupPaths() sorts a list of EAGLEPath objects into groups and returns a
+##  list of (layer, width, paths) tuples, where 'width' is the line width as
+##  it's written in the script (so that widths that would be written the
+##  same go together). The layers come in the order each is first used in
+##  the document, and so do the widths within each layer; the paths in each
+##  group are in Hilbert curve order.
+def groupPaths(pathList):
+    groups = {}     ## (layer, width) to the paths in that group.
+    layers = []     ## The layers, in order of first use...
+    widths = {}     ## ...and for each one, its widths in order of first use.
+    for path in pathList:
+        width = '{:.3f}'.format(path.pathWeight)
+        group = groups.get((path.pathLayer, width))
+        if group is None:
+            group = groups[(path.pathLayer, width)] = []
+            if path.pathLayer not in widths:
+                layers.append(path.pathLayer)
+                widths[path.pathLayer] = []
+            widths[path.pathLayer].append(width)
+        group.append(path)
+    return [(layer, width, spatialOrder(groups[(layer, width)]))
+            for layer in layers for width in widths[layer]]
+
+## spatialOrder() returns a list of EAGLEPath objects sorted by where their
+##  first points fall on a Hilbert curve over their bounding box. Paths with
+##  no points go first. The sort is stable, so paths that start in the same
+##  cell stay in document order.
+def spatialOrder(paths):
+    empty = [path for path in paths if not len(path)]
+    paths = [path for path in paths if len(path)]
+    if len(paths) < 3:
+        return empty + paths
+    xs = [path.path[0] for path in paths]
+    ys = [path.path[1] for path in paths]
+    index = hilbertIndex(xs, ys)
+    order = sorted(xrange(len(paths)), key=index.__getitem__)
+    return empty + [paths[i] for i in order]
+
+## hilbertIndex() returns the distance along the Hilbert curve of each point
+##  (xs[i], ys[i]), with the curve stretched over the points' bounding box.
+def hilbertIndex(xs, ys):
+    side = (1 << ORDER) - 1
+    left, bottom = min(xs), min(ys)
+    span = max(max(xs) - left, max(ys) - bottom) or 1.0
+    scale = side / span
+    if numpy is not None:
+        x = ((numpy.array(xs) - left) * scale).astype(numpy.int64)
+        y = ((numpy.array(ys) - bottom) * scale).astype(numpy.int64)
+        d = numpy.zeros(len(xs), dtype=numpy.int64)
+        s = 1 << (ORDER - 1)
+        while s:
+            rx = (x & s) > 0
+            ry = (y & s) > 0
+            d += s * s * ((3 * rx) ^ ry)
+            ## Rotate the quadrant so that the curve inside it joins up.
+            flip = ~ry
+            swap = flip & rx
+            x = numpy.where(swap, side - x, x)
+            y = numpy.where(swap, side - y, y)
+            x, y = numpy.where(flip, y, x), numpy.where(flip, x, y)
+            s >>= 1
+        return d.tolist()
+    index = []
+    for px, py in zip(xs, ys):
+        x = int((px - left) * scale)
+        y = int((py - bottom) * scale)
+        d = 0
+        s = 1 << (ORDER - 1)
+        while s:
+            rx = 1 if x & s else 0
+            ry = 1 if y & s else 0
+            d += s * s * ((3 * rx) ^ ry)
+            if not ry:
+                if rx:
+                    x = side - x
+                    y = side - y
+                x, y = y, x
+            s >>= 1
+        index.append(d)
+    return index
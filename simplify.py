@@ -0,0 +1,317 @@
+from array import array
+import math
+
+## As in beziers.py, NumPy is optional; with it, each step of Douglas-Peucker
+##  measures all of the points in a run in one vectorized pass.
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+## Curve flattening (and some drawings all by themselves) leave long runs of
+##  points that are collinear, or near enough as makes no difference at the
+##  0.01mm resolution of an EAGLE script. simplifyPath() thins those out with the
+##  Douglas-Peucker algorithm: a run of points is replaced by the straight line
+##  between its ends unless some point in the run is further than the tolerance
+##  from that line, in which case the run is split at the furthest point and
+##  both halves are tried again.
+##
+##  Closed outlines (all POLYGONs, and WIREs that end where they start) are
+##  treated as rings, so the simplified shape still closes on itself. A
+##  POLYGON is never allowed to collapse to less than a triangle, or to come
+##  out self-intersecting unless it was already: if simplifying at the full
+##  tolerance would do that, smaller tolerances are tried, and if none of those
+##  work either, the path is left alone.
+##
+##  A path with curved segments (see arcs.py) keeps both ends of every curved
+##  segment, and only the straight runs between them are thinned out. Curved
+##  POLYGONs are left alone, since there's no cheap way to be sure thinning
+##  them wouldn't make their edges cross.
+
+## How many times the tolerance is halved before giving up on a polygon.
+RETRIES = 4
+
+## simplifyPath() simplifies an EAGLEPath in place, to within 'tolerance' mm,
+##  and returns the number of points removed.
+def simplifyPath(eaglePath, tolerance):
+    points = eaglePath.path
+    n = len(points) // 2
+    if n < 3 or not tolerance:
+        return 0
+    bends = eaglePath.bends
+    if bends is not None:
+        if any(bends):
+            if eaglePath.pathType == "POLYGON":
+                return 0
+            return _simplifyBent(eaglePath, tolerance)
+        eaglePath.bends = None
+        removed = simplifyPath(eaglePath, tolerance)
+        eaglePath.bends = array('d', [0.0]) * len(eaglePath)
+        return removed
+    ## Curves start on the point the path was already at, so there are plenty
+    ##  of exact repeats; they're dropped first so they can't look like
+    ##  zero-length edges later on.
+    xs = array('d')
+    ys = array('d')
+    for i in xrange(0, 2*n, 2):
+        if i == 0 or points[i] != xs[-1] or points[i+1] != ys[-1]:
+            xs.append(points[i])
+            ys.append(points[i+1])
+    if len(xs) < 3:
+        return 0
+    closed = xs[0] == xs[-1] and ys[0] == ys[-1]
+    polygon = eaglePath.pathType == "POLYGON"
+
+    if not (closed or polygon):
+        keep = _simplifyOpen(xs, ys, tolerance*tolerance)
+    else:
+        ## The closing point is dropped while we work on the ring and put
+        ##  back afterwards.
+        if closed:
+            xs = xs[:-1]
+            ys = ys[:-1]
+        if len(xs) < 4:
+            return 0
+        crossed = None      ## Whether the original crosses itself; only
+                            ##  worked out if we need to know.
+        for attempt in range(RETRIES + 1):
+            keep = _simplifyRing(xs, ys, tolerance*tolerance)
+            if not polygon:
+                break
+            valid = _validPolygon(xs, ys, keep)
+            if valid is True:
+                break
+            if valid is None:
+                if crossed is None:
+                    crossed = selfIntersects(xs, ys)
+                if crossed:
+                    break
+            tolerance = tolerance / 2
+        else:
+            return 0
+        if closed:
+            keep.append(0)
+
+    simplified = array('d')
+    for i in keep:
+        simplified.append(xs[i])
+        simplified.append(ys[i])
+    eaglePath.path = simplified
+    return n - len(keep)
+
+## _simplifyBent() simplifies a path with curved segments in it, keeping the
+##  ends of each of them.
+def _simplifyBent(eaglePath, tolerance):
+    points = eaglePath.path
+    bends = eaglePath.bends
+    n = len(bends)
+    xs = array('d')
+    ys = array('d')
+    bs = array('d')
+    for i in xrange(n):
+        x = points[2*i]
+        y = points[2*i+1]
+        if xs and x == xs[-1] and y == ys[-1] and not bends[i]:
+            continue
+        xs.append(x)
+        ys.append(y)
+        bs.append(bends[i])
+    keep = [False] * len(xs)
+    keep[0] = keep[-1] = True
+    for i in xrange(1, len(xs)):
+        if bs[i]:
+            keep[i-1] = keep[i] = True
+    fixed = [i for i in xrange(len(xs)) if keep[i]]
+    for a, b in zip(fixed, fixed[1:]):
+        _douglasPeucker(xs, ys, a, b, tolerance*tolerance, keep)
+    simplified = array('d')
+    simplifiedBends = array('d')
+    for i in xrange(len(xs)):
+        if keep[i]:
+            simplified.append(xs[i])
+            simplified.append(ys[i])
+            simplifiedBends.append(bs[i])
+    eaglePath.path = simplified
+    eaglePath.bends = simplifiedBends
+    return n - len(simplifiedBends)
+
+## _simplifyOpen() returns the indices of the points to keep in an open
+##  polyline, in order. 'tolerance2' is the square of the tolerance.
+def _simplifyOpen(xs, ys, tolerance2):
+    keep = [False] * len(xs)
+    keep[0] = keep[-1] = True
+    _douglasPeucker(xs, ys, 0, len(xs) - 1, tolerance2, keep)
+    return [i for i in xrange(len(xs)) if keep[i]]
+
+## _simplifyRing() does the same for a closed ring (without a repeated closing
+##  point). The ring is split into two chains at the point furthest from the
+##  first one, and each chain is simplified on its own.
+def _simplifyRing(xs, ys, tolerance2):
+    n = len(xs)
+    x0 = xs[0]
+    y0 = ys[0]
+    far = max(xrange(n), key=lambda i: (xs[i]-x0)**2 + (ys[i]-y0)**2)
+    ## Index n stands for point 0 again, at the end of the second chain.
+    xs = xs + xs[0:1]
+    ys = ys + ys[0:1]
+    keep = [False] * (n + 1)
+    keep[0] = keep[far] = True
+    _douglasPeucker(xs, ys, 0, far, tolerance2, keep)
+    _douglasPeucker(xs, ys, far, n, tolerance2, keep)
+    ## A ring thinner than the tolerance comes out as just those two points;
+    ##  the point furthest from the line between them is kept as well, so
+    ##  that there's still a triangle.
+    if keep.count(True) < 3:
+        dx = xs[far] - x0
+        dy = ys[far] - y0
+        keep[max(xrange(1, n), key=lambda i: abs(
+                (xs[i]-x0)*dy - (ys[i]-y0)*dx))] = True
+    return [i for i in xrange(n) if keep[i]]
+
+## _douglasPeucker() marks the points between 'first' and 'last' that must be
+##  kept. It uses its own stack rather than recursion so that long runs of
+##  points can't hit Python's recursion limit.
+def _douglasPeucker(xs, ys, first, last, tolerance2, keep):
+    if numpy is not None:
+        return _douglasPeuckerVectorized(numpy.frombuffer(xs),
+                                         numpy.frombuffer(ys),
+                                         first, last, tolerance2, keep)
+    stack = [(first, last)]
+    while stack:
+        a, b = stack.pop()
+        if b - a < 2:
+            continue
+        ax = xs[a]
+        ay = ys[a]
+        dx = xs[b] - ax
+        dy = ys[b] - ay
+        length2 = dx*dx + dy*dy
+        worst = tolerance2
+        index = None
+        for i in xrange(a + 1, b):
+            px = xs[i] - ax
+            py = ys[i] - ay
+            ## Distance from the point to the segment (not the infinite line)
+            ##  between the ends of the run.
+            if length2:
+                t = (px*dx + py*dy) / length2
+                if t < 0:
+                    t = 0
+                elif t > 1:
+                    t = 1
+                px -= t*dx
+                py -= t*dy
+            d2 = px*px + py*py
+            if d2 > worst:
+                worst = d2
+                index = i
+        if index is not None:
+            keep[index] = True
+            stack.append((a, index))
+            stack.append((index, b))
+
+## The same thing, with the distances for each run measured all at once.
+def _douglasPeuckerVectorized(xs, ys, first, last, tolerance2, keep):
+    stack = [(first, last)]
+    while stack:
+        a, b = stack.pop()
+        if b - a < 2:
+            continue
+        ax = xs[a]
+        ay = ys[a]
+        dx = xs[b] - ax
+        dy = ys[b] - ay
+        length2 = dx*dx + dy*dy
+        px = xs[a+1:b] - ax
+        py = ys[a+1:b] - ay
+        if length2:
+            t = numpy.clip((px*dx + py*dy) / length2, 0, 1)
+            px = px - t*dx
+            py = py - t*dy
+        d2 = px*px + py*py
+        i = int(d2.argmax())
+        if d2[i] > tolerance2:
+            index = a + 1 + i
+            keep[index] = True
+            stack.append((a, index))
+            stack.append((index, b))
+
+## _validPolygon() checks that the kept points of a ring still make a sensible
+##  polygon. It returns False if it has collapsed (fewer than three corners or
+##  no area), None if its edges cross, and True if all is well.
+def _validPolygon(xs, ys, keep):
+    if len(keep) < 3:
+        return False
+    px = [xs[i] for i in keep]
+    py = [ys[i] for i in keep]
+    area = 0.0
+    for i in xrange(len(px)):
+        area += px[i-1]*py[i] - px[i]*py[i-1]
+    if abs(area) < 1e-9:
+        return False
+    if selfIntersects(px, py):
+        return None
+    return True
+
+## selfIntersects() reports whether any two non-adjacent edges of the closed
+##  ring (px, py) touch or cross. Edges are bucketed into a grid of cells
+##  about the size of an average edge, so only edges that share a cell are
+##  tested against each other.
+def selfIntersects(px, py):
+    n = len(px)
+    minX = min(px)
+    minY = min(py)
+    span = max(max(px) - minX, max(py) - minY)
+    cell = span / max(1, int(math.sqrt(n))) or 1.0
+    grid = {}
+    for i in xrange(n):
+        j = (i + 1) % n
+        x0 = int((min(px[i], px[j]) - minX) / cell)
+        x1 = int((max(px[i], px[j]) - minX) / cell)
+        y0 = int((min(py[i], py[j]) - minY) / cell)
+        y1 = int((max(py[i], py[j]) - minY) / cell)
+        for cx in xrange(x0, x1 + 1):
+            for cy in xrange(y0, y1 + 1):
+                grid.setdefault((cx, cy), []).append(i)
+    tested = set()
+    for edges in grid.itervalues():
+        for a in xrange(len(edges)):
+            for b in xrange(a + 1, len(edges)):
+                i = edges[a]
+                j = edges[b]
+                if i > j:
+                    i, j = j, i
+                ## Neighbouring edges always share a corner; skip them.
+                if j - i == 1 or (i == 0 and j == n - 1):
+                    continue
+                if (i, j) in tested:
+                    continue
+                tested.add((i, j))
+                if _segmentsCross(px[i], py[i], px[(i+1) % n], py[(i+1) % n],
+                                  px[j], py[j], px[(j+1) % n], py[(j+1) % n]):
+                    return True
+    return False
+
+## _segmentsCross() reports whether segment (a, b) and segment (c, d) touch or
+##  cross, using the signs of the turns between their ends.
+def _segmentsCross(ax, ay, bx, by, cx, cy, dx, dy):
+    d1 = _turn(cx, cy, dx, dy, ax, ay)
+    d2 = _turn(cx, cy, dx, dy, bx, by)
+    d3 = _turn(ax, ay, bx, by, cx, cy)
+    d4 = _turn(ax, ay, bx, by, dx, dy)
+    if ((d1 > 0 and d2 < 0) or (d1 < 0 and d2 > 0)) and \
+       ((d3 > 0 and d4 < 0) or (d3 < 0 and d4 > 0)):
+        return True
+    return ((d1 == 0 and _within(cx, cy, dx, dy, ax, ay)) or
+            (d2 == 0 and _within(cx, cy, dx, dy, bx, by)) or
+            (d3 == 0 and _within(ax, ay, bx, by, cx, cy)) or
+            (d4 == 0 and _within(ax, ay, bx, by, dx, dy)))
+
+def _turn(ax, ay, bx, by, cx, cy):
+    return (bx - ax)*(cy - ay) - (by - ay)*(cx - ax)
+
+## _within() reports whether (px, py), known to be on the line through (a, b),
+##  lies on the segment between them.
+def _within(ax, ay, bx, by, px, py):
+    return (min(ax, bx) <= px <= max(ax, bx) and
+            min(ay, by) <= py <= max(ay, by))
@@ -0,0 +1,162 @@
+from SCRSupport import EAGLEPath, quantize, keyHundredths
+from simplify import selfIntersects
+from array import array
+
+## Artwork that's been through Inkscape's "Break Apart" (see the README) is
+##  mostly lots of short open paths, each ending where the next begins, and
+##  each one would be a WIRE command of its own that starts by repeating the
+##  point the last one finished on. stitchWires() joins WIREs like that into
+##  chains, each drawn with a single WIRE command.
+##
+##  Two WIREs can be joined if they're on the same layer, have the same width
+##  (as written in the script) and an end of one comes out at the same 0.01mm
+##  as an end of the other. The ends are found through a dictionary keyed on
+##  those rounded coordinates, so it takes one pass however many WIREs there
+##  are. Chains are built greedily: starting from each WIRE that isn't in a
+##  chain yet, in document order, the chain is carried on from its last point
+##  for as long as some other WIRE meets it there, turning that WIRE round if
+##  it has to, and then the same is done backwards from its first point.
+##  POLYGONs are left alone, as is anything that would have to be joined to
+##  itself.
+##
+##  A chain that comes back round to where it started is an outline that was
+##  broken apart, and is drawn as a POLYGON, as long as it makes a proper one:
+##  at least three corners, some area, no edges that cross, and no curved
+##  edges (see arcs.py), whose crossings aren't checked. Otherwise it stays a
+##  WIRE.
+
+## stitchWires() returns the list of EAGLEPath objects with the WIREs in
+##  'pathList' joined into chains. Each chain takes the place of the first of
+##  its WIREs in the document; everything else keeps its place. The number of
+##  WIREs joined on to others is counted in 'stats' if it's given.
+def stitchWires(pathList, stats=None):
+    pathList = list(pathList)
+    starts = {}     ## Index of each WIRE to the key of its first point...
+    finishes = {}   ## ...and of its last.
+    ends = {}       ## Key of a point to the indexes of the WIREs ending there.
+    ## The ends of every WIRE are rounded all in one go.
+    wires = [i for i, path in enumerate(pathList)
+             if path.pathType == "WIRE" and len(path) >= 2]
+    corners = array('d')
+    for i in wires:
+        corners.extend(pathList[i].path[:2])
+        corners.extend(pathList[i].path[-2:])
+    keys = [keyHundredths(k) for k in quantize(corners)]
+    for n, i in enumerate(wires):
+        path = pathList[i]
+        group = (path.pathLayer, '{:.3f}'.format(path.pathWeight))
+        starts[i] = group + tuple(keys[4*n:4*n+2])
+        finishes[i] = group + tuple(keys[4*n+2:4*n+4])
+        ends.setdefault(starts[i], []).append(i)
+        if finishes[i] != starts[i]:
+            ends.setdefault(finishes[i], []).append(i)
+    ## Each list is used from the end, so turn them round to try WIREs in
+    ##  document order.
+    for indexes in ends.itervalues():
+        indexes.reverse()
+
+    used = set()
+    stitched = []
+    joined = 0
+    closed = 0
+    for i, path in enumerate(pathList):
+        if i not in starts:
+            stitched.append(path)
+            continue
+        if i in used:
+            continue
+        used.add(i)
+        ## Carry the chain on from its last point...
+        after = []
+        key = finishes[i]
+        j = _nextWire(ends, key, used)
+        while j is not None:
+            used.add(j)
+            if starts[j] == key:
+                after.append(pathList[j])
+                key = finishes[j]
+            else:
+                after.append(pathList[j].reversed())
+                key = starts[j]
+            j = _nextWire(ends, key, used)
+        last = key
+        ## ...and back from its first.
+        before = []
+        key = starts[i]
+        j = _nextWire(ends, key, used)
+        while j is not None:
+            used.add(j)
+            if finishes[j] == key:
+                before.append(pathList[j])
+                key = starts[j]
+            else:
+                before.append(pathList[j].reversed())
+                key = finishes[j]
+            j = _nextWire(ends, key, used)
+        chain = before[::-1] + [path] + after
+        if len(chain) == 1:
+            stitched.append(path)
+        else:
+            wire = joinWires(chain)
+            if key == last and _closedPolygon(wire):
+                wire.pathType = "POLYGON"
+                closed += 1
+            stitched.append(wire)
+            joined += len(chain) - 1
+    if stats is not None:
+        stats.add("wiresStitched", joined)
+        stats.add("wiresClosed", closed)
+    return stitched
+
+## _nextWire() returns the index of a WIRE not yet used that ends at 'key', or
+##  None if there isn't one. Used WIREs are dropped from the list as they're
+##  come across, so each is only ever looked at once more.
+def _nextWire(ends, key, used):
+    indexes = ends.get(key)
+    while indexes:
+        if indexes[-1] not in used:
+            return indexes[-1]
+        indexes.pop()
+    return None
+
+## _closedPolygon() reports whether a WIRE that ends where it starts makes a
+##  proper POLYGON (see above).
+def _closedPolygon(wire):
+    if wire.bends is not None and any(wire.bends):
+        return False
+    px = wire.path[0:-2:2]
+    py = wire.path[1:-2:2]
+    if len(px) < 3:
+        return False
+    area = 0.0
+    for i in xrange(len(px)):
+        area += px[i-1]*py[i] - px[i]*py[i-1]
+    if abs(area) < 1e-9:
+        return False
+    return not selfIntersects(px, py)
+
+## joinWires() returns a single WIRE drawing the WIREs in 'chain' one after
+##  the other, each starting where the last one finished. The first point of
+##  each after the first is left out, as it's the last point of the one
+##  before.
+def joinWires(chain):
+    first = chain[0]
+    joined = EAGLEPath()
+    joined.pathType = first.pathType
+    joined.pathWeight = first.pathWeight
+    joined.pathLayer = first.pathLayer
+    joined.path = array('d', first.path)
+    curved = any(wire.bends is not None for wire in chain)
+    if curved:
+        joined.bends = _bends(first)
+    for wire in chain[1:]:
+        joined.path.extend(wire.path[2:])
+        if curved:
+            joined.bends.extend(_bends(wire)[1:])
+    return joined
+
+## _bends() returns the bends of a path, all 0 if it has none.
+def _bends(path):
+    if path.bends is not None:
+        return array('d', path.bends)
+    return array('d', [0.0]) * len(path)
@@ -0,0 +1,81 @@
+import os, sys, re, unittest
+from array import array
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from SVG2SCR import Converter
+from SCRSupport import EAGLEPath, pathText
+
+## drawing() returns an SVG with one arc in it, of radius 20px from (10, 50)
+##  to (30, 50), with the given flags, inside a group with 'transform'.
+def drawing(large, sweep, transform=""):
+    return ('<svg xmlns="http://www.w3.org/2000/svg" height="100">'
+            '<g transform="%s"><path d="M10 50 A 20 20 0 %d %d 30 50" '
+            'style="fill:none;stroke:#150000"/></g></svg>'
+            % (transform, large, sweep))
+
+## bends() converts an SVG, drawing arcs, and returns the bends written in
+##  front of its points, as text.
+def bends(svg):
+    script = Converter(arcs=0.05).convertText(svg)
+    return re.findall(r"^([-+][0-9.]+) \(", script, re.M)
+
+## The arc is a sixth of its circle, or five sixths with the large arc flag.
+##  The sweep flag draws it clockwise as it's seen, which is a negative bend
+##  in EAGLE, since EAGLE's Y axis goes up where SVG's goes down.
+class ArcFlagTest(unittest.TestCase):
+    def testSmallAnticlockwise(self):
+        self.assertEqual(bends(drawing(0, 0)), ["+60.00"])
+
+    def testSmallClockwise(self):
+        self.assertEqual(bends(drawing(0, 1)), ["-60.00"])
+
+    def testLargeAnticlockwise(self):
+        self.assertEqual(bends(drawing(1, 0)), ["+300.00"])
+
+    def testLargeClockwise(self):
+        self.assertEqual(bends(drawing(1, 1)), ["-300.00"])
+
+class ArcTransformTest(unittest.TestCase):
+    ## Turning the arc round or making it bigger doesn't change its bend.
+    def testRotatedAndScaled(self):
+        for large in (0, 1):
+            for sweep in (0, 1):
+                self.assertEqual(
+                    bends(drawing(large, sweep, "rotate(30) scale(3)")),
+                    bends(drawing(large, sweep)))
+
+    ## Turning it over does: what was clockwise is now anticlockwise.
+    def testMirrored(self):
+        self.assertEqual(bends(drawing(0, 1, "scale(-1,1)")), ["+60.00"])
+        self.assertEqual(bends(drawing(1, 0, "scale(1,-1)")), ["-300.00"])
+
+    ## A transform that squashes the circle into an ellipse leaves an arc
+    ##  that EAGLE can't draw, so it's a straight segment.
+    def testStretched(self):
+        script = Converter(arcs=0.05).convertText(
+            drawing(0, 0, "scale(2,1)"))
+        self.assertEqual(bends(drawing(0, 0, "scale(2,1)")), [])
+        self.assertEqual(script, Converter().convertText(
+            drawing(0, 0, "scale(2,1)")))
+
+    ## As does an arc whose two radii differ.
+    def testElliptical(self):
+        svg = drawing(0, 0).replace("A 20 20", "A 20 10")
+        self.assertEqual(bends(svg), [])
+
+## pathText() writes each bend with its sign in front of the point it ends
+##  at, and leaves out bends too small to show at 0.01 degrees.
+class PathTextTest(unittest.TestCase):
+    def testBends(self):
+        path = EAGLEPath()
+        path.pathType = "WIRE"
+        for x, y in ((0, 0), (10, 0), (10, 10), (0, 10)):
+            path.append(x, y)
+        path.bends = array('d', [0.0, 90.0, -12.5, 0.004])
+        self.assertEqual(pathText(path, header=False),
+                         "WIRE\n(0.00 0.00)\n+90.00 (10.00 0.00)\n"
+                         "-12.50 (10.00 10.00)\n(0.00 10.00)\n;\n")
+
+if __name__ == "__main__":
+    unittest.main()
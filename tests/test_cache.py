@@ -0,0 +1,98 @@
+import os, sys, shutil, tempfile, unittest
+from array import array
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import SCRCache
+from SCRCache import PathCache
+from SCRStats import ConversionStats
+from SVG2SCR import Converter
+
+DRAWING = """<svg xmlns="http://www.w3.org/2000/svg" height="100">
+<path d="M10 10 C 40 10 60 60 90 60" style="fill:none;stroke:#150000"/>
+<path d="M10 90 L 90 90 L 50 50 z" style="fill:#000;stroke:#150000"/>
+</svg>"""
+
+## points() returns a point array of 'count' doubles.
+def points(count, value=1.0):
+    return array('d', [value]) * count
+
+class PathCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, "paths.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    ## convert() converts DRAWING with a cache and returns the script and
+    ##  the number of paths found in the cache.
+    def convert(self, **options):
+        stats = ConversionStats()
+        converter = Converter(cache=self.filename, **options)
+        script = converter.convertText(DRAWING, stats)
+        converter.cache.close()
+        return script, stats.counts.get("cacheHits", 0)
+
+    def testHitsAndMisses(self):
+        cache = PathCache(self.filename)
+        cache.put([("a", points(4, 2.0)), ("b", points(6))])
+        found = cache.get(["a", "c"])
+        self.assertEqual(found.keys(), ["a"])
+        self.assertEqual(found["a"], points(4, 2.0))
+        cache.close()
+
+    def testSecondRunHits(self):
+        first, hits = self.convert()
+        self.assertEqual(hits, 0)
+        second, hits = self.convert()
+        self.assertEqual(hits, 2)
+        self.assertEqual(second, first)
+
+    ## Each option that changes how a path is flattened gets it a key of its
+    ##  own, so a change to any of them misses.
+    def testOptionsChangeKeys(self):
+        self.convert()
+        for options in (dict(tolerance=0.5), dict(simplify=0.1),
+                        dict(arcs=0.05)):
+            script, hits = self.convert(**options)
+            self.assertEqual(hits, 0, options)
+            script, hits = self.convert(**options)
+            self.assertEqual(hits, 2, options)
+
+    ## Points cached by an older version are never used.
+    def testVersionChangeMisses(self):
+        self.convert()
+        version = SCRCache.VERSION
+        SCRCache.VERSION = version + 1
+        try:
+            script, hits = self.convert()
+        finally:
+            SCRCache.VERSION = version
+        self.assertEqual(hits, 0)
+
+    ## The least recently used paths go first, and the running total always
+    ##  matches what's actually in the cache.
+    def testEviction(self):
+        cache = PathCache(self.filename, maxBytes=200)
+        cache.put([("a", points(10)), ("b", points(10))])
+        cache.get(["a"])
+        cache.put([("c", points(10))])
+        self.assertEqual(sorted(cache.get(["a", "b", "c"])), ["a", "c"])
+        cache.put([("c", points(12))])
+        self.assertEqual(cache.size(), 176)
+        total = cache.connect().execute("SELECT SUM(size) FROM paths")
+        self.assertEqual(total.fetchone()[0], cache.size())
+        cache.close()
+
+    ## A cache made before the total was kept has it added up when opened.
+    def testOldCacheCounted(self):
+        cache = PathCache(self.filename)
+        cache.put([("a", points(10)), ("b", points(5))])
+        cache.connect().execute("DROP TABLE cacheSize")
+        cache.connect().commit()
+        cache.close()
+        self.assertEqual(PathCache(self.filename).size(), 120)
+
+if __name__ == "__main__":
+    unittest.main()
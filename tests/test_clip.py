@@ -0,0 +1,176 @@
+import os, sys, unittest
+from StringIO import StringIO
+from array import array
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from SVG2SCR import Converter
+from SCRSupport import EAGLEPath
+from transforms import PX_PER_MM
+from clip import clipPath, pathBox, shapeBounds, inside
+
+REGION = (0.0, 0.0, 10.0, 10.0)
+
+## path() returns a WIRE (or POLYGON) through the given (x, y) points.
+def path(points, pathType="WIRE", bends=None):
+    eaglePath = EAGLEPath()
+    eaglePath.pathType = pathType
+    eaglePath.pathLayer = 21
+    eaglePath.pathWeight = 0.1
+    for x, y in points:
+        eaglePath.append(x, y)
+    if bends is not None:
+        eaglePath.bends = array('d', bends)
+    return eaglePath
+
+## points() returns the (x, y) points of a path, rounded to 0.001mm.
+def points(eaglePath):
+    return [(round(x, 3), round(y, 3)) for x, y in eaglePath.points()]
+
+## Wires are cut down to the pieces of them inside the region, by the
+##  Liang-Barsky method.
+class ClipWireTest(unittest.TestCase):
+    def testCrossing(self):
+        pieces = clipPath(path([(-10, 5), (20, 5)]), REGION)
+        self.assertEqual([points(piece) for piece in pieces],
+                         [[(0, 5), (10, 5)]])
+        pieces = clipPath(path([(-5, -5), (15, 15)]), REGION)
+        self.assertEqual([points(piece) for piece in pieces],
+                         [[(0, 0), (10, 10)]])
+
+    ## A wire that goes out of the region and comes back in is cut in two,
+    ##  each piece keeping the wire's layer and width.
+    def testOutAndBack(self):
+        pieces = clipPath(path([(2, 2), (15, 2), (15, 8), (2, 8)]), REGION)
+        self.assertEqual([points(piece) for piece in pieces],
+                         [[(2, 2), (10, 2)], [(10, 8), (2, 8)]])
+        for piece in pieces:
+            self.assertEqual((piece.pathType, piece.pathLayer,
+                              piece.pathWeight), ("WIRE", 21, 0.1))
+            self.assertEqual(piece.bends, None)
+
+    def testInside(self):
+        wire = path([(1, 1), (9, 9)])
+        self.assertEqual(clipPath(wire, REGION), [wire])
+
+    ## Outside, whether or not its box overlaps the region.
+    def testOutside(self):
+        self.assertEqual(clipPath(path([(20, 20), (30, 25)]), REGION), [])
+        self.assertEqual(clipPath(path([(-5, 8), (8, 25)]), REGION), [])
+
+    ## A curved segment inside the region keeps its bend; one that crosses
+    ##  its edge is followed with straight segments, which are cut. This one
+    ##  dips below the bottom of the region and comes back up.
+    def testCurved(self):
+        pieces = clipPath(path([(2, 5), (8, 5)], bends=[0, 90]), REGION)
+        self.assertEqual(len(pieces), 1)
+        self.assertEqual(list(pieces[0].bends), [0, 90])
+        pieces = clipPath(path([(2, 5), (8, 5)], bends=[0, 270]), REGION)
+        self.assertEqual(len(pieces), 2)
+        self.assertEqual(points(pieces[0])[0], (2, 5))
+        self.assertEqual(points(pieces[1])[-1], (8, 5))
+        for piece in pieces:
+            self.assertEqual(piece.bends, None)
+            box = pathBox(piece)
+            self.assertTrue(inside(box, REGION), box)
+            self.assertEqual(box[1], 0.0)
+
+## Polygons are cut down to the part of them inside the region, by the
+##  Sutherland-Hodgman method, and stay closed.
+class ClipPolygonTest(unittest.TestCase):
+    def testCorner(self):
+        square = path([(5, 5), (15, 5), (15, 15), (5, 15), (5, 5)],
+                      "POLYGON")
+        pieces = clipPath(square, REGION)
+        self.assertEqual(len(pieces), 1)
+        self.assertEqual(pieces[0].pathType, "POLYGON")
+        corners = points(pieces[0])
+        self.assertEqual(corners[0], corners[-1])
+        self.assertEqual(sorted(corners[:-1]),
+                         [(5, 5), (5, 10), (10, 5), (10, 10)])
+
+    ## A triangle round the whole region is cut down to the region itself.
+    def testCovering(self):
+        triangle = path([(-10, -10), (40, -10), (-10, 40), (-10, -10)],
+                        "POLYGON")
+        pieces = clipPath(triangle, REGION)
+        self.assertEqual(len(pieces), 1)
+        self.assertEqual(sorted(set(points(pieces[0]))),
+                         [(0, 0), (0, 10), (10, 0), (10, 10)])
+
+    def testOutside(self):
+        triangle = path([(20, 0), (30, 0), (20, 12), (20, 0)], "POLYGON")
+        self.assertEqual(clipPath(triangle, REGION), [])
+        ## The box of this one overlaps the region, but the polygon doesn't.
+        triangle = path([(9, 12), (12, 9), (12, 12), (9, 12)], "POLYGON")
+        self.assertEqual(clipPath(triangle, REGION), [])
+
+## drawing() returns an SVG 100px high with the given paths in it.
+def drawing(*paths):
+    return ('<svg xmlns="http://www.w3.org/2000/svg" height="100">%s</svg>'
+            % "".join('<path d="%s" style="fill:none;stroke:#150000"/>' % d
+                      for d in paths))
+
+## mm() returns a length in px as mm.
+def mm(px):
+    return px / PX_PER_MM
+
+## The box PathInterpreter.bounds() works out for a path holds everything
+##  that's drawn for it, without flattening it.
+class BoundsTest(unittest.TestCase):
+    ## boxes() returns the box worked out for the path in an SVG and the box
+    ##  around what's actually drawn for it, with or without arcs.
+    def boxes(self, d, arcs=None):
+        converter = Converter(arcs=arcs)
+        shape = converter.parse(StringIO(drawing(d))).pathData[0]
+        drawn = converter.flatten(converter.parse(StringIO(drawing(d))))
+        self.assertEqual(len(drawn), 1)
+        return shapeBounds(shape, arcs is not None), pathBox(drawn[0])
+
+    def testCurve(self):
+        bounds, box = self.boxes("M10 50 C 10 10 90 10 90 50")
+        self.assertTrue(inside(box, bounds), (box, bounds))
+
+    ## An arc drawn as one bulges well out of the box of its two ends, and
+    ##  the box has to take that in, on whichever side it bulges.
+    def testBulgingArc(self):
+        for d in ("M10 50 A 40 40 0 0 1 90 50", "M10 50 A 40 40 0 0 0 90 50",
+                  "M10 50 A 40 40 0 1 1 90 50"):
+            bounds, box = self.boxes(d, arcs=0.05)
+            self.assertTrue(inside(box, bounds), (d, box, bounds))
+            self.assertTrue(box[3] - box[1] > mm(20), (d, box))
+
+## The converter drops paths entirely outside its region before they're
+##  flattened, and with clipping on, cuts the rest off at its edges.
+class RegionTest(unittest.TestCase):
+    ## The region is about 35px wide and 85px high from the bottom left. The
+    ##  first path goes out of it and back, the second is inside it and the
+    ##  third is nowhere near it.
+    SVG = drawing("M10 20 L 60 20 L 60 40 L 10 40", "M10 80 L 20 80",
+                  "M200 10 L 250 10")
+    REGION = (0.0, 0.0, 10.0, 24.0)
+
+    def testClipped(self):
+        converter = Converter(region=self.REGION, clip=True)
+        pathList = converter.flatten(StringIO(self.SVG))
+        self.assertEqual(len(pathList), 3)
+        for eaglePath in pathList:
+            self.assertTrue(inside(pathBox(eaglePath), self.REGION))
+
+    def testCulledOnly(self):
+        converter = Converter(region=self.REGION)
+        self.assertEqual(len(converter.flatten(StringIO(self.SVG))), 2)
+
+    ## With clip=False, there's exactly one EAGLEPath for each drawn path,
+    ##  whatever the converter's own setting.
+    def testClipFalse(self):
+        converter = Converter(region=self.REGION, clip=True)
+        parser = converter.parse(StringIO(self.SVG))
+        drawn = converter.drawnPaths(converter.parse(StringIO(self.SVG)))
+        pathList = list(converter.iterFlatten(parser, clip=False))
+        self.assertEqual(len(drawn), 2)
+        self.assertEqual(len(pathList), len(drawn))
+        self.assertFalse(inside(pathBox(pathList[0]), self.REGION))
+
+if __name__ == "__main__":
+    unittest.main()
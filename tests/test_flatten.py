@@ -0,0 +1,41 @@
+import os, sys, shutil, tempfile, unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from SVG2SCR import Converter
+
+## A group that stretches its paths one way only, so that circles become
+##  ellipses and PathInterpreter can't draw any arcs of its own; arcs are only
+##  fitted to the flattened points.
+STRETCHED = """<svg xmlns="http://www.w3.org/2000/svg" height="200">
+<g transform="scale(2,1)">
+<path d="M10 10 C 40 10 60 60 90 60 A 20 20 0 0 1 90 100"
+      style="fill:none;stroke:#150000"/>
+<path d="M10 150 A 30 30 0 0 1 70 150" style="fill:none;stroke:#150000"/>
+</g>
+</svg>"""
+
+## Flattened paths come back from the cache and from the path workers packed
+##  into a single array (see packPoints() in SVG2SCR.py); either way, the
+##  script has to be the same as one flattened on the spot.
+class PackedPathTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def testStretchedArcsFromCache(self):
+        fresh = Converter(arcs=0.05).convertText(STRETCHED)
+        cacheName = os.path.join(self.directory, "paths.db")
+        for run in ("first", "second"):
+            converter = Converter(arcs=0.05, cache=cacheName)
+            self.assertEqual(converter.convertText(STRETCHED), fresh, run)
+
+    def testStretchedArcsOnWorkers(self):
+        fresh = Converter(arcs=0.05).convertText(STRETCHED)
+        converter = Converter(arcs=0.05, pathJobs=2)
+        self.assertEqual(converter.convertText(STRETCHED), fresh)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import os, sys, gzip, shutil, tempfile, unittest
+from StringIO import StringIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import SVG2SCR
+
+SQUARE = """<svg xmlns="http://www.w3.org/2000/svg" height="100">
+<path d="M10 10 L 90 10 L 90 90 z" style="fill:#000;stroke:#150000"/>
+</svg>"""
+
+## gzipped() returns 'text' gzipped.
+def gzipped(text):
+    f = StringIO()
+    compressed = gzip.GzipFile(fileobj=f, mode='w')
+    compressed.write(text)
+    compressed.close()
+    return f.getvalue()
+
+## convert() takes a filename and convertText() the SVG itself; neither
+##  guesses which it's been given from what's in it.
+class InputTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.expected = SVG2SCR.convertText(SQUARE)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, data):
+        filename = os.path.join(self.directory, name)
+        with open(filename, 'wb') as f:
+            f.write(data)
+        return filename
+
+    def testText(self):
+        self.assertIn("POLYGON", self.expected)
+        self.assertEqual(SVG2SCR.convertText(SVG2SCR.UTF8_BOM + SQUARE),
+                         self.expected)
+        self.assertEqual(SVG2SCR.convertText(" " * 2000 + SQUARE),
+                         self.expected)
+        self.assertEqual(SVG2SCR.convertText(gzipped(SQUARE)), self.expected)
+
+    def testFiles(self):
+        for name, data in (("plain.svg", SQUARE),
+                           ("marked.svg", SVG2SCR.UTF8_BOM + SQUARE),
+                           ("spaced.svg", " " * 2000 + SQUARE),
+                           ("zipped.svgz", gzipped(SQUARE)),
+                           ("misnamed.svg", gzipped(SQUARE))):
+            filename = self.write(name, data)
+            self.assertEqual(SVG2SCR.convert(filename), self.expected, name)
+            with open(filename, 'rb') as f:
+                self.assertEqual(SVG2SCR.convert(f), self.expected, name)
+
+    def testTextIsNotAFilename(self):
+        self.assertRaises(Exception, SVG2SCR.convertText, __file__)
+
+if __name__ == "__main__":
+    unittest.main()
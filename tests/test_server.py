@@ -0,0 +1,49 @@
+import os, sys, gzip, unittest
+from StringIO import StringIO
+from xml.parsers.expat import ExpatError
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import ConvertServer
+
+SQUARE = """<svg xmlns="http://www.w3.org/2000/svg" height="100">
+<path d="M10 10 L 90 10 L 90 90 z" style="fill:#000;stroke:#150000"/>
+</svg>"""
+
+## The body of a request is the SVG, whatever it looks like; it's never taken
+##  to be the name of a file on the server.
+class RequestBodyTest(unittest.TestCase):
+    def testFilenameIsNotRead(self):
+        self.assertRaises(ExpatError, ConvertServer._convertOne,
+                          __file__, {}, False)
+
+    def testGzippedBody(self):
+        f = StringIO()
+        compressed = gzip.GzipFile(fileobj=f, mode='w')
+        compressed.write(SQUARE)
+        compressed.close()
+        plain, _ = ConvertServer._convertOne(SQUARE, {}, False)
+        unzipped, _ = ConvertServer._convertOne(f.getvalue(), {}, False)
+        self.assertEqual(unzipped, plain)
+        self.assertIn("POLYGON", plain)
+
+    def testBodyWithByteOrderMark(self):
+        plain, _ = ConvertServer._convertOne(SQUARE, {}, False)
+        marked, _ = ConvertServer._convertOne("\xef\xbb\xbf" + SQUARE, {},
+                                              False)
+        self.assertEqual(marked, plain)
+
+## Each worker only keeps a few Converters, however many different options
+##  it's asked for; the ones asked for most recently are kept.
+class ConverterLimitTest(unittest.TestCase):
+    def testManyTolerances(self):
+        for n in xrange(ConvertServer.MAX_CONVERTERS * 3):
+            ConvertServer._convertOne(SQUARE, {"tolerance": 0.01}, False)
+            ConvertServer._convertOne(SQUARE, {"tolerance": 0.02 + n * 1e-6},
+                                      False)
+        self.assertEqual(len(ConvertServer._converters),
+                         ConvertServer.MAX_CONVERTERS)
+        self.assertIn((("tolerance", 0.01),), ConvertServer._converters)
+
+if __name__ == "__main__":
+    unittest.main()
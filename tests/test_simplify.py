@@ -0,0 +1,106 @@
+import os, sys, math, unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import simplify
+from simplify import simplifyPath, selfIntersects
+from SCRSupport import EAGLEPath
+
+## newPath() returns an EAGLEPath of the given type through 'points'.
+def newPath(pathType, points):
+    path = EAGLEPath()
+    path.pathType = pathType
+    for x, y in points:
+        path.append(x, y)
+    return path
+
+## sliver() returns the outline of a long, thin strip, 'width' mm across, with
+##  a point every mm along both of its long sides, closed.
+def sliver(width, length=20):
+    points = [(float(x), 0.0) for x in xrange(length + 1)]
+    points += [(float(x), width) for x in xrange(length, -1, -1)]
+    return points + points[:1]
+
+## comb() returns the outline of a comb: a spine along the bottom with narrow
+##  teeth standing up from it, a little way apart, closed.
+def comb(teeth=8, gap=0.1):
+    points = [(0.0, 0.0), (teeth * 2.0, 0.0)]
+    for n in xrange(teeth - 1, -1, -1):
+        left = n * 2.0
+        points += [(left + 2.0, 10.0), (left + gap, 10.0), (left + gap, 1.0),
+                   (left, 1.0)]
+    return points + points[:1]
+
+## wobble() returns an open line that wanders a little either side of the X
+##  axis.
+def wobble(length=40):
+    return [(float(x), 0.3 * math.sin(x)) for x in xrange(length + 1)]
+
+class PolygonTest(unittest.TestCase):
+    ## simplifyPath() is tried with and without NumPy, which take different
+    ##  paths through Douglas-Peucker.
+    def setUp(self):
+        self.numpy = simplify.numpy
+
+    def tearDown(self):
+        simplify.numpy = self.numpy
+
+    ## assertSimple() checks that a simplified POLYGON is still a polygon:
+    ##  closed, with at least three distinct corners, some area, and no edges
+    ##  that cross.
+    def assertSimple(self, path):
+        points = list(path.points())
+        self.assertEqual(points[0], points[-1])
+        ring = points[:-1]
+        self.assertTrue(len(set(ring)) >= 3, ring)
+        xs = [x for x, y in ring]
+        ys = [y for x, y in ring]
+        area = sum(xs[i-1]*ys[i] - xs[i]*ys[i-1] for i in xrange(len(ring)))
+        self.assertTrue(abs(area) > 1e-9, ring)
+        self.assertFalse(selfIntersects(xs, ys), ring)
+
+    def simplified(self, pathType, points, tolerance):
+        results = []
+        for numpy in (self.numpy, None):
+            simplify.numpy = numpy
+            path = newPath(pathType, points)
+            simplifyPath(path, tolerance)
+            results.append(path)
+        self.assertEqual(list(results[0].points()),
+                         list(results[1].points()))
+        return results[0]
+
+    ## A strip far thinner than the tolerance would be flattened to a line.
+    def testSliver(self):
+        path = self.simplified("POLYGON", sliver(0.05), 1.0)
+        self.assertSimple(path)
+        self.assertTrue(len(path) < len(sliver(0.05)))
+
+    ## Teeth closer together than the tolerance would run into each other.
+    def testComb(self):
+        path = self.simplified("POLYGON", comb(), 5.0)
+        self.assertSimple(path)
+
+    def testTinyTriangle(self):
+        triangle = [(0.0, 0.0), (0.01, 0.0), (0.0, 0.01), (0.0, 0.0)]
+        path = self.simplified("POLYGON", triangle, 10.0)
+        self.assertEqual(list(path.points()), triangle)
+
+    ## An open WIRE is thinned right down, but keeps both of its ends.
+    def testWireEnds(self):
+        points = wobble()
+        path = self.simplified("WIRE", points, 1.0)
+        self.assertEqual(path.point(0), points[0])
+        self.assertEqual(path.point(-1), points[-1])
+        self.assertEqual(len(path), 2)
+
+    ## A WIRE that ends where it starts is still closed afterwards.
+    def testClosedWire(self):
+        points = comb()
+        path = self.simplified("WIRE", points, 0.5)
+        self.assertEqual(path.point(0), points[0])
+        self.assertEqual(path.point(-1), points[-1])
+        self.assertTrue(len(path) < len(points))
+
+if __name__ == "__main__":
+    unittest.main()
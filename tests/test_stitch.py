@@ -0,0 +1,127 @@
+import os, sys, unittest
+from array import array
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from SCRSupport import EAGLEPath
+from SCRStats import ConversionStats
+from stitch import stitchWires
+
+## wire() returns a WIRE through the given (x, y) points.
+def wire(points, layer=1, weight=0.1, bends=None):
+    path = EAGLEPath()
+    path.pathType = "WIRE"
+    path.pathLayer = layer
+    path.pathWeight = weight
+    for x, y in points:
+        path.append(x, y)
+    if bends is not None:
+        path.bends = array('d', bends)
+    return path
+
+## points() returns the (x, y) points of a path.
+def points(path):
+    return zip(path.path[0::2], path.path[1::2])
+
+## ring() returns the WIREs going round the given corners, one per edge.
+def ring(corners, **options):
+    return [wire([corners[i], corners[(i + 1) % len(corners)]], **options)
+            for i in xrange(len(corners))]
+
+class StitchTest(unittest.TestCase):
+    ## A WIRE that ends where the last one ended is turned round to join it.
+    def testReversedEnds(self):
+        stats = ConversionStats()
+        stitched = stitchWires([wire([(0, 0), (10, 0)]),
+                                wire([(20, 5), (10, 0)]),
+                                wire([(0, 0), (0, -10)])], stats)
+        self.assertEqual(len(stitched), 1)
+        self.assertEqual(stitched[0].pathType, "WIRE")
+        self.assertEqual(points(stitched[0]),
+                         [(0, -10), (0, 0), (10, 0), (20, 5)])
+        self.assertEqual(stats.counts["wiresStitched"], 2)
+
+    ## Ends only have to meet to the 0.01mm they're written to.
+    def testRoundedEnds(self):
+        stitched = stitchWires([wire([(0, 0), (10, 0)]),
+                                wire([(10.001, 0.002), (20, 0)])])
+        self.assertEqual(len(stitched), 1)
+
+    def testNotAcrossLayers(self):
+        pathList = [wire([(0, 0), (10, 0)]),
+                    wire([(10, 0), (20, 0)], layer=21)]
+        self.assertEqual(stitchWires(pathList), pathList)
+
+    ## Widths that are written the same are the same; others aren't.
+    def testNotAcrossWidths(self):
+        pathList = [wire([(0, 0), (10, 0)]),
+                    wire([(10, 0), (20, 0)], weight=0.2)]
+        self.assertEqual(stitchWires(pathList), pathList)
+        pathList[1].pathWeight = 0.1000001
+        self.assertEqual(len(stitchWires(pathList)), 1)
+
+    ## POLYGONs, and WIREs that would only meet themselves, are left alone.
+    def testOnlyOtherWires(self):
+        polygon = wire([(10, 0), (20, 0), (20, 10), (10, 0)])
+        polygon.pathType = "POLYGON"
+        loop = wire([(0, 0), (0, 10), (-10, 10), (0, 0)])
+        pathList = [wire([(0, 50), (10, 0)]), polygon, loop]
+        self.assertEqual(stitchWires(pathList), pathList)
+
+    ## Curved edges keep their bends, which change sign when their WIRE is
+    ##  turned round, and straight ones get a bend of 0.
+    def testKeepsBends(self):
+        stitched = stitchWires([wire([(0, 0), (10, 0)]),
+                                wire([(20, 0), (10, 0)], bends=[0, 90]),
+                                wire([(20, 0), (30, 0)], bends=[0, 45])])
+        self.assertEqual(len(stitched), 1)
+        self.assertEqual(list(stitched[0].bends), [0, 0, -90, 45])
+
+    def testStraightHasNoBends(self):
+        stitched = stitchWires([wire([(0, 0), (10, 0)]),
+                                wire([(10, 0), (20, 0)])])
+        self.assertEqual(stitched[0].bends, None)
+
+class ClosedChainTest(unittest.TestCase):
+    ## An outline that was broken apart comes back together as a POLYGON,
+    ##  still ending where it starts.
+    def testPolygon(self):
+        stats = ConversionStats()
+        stitched = stitchWires(ring([(0, 0), (10, 0), (10, 10), (0, 10)]),
+                               stats)
+        self.assertEqual(len(stitched), 1)
+        self.assertEqual(stitched[0].pathType, "POLYGON")
+        self.assertEqual(points(stitched[0]),
+                         [(0, 0), (10, 0), (10, 10), (0, 10), (0, 0)])
+        self.assertEqual(stats.counts["wiresClosed"], 1)
+
+    ## A chain that doesn't get back to its start stays a WIRE.
+    def testOpen(self):
+        stitched = stitchWires(ring([(0, 0), (10, 0), (10, 10), (0, 10)])[:3])
+        self.assertEqual(stitched[0].pathType, "WIRE")
+
+    ## So does one whose edges cross...
+    def testCrossed(self):
+        stitched = stitchWires(ring([(0, 0), (10, 10), (10, 0), (0, 10)]))
+        self.assertEqual(len(stitched), 1)
+        self.assertEqual(stitched[0].pathType, "WIRE")
+
+    ## ...one with no area...
+    def testFlat(self):
+        stitched = stitchWires([wire([(0, 0), (10, 0)]),
+                                wire([(10, 0), (0, 0)])])
+        self.assertEqual(len(stitched), 1)
+        self.assertEqual(stitched[0].pathType, "WIRE")
+        stitched = stitchWires(ring([(0, 0), (10, 0), (20, 0)]))
+        self.assertEqual(stitched[0].pathType, "WIRE")
+
+    ## ...and one with a curved edge.
+    def testCurved(self):
+        edges = ring([(0, 0), (10, 0), (10, 10)])
+        edges[1].bends = array('d', [0, 30])
+        stitched = stitchWires(edges)
+        self.assertEqual(len(stitched), 1)
+        self.assertEqual(stitched[0].pathType, "WIRE")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import os, sys, unittest
+from StringIO import StringIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from SVG2SCR import Converter
+from SCRSupport import pathText
+
+## drawing() returns an SVG with 'paths' lines in a layer group, and whatever
+##  is in 'before' and 'after' either side of the group.
+def drawing(paths=50, before="", after=""):
+    lines = "".join('<path id="p%d" d="M%d 10 L %d 90" '
+                    'style="fill:none;stroke:#150000"/>\n' % (n, n, n + 5)
+                    for n in xrange(paths))
+    return ('<svg xmlns="http://www.w3.org/2000/svg" '
+            'xmlns:xlink="http://www.w3.org/1999/xlink" height="100">\n'
+            '%s<g id="layer1" transform="translate(0,-5)">\n%s</g>\n%s</svg>\n'
+            % (before, lines, after))
+
+SYMBOL = ('<defs><symbol id="dot"><path d="M0 0 C 1 1 2 1 3 0 z" '
+          'style="fill:#000;stroke:#150000"/></symbol></defs>\n')
+
+## SlowFile is an open file that hands out its text a little at a time,
+##  whatever it's asked for, and remembers how much of it has been read.
+class SlowFile:
+    def __init__(self, text, step=200):
+        self.f = StringIO(text)
+        self.step = step
+
+    def read(self, size=-1):
+        return self.f.read(self.step)
+
+    def tell(self):
+        return self.f.tell()
+
+## texts() returns the script text of each of a list of paths.
+def texts(pathList):
+    return [pathText(path) for path in pathList]
+
+class StreamTest(unittest.TestCase):
+    ## The first paths come out long before the end of the file is read.
+    def testPathsBeforeEnd(self):
+        svg = drawing()
+        source = SlowFile(svg)
+        paths = Converter().iterFlatten(source, chunkSize=5)
+        next(paths)
+        self.assertTrue(source.tell() < len(svg) / 2, source.tell())
+
+    ## A <use> of something further on holds everything after it back until
+    ##  that's been read, so that it all still comes out in document order.
+    def testForwardReference(self):
+        svg = drawing(before='<use xlink:href="#dot" x="5"/>\n',
+                      after=SYMBOL)
+        source = SlowFile(svg)
+        paths = Converter().iterFlatten(source, chunkSize=5)
+        first = next(paths)
+        self.assertEqual(source.tell(), len(svg))
+        self.assertEqual(first.pathType, "POLYGON")
+
+    ## Streaming draws exactly what parsing the whole document first does,
+    ##  copies and all.
+    def testSameAsWholeDocument(self):
+        uses = "".join('<use xlink:href="#dot" x="%d" y="20"/>\n' % n
+                       for n in xrange(0, 40, 4))
+        for svg in (drawing(before=SYMBOL + uses),
+                    drawing(before=uses, after=SYMBOL),
+                    drawing(before=SYMBOL, after=uses +
+                            '<use xlink:href="#layer1" x="50"/>\n')):
+            converter = Converter()
+            whole = converter.flatten(converter.parse(StringIO(svg)))
+            streamed = list(converter.iterFlatten(SlowFile(svg),
+                                                  chunkSize=3))
+            self.assertEqual(texts(streamed), texts(whole))
+            self.assertTrue(len(whole) > 50)
+
+    ## A path drawn by a <use> is only flattened once, however many chunks
+    ##  its copies are spread over.
+    def testCopiesFlattenedOnce(self):
+        uses = "".join('<use xlink:href="#dot" x="%d" y="20"/>\n' % n
+                       for n in xrange(0, 40, 4))
+        converter = Converter()
+        flattened = []
+        flattenFresh = converter.flattenFresh
+        def counting(shapes, stats=None):
+            flattened.extend(shapes)
+            return flattenFresh(shapes, stats)
+        converter.flattenFresh = counting
+        pathList = list(converter.iterFlatten(
+            SlowFile(drawing(before=SYMBOL + uses)), chunkSize=3))
+        self.assertEqual(len(pathList), 60)
+        self.assertEqual(len(flattened), 51)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import os, sys, unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from SVGPath import tokenizePath
+
+## tokens() returns the (command, arguments) records for some path data as a
+##  list.
+def tokens(d):
+    return list(tokenizePath(d))
+
+class NumberTest(unittest.TestCase):
+    def testExponents(self):
+        self.assertEqual(tokens("M1e2,-2.5E-1 L1e+1 .5e1"),
+                         [("M", (100.0, -0.25)), ("L", (10.0, 5.0))])
+
+    ## A second decimal point starts a new number.
+    def testRunTogetherFractions(self):
+        self.assertEqual(tokens("M.5.5l.25.75.5.5"),
+                         [("M", (0.5, 0.5)), ("l", (0.25, 0.75, 0.5, 0.5))])
+
+    ## So does a sign, straight after a number with a decimal point.
+    def testSignAfterFraction(self):
+        self.assertEqual(tokens("M1.5-2L-3-4.5"),
+                         [("M", (1.5, -2.0)), ("L", (-3.0, -4.5))])
+
+    def testCommandsWithoutSeparators(self):
+        self.assertEqual(tokens("M1 2L3 4h5v6z"),
+                         [("M", (1.0, 2.0)), ("L", (3.0, 4.0)),
+                          ("h", (5.0,)), ("v", (6.0,)), ("z", ())])
+
+class ArcTest(unittest.TestCase):
+    ## Arc flags are a single digit each, so they can be run together with
+    ##  each other and with the number after them.
+    def testPackedFlags(self):
+        self.assertEqual(tokens("M0 0a1 1 0 0110 10"),
+                         [("M", (0.0, 0.0)),
+                          ("a", (1.0, 1.0, 0.0, 0.0, 1.0, 10.0, 10.0))])
+
+    def testRepeatedArcs(self):
+        self.assertEqual(tokens("M0 0A5,5,0,1,0,10,0 5 5 0 0 1 0 0"),
+                         [("M", (0.0, 0.0)),
+                          ("A", (5.0, 5.0, 0.0, 1.0, 0.0, 10.0, 0.0,
+                                 5.0, 5.0, 0.0, 0.0, 1.0, 0.0, 0.0))])
+
+    ## A flag that isn't 0 or 1 is an error, and nothing is made up to take
+    ##  the arc's place.
+    def testBadFlag(self):
+        self.assertEqual(tokens("M0 0 L1 1 a 10 10 0 2 1 5 5"),
+                         [("M", (0.0, 0.0)), ("L", (1.0, 1.0))])
+
+## Path data with an error in it is drawn up to the last whole segment before
+##  the error, and no further.
+class ErrorTest(unittest.TestCase):
+    def testJunk(self):
+        self.assertEqual(tokens("M 1 2 x 3 4"), [("M", (1.0, 2.0))])
+
+    def testJunkInsideNumbers(self):
+        self.assertEqual(tokens("M 1 2 L 3 4 5 # 6"),
+                         [("M", (1.0, 2.0)), ("L", (3.0, 4.0))])
+
+    def testNumbersBeforeFirstCommand(self):
+        self.assertEqual(tokens("10 20 M 1 2"), [])
+
+    def testShortCommand(self):
+        self.assertEqual(tokens("M 1 2 L 3 4 5 L 6 7"),
+                         [("M", (1.0, 2.0)), ("L", (3.0, 4.0))])
+
+    def testNumbersAfterClose(self):
+        self.assertEqual(tokens("M 1 2 L 3 4 z 5 6"),
+                         [("M", (1.0, 2.0)), ("L", (3.0, 4.0)), ("z", ())])
+
+    def testShortAtEnd(self):
+        self.assertEqual(tokens("M 1 2 C 3 4 5 6"), [("M", (1.0, 2.0))])
+
+    def testEmpty(self):
+        self.assertEqual(tokens(""), [])
+        self.assertEqual(tokens("  "), [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import os, sys, unittest
+from StringIO import StringIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import union
+from SCRSupport import EAGLEPath
+from SCRStats import ConversionStats
+
+## square() returns a POLYGON on layer 21 with corners at (left, bottom) and
+##  (right, top).
+def square(left, bottom, right, top):
+    path = EAGLEPath()
+    path.pathType = "POLYGON"
+    path.pathLayer = 21
+    for x, y in ((left, bottom), (right, bottom), (right, top),
+                 (left, top), (left, bottom)):
+        path.append(x, y)
+    return path
+
+class UnionTest(unittest.TestCase):
+    ## Smaller squares against the side of a big one share only part of its
+    ##  edge, with their corners in the middle of it.
+    def testTJunctions(self):
+        stats = ConversionStats()
+        merged = union.unionPolygons([square(0, 0, 10, 10),
+                                      square(10, 3, 20, 7),
+                                      square(10, 8, 15, 12)], stats)
+        self.assertEqual(len(merged), 1)
+        self.assertEqual(len(merged[0]), 12)
+        self.assertEqual(stats.counts["polygonsMerged"], 2)
+
+    ## Without Shapely, overlapping squares are left alone, and counted, and
+    ##  the warning is left to the caller rather than written out.
+    @unittest.skipIf(union.Polygon is not None, "Shapely merges these")
+    def testOverlapCounted(self):
+        stats = ConversionStats()
+        pathList = [square(0, 0, 10, 10), square(5, 5, 15, 15)]
+        stderr = sys.stderr
+        sys.stderr = StringIO()
+        try:
+            self.assertEqual(len(union.unionPolygons(pathList, stats)), 2)
+            written = sys.stderr.getvalue()
+        finally:
+            sys.stderr = stderr
+        self.assertEqual(written, "")
+        self.assertEqual(stats.counts["polygonsUnmerged"], 2)
+        self.assertEqual(stats.counts["polygonsOverlapping"], 2)
+        self.assertTrue(union.overlapWarning(stats.report())
+                        .startswith("2 POLYGONs overlap"))
+
+    def testNoWarning(self):
+        stats = ConversionStats()
+        union.unionPolygons([square(0, 0, 10, 10), square(20, 0, 30, 10)],
+                            stats)
+        self.assertEqual(union.overlapWarning(stats.report()), None)
+        self.assertEqual(union.overlapWarning(None), None)
+
+if __name__ == "__main__":
+    unittest.main()
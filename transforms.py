@@ -0,0 +1,143 @@
+from array import array
+import re, math
+
+## NumPy is optional; without it applyMatrix() works one point at a time.
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+## SVG coordinates are in px, and EAGLE's are in mm; 1mm ~= 3.54px.
+PX_PER_MM = 3.54
+
+## A transform is kept as the six numbers of an SVG matrix(a b c d e f), as a
+##  tuple (a, b, c, d, e, f), which maps a point x,y to
+##
+##      x' = a*x + c*y + e
+##      y' = b*x + d*y + f
+##
+##  Every path ends up with a single matrix that takes its coordinates
+##  straight to EAGLE's mm (see SvgHandler in SvgParser.py): the transforms of
+##  the path and of every group it's in, one after the other, followed by the
+##  document matrix, which scales px to mm and turns the drawing the right way
+##  up (see documentMatrix()).
+IDENTITY = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+## Paths shorter than this (in numbers, so half as many points) are quicker to
+##  transform one point at a time than with NumPy.
+NUMPY_MIN = 64
+
+## documentMatrix() returns the matrix for a document 'height' px high. SVG
+##  puts the origin at the top left with Y going down, and EAGLE at the bottom
+##  left with Y going up, so Y is flipped and the drawing moved up by its
+##  height.
+def documentMatrix(height=0):
+    return (1/PX_PER_MM, 0.0, 0.0, -1/PX_PER_MM, 0.0, height/PX_PER_MM)
+
+## multiply() returns the matrix that does 'n' and then 'm'.
+def multiply(m, n):
+    return (m[0]*n[0] + m[2]*n[1],
+            m[1]*n[0] + m[3]*n[1],
+            m[0]*n[2] + m[2]*n[3],
+            m[1]*n[2] + m[3]*n[3],
+            m[0]*n[4] + m[2]*n[5] + m[4],
+            m[1]*n[4] + m[3]*n[5] + m[5])
+
+## invert() returns the matrix that undoes 'm', or None if nothing can (it
+##  squashes everything onto a line or a point).
+def invert(m):
+    a, b, c, d, e, f = m
+    det = a*d - b*c
+    if not det:
+        return None
+    return (d/det, -b/det, -c/det, a/det, (c*f - d*e)/det, (b*e - a*f)/det)
+
+## translation() returns the matrix that moves everything by x, y.
+def translation(x, y=0.0):
+    return (1.0, 0.0, 0.0, 1.0, float(x), float(y))
+
+## isTranslation() reports whether a matrix does nothing but move things, so
+##  that a copy of a path drawn with it is just the path moved.
+def isTranslation(m):
+    return (abs(m[0] - 1) < 1e-9 and abs(m[3] - 1) < 1e-9 and
+            abs(m[1]) < 1e-9 and abs(m[2]) < 1e-9)
+
+## scaleFactor() returns how much a matrix scales lengths by, on average; for
+##  one that keeps shapes the same (see conformal()) it's exact.
+def scaleFactor(m):
+    return math.sqrt(abs(m[0]*m[3] - m[1]*m[2]))
+
+## conformal() reports whether a matrix keeps circles circular: it may move,
+##  rotate, mirror and scale things, but only by the same amount each way.
+def conformal(m):
+    a, b, c, d = m[:4]
+    size = abs(a) + abs(b) + abs(c) + abs(d)
+    return ((abs(a - d) <= 1e-9 * size and abs(b + c) <= 1e-9 * size) or
+            (abs(a + d) <= 1e-9 * size and abs(b - c) <= 1e-9 * size))
+
+## mirrors() reports whether a matrix turns things over, so that clockwise
+##  becomes anticlockwise. The document matrix does; see documentMatrix().
+def mirrors(m):
+    return m[0]*m[3] - m[1]*m[2] < 0
+
+## The pieces of a transform attribute: a list of functions, each a name
+##  followed by its numbers in brackets, separated by spaces and/or commas.
+_function = re.compile(r"([A-Za-z]+)\s*\(([^)]*)\)")
+_numbers = re.compile(r"[-+]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][-+]?[0-9]+)?")
+
+## parseTransform() returns the matrix for an SVG transform attribute, such as
+##  "translate(10,20) rotate(45)". Every form SVG defines is understood:
+##  matrix(), translate(), scale(), rotate() (about the origin or a given
+##  point), skewX() and skewY(). A list of them is applied from right to
+##  left, as SVG says. Anything that isn't understood is ignored.
+def parseTransform(value):
+    m = IDENTITY
+    for name, body in _function.findall(value or ""):
+        n = [float(x) for x in _numbers.findall(body)]
+        if name == "matrix" and len(n) == 6:
+            t = tuple(n)
+        elif name == "translate" and n:
+            t = translation(n[0], (n[1:] + [0.0])[0])
+        elif name == "scale" and n:
+            t = (n[0], 0.0, 0.0, (n[1:] + n)[0], 0.0, 0.0)
+        elif name == "rotate" and n:
+            angle = math.radians(n[0])
+            cos, sin = math.cos(angle), math.sin(angle)
+            t = (cos, sin, -sin, cos, 0.0, 0.0)
+            if len(n) >= 3:
+                t = multiply(translation(n[1], n[2]),
+                             multiply(t, translation(-n[1], -n[2])))
+        elif name == "skewX" and n:
+            t = (1.0, 0.0, math.tan(math.radians(n[0])), 1.0, 0.0, 0.0)
+        elif name == "skewY" and n:
+            t = (1.0, math.tan(math.radians(n[0])), 0.0, 1.0, 0.0, 0.0)
+        else:
+            continue
+        m = multiply(m, t)
+    return m
+
+## applyMatrix() returns a new array holding the points of 'values' (a flat
+##  array of doubles, X then Y for each point) transformed by 'm'. Long arrays
+##  are done in one go with NumPy, if it's there.
+def applyMatrix(m, values):
+    a, b, c, d, e, f = m
+    if numpy is not None and len(values) >= NUMPY_MIN:
+        points = numpy.frombuffer(values).reshape(-1, 2)
+        x = points[:, 0]
+        y = points[:, 1]
+        out = numpy.empty_like(points)
+        out[:, 0] = a*x + c*y + e
+        out[:, 1] = b*x + d*y + f
+        result = array('d')
+        result.fromstring(out.tostring())
+        return result
+    result = array('d', values)
+    xs = values[0::2]
+    ys = values[1::2]
+    if not b and not c:
+        result[0::2] = array('d', [a*x + e for x in xs])
+        result[1::2] = array('d', [d*y + f for y in ys])
+    else:
+        result[0::2] = array('d', [a*x + c*y + e for x, y in zip(xs, ys)])
+        result[1::2] = array('d', [b*x + d*y + f for x, y in zip(xs, ys)])
+    return result
@@ -0,0 +1,382 @@
+from SCRSupport import EAGLEPath, quantize, keyHundredths
+
+## NumPy is optional; with it, each POLYGON's corners are rounded and tidied
+##  up in one go.
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+## Shapely is optional too; without it, only POLYGONs that share an edge (or
+##  part of one) are merged (see _mergeEdges()).
+try:
+    from shapely.geometry import Polygon
+    from shapely.ops import unary_union
+except ImportError:
+    Polygon = None
+
+## EAGLE pours and checks every POLYGON on its own each time the board is
+##  recalculated, so artwork drawn as lots of filled shapes side by side (or
+##  on top of one another) is a lot slower to work with than the same artwork
+##  drawn as a few outlines. unionPolygons() merges POLYGONs on the same layer,
+##  with the same width, that touch or overlap into as few as it can.
+##
+##  With Shapely installed, overlapping and touching POLYGONs are unioned
+##  properly. Without it, two POLYGONs are only merged if they share an edge,
+##  or part of one, at the same 0.01mm in both, which is what "Break Apart"
+##  and most tile-based artwork leave; that includes a corner of one in the
+##  middle of an edge of the other. POLYGONs that overlap are left as they
+##  are, and counted so that a warning can be given (see overlapWarning()).
+##  Either way, a POLYGON with curved edges (see arcs.py) is left alone, and
+##  so is any group whose union would have a hole in it, since EAGLE's
+##  POLYGONs can't have holes. The number of POLYGONs that touch or overlap
+##  another but couldn't be merged is counted in the statistics.
+##
+##  To keep from testing every POLYGON against every other, each one is
+##  filed in a grid by its bounding box, and only POLYGONs that share a cell
+##  of the grid, and whose boxes overlap, are tested against one another.
+
+## Bounding boxes are made this much bigger all round (in mm), so that two
+##  POLYGONs whose corners only meet once they're rounded to 0.01mm still
+##  count as near one another.
+PAD = 0.005
+
+## unionPolygons() returns the list of EAGLEPath objects with the POLYGONs in
+##  'pathList' merged. Each merged POLYGON takes the place of the first of the
+##  ones it was made from; everything else keeps its place. The number of
+##  POLYGONs saved, the number that couldn't be merged, and of those the
+##  number that overlap others without sharing an edge, are counted in
+##  'stats' if it's given.
+def unionPolygons(pathList, stats=None):
+    pathList = list(pathList)
+    groups = {}
+    for i, path in enumerate(pathList):
+        if (path.pathType == "POLYGON" and len(path) >= 3 and
+                (path.bends is None or not any(path.bends))):
+            key = (path.pathLayer, '{:.3f}'.format(path.pathWeight))
+            groups.setdefault(key, []).append(i)
+
+    replaced = {}   ## Index of the first of each set of merged POLYGONs to
+                    ##  the POLYGONs that replace them.
+    dropped = set() ## The indexes of the rest.
+    saved = 0
+    unmerged = set()    ## The indexes of POLYGONs that touch or overlap
+                        ##  another but weren't merged with it...
+    overlapping = set() ## ...and of those, the ones that overlap another
+                        ##  without sharing an edge, which only Shapely can
+                        ##  merge.
+    for indexes in groups.itervalues():
+        ## Each POLYGON's shape is only worked out if its box touches the box
+        ##  of another, which most don't.
+        paths = [pathList[i] for i in indexes]
+        shapes = {}
+        def touching(a, b):
+            shapeA = _shape(shapes, paths, a)
+            shapeB = _shape(shapes, paths, b)
+            if _touching(shapeA, shapeB):
+                return True
+            if Polygon is None and _overlapping(shapeA, shapeB):
+                overlapping.update((indexes[a], indexes[b]))
+            return False
+        for component in _components([_box(path) for path in paths],
+                                     touching):
+            if len(component) < 2:
+                continue
+            members = [indexes[n] for n in component]
+            parts = [_shape(shapes, paths, n) for n in component]
+            if Polygon is not None:
+                merged = _mergeShapely(parts, pathList[members[0]])
+            else:
+                merged = _mergeEdges(parts, pathList[members[0]])
+            if merged is None:
+                unmerged.update(members)
+                continue
+            replaced[members[0]] = merged
+            dropped.update(members[1:])
+            saved += len(members) - len(merged)
+    overlapping -= set(replaced) | dropped
+    unmerged |= overlapping
+
+    result = []
+    for i, path in enumerate(pathList):
+        if i in replaced:
+            result.extend(replaced[i])
+        elif i not in dropped:
+            result.append(path)
+    if stats is not None:
+        stats.add("polygonsMerged", saved)
+        stats.add("polygonsUnmerged", len(unmerged))
+        stats.add("polygonsOverlapping", len(overlapping))
+    return result
+
+## overlapWarning() returns the warning to give about a conversion, going by
+##  its stats report (see SCRStats.py), if unionPolygons() left any POLYGONs
+##  that only Shapely could have merged, or None. It's up to whoever ran the
+##  conversion where, or whether, to show it.
+def overlapWarning(report):
+    count = report.get("polygonsOverlapping") if report else None
+    if not count:
+        return None
+    return ("%d POLYGONs overlap others without sharing an edge and were "
+            "left as they are; install Shapely to merge them" % count)
+
+## _box() returns the bounding box of a path, padded by PAD.
+def _box(path):
+    xs = path.path[0::2]
+    ys = path.path[1::2]
+    return (min(xs) - PAD, min(ys) - PAD, max(xs) + PAD, max(ys) + PAD)
+
+## _components() returns the lists (of indexes into 'boxes') of the shapes
+##  that touch one another, directly or through others. Two shapes can only
+##  touch if their boxes do, and then it's up to 'touching' to say.
+def _components(boxes, touching):
+    count = len(boxes)
+    if count < 2:
+        return [[n] for n in xrange(count)]
+    ## The grid's cells are the size of an average box, so most boxes are
+    ##  only in a few cells.
+    size = sum(max(box[2] - box[0], box[3] - box[1])
+               for box in boxes) / float(count)
+    grid = {}
+    for n, box in enumerate(boxes):
+        for cx in xrange(int(box[0] // size), int(box[2] // size) + 1):
+            for cy in xrange(int(box[1] // size), int(box[3] // size) + 1):
+                grid.setdefault((cx, cy), []).append(n)
+
+    parent = range(count)
+    def find(n):
+        while parent[n] != n:
+            parent[n] = parent[parent[n]]
+            n = parent[n]
+        return n
+    tested = set()
+    for cell in grid.itervalues():
+        for i in xrange(len(cell)):
+            for j in xrange(i + 1, len(cell)):
+                a, b = cell[i], cell[j]
+                if (a, b) in tested or find(a) == find(b):
+                    continue
+                tested.add((a, b))
+                boxA, boxB = boxes[a], boxes[b]
+                if (boxA[0] > boxB[2] or boxB[0] > boxA[2] or
+                        boxA[1] > boxB[3] or boxB[1] > boxA[3]):
+                    continue
+                if touching(a, b):
+                    parent[find(a)] = find(b)
+    components = {}
+    for n in xrange(count):
+        components.setdefault(find(n), []).append(n)
+    return sorted(components.values())
+
+## _shape() returns the shape of paths[n]: a Shapely Polygon (see
+##  _polygon()), or without Shapely a ring (see _ring()). Shapes are kept in
+##  'shapes' once they've been worked out.
+def _shape(shapes, paths, n):
+    shape = shapes.get(n)
+    if shape is None:
+        if Polygon is not None:
+            shape = shapes[n] = _polygon(paths[n])
+        else:
+            shape = shapes[n] = _ring(paths[n])
+    return shape
+
+## _touching() reports whether two shapes touch: whether they intersect (with
+##  Shapely) or share an edge, or part of one (without).
+def _touching(a, b):
+    if Polygon is not None:
+        return a.intersects(b)
+    small, large = sorted((a[1], b[1]), key=len)
+    if any((q, p) in large for p, q in small):
+        return True
+    edgesA, edgesB = _splitEdges([a, b])
+    edgesB = set(edgesB)
+    return any((q, p) in edgesB for p, q in edgesA)
+
+## _overlapping() reports whether two rings (see _ring()) overlap, going by
+##  whether a corner of either is inside the other. (Two that cross without
+##  either having a corner inside the other aren't noticed, but that's rare.)
+def _overlapping(a, b):
+    return (any(_inside(point, b[0]) for point in a[0]) or
+            any(_inside(point, a[0]) for point in b[0]))
+
+## _inside() reports whether a point is strictly inside a ring of points,
+##  by counting the edges that a line from it out to the right crosses.
+def _inside(point, points):
+    x, y = point
+    crossings = 0
+    for n, (x1, y1) in enumerate(points):
+        x0, y0 = points[n - 1]
+        if (y0 > y) != (y1 > y):
+            ## Where the edge crosses the line, compared with x, without
+            ##  dividing; the sign is flipped for edges going down.
+            side = (x1 - x0) * (y - y0) - (x - x0) * (y1 - y0)
+            if side == 0:
+                return False            ## On the edge.
+            if (side > 0) == (y1 > y0):
+                crossings += 1
+        elif y0 == y1 == y and min(x0, x1) <= x <= max(x0, x1):
+            return False
+    return crossings % 2 == 1
+
+## The Shapely side. _polygon() returns the Shapely Polygon for a POLYGON.
+def _polygon(path):
+    polygon = Polygon(list(path.points()))
+    if not polygon.is_valid:
+        polygon = polygon.buffer(0)
+    return polygon
+
+## _mergeShapely() returns the POLYGONs making up the union of a set of
+##  Shapely Polygons, in the style of 'template', or None if the union has a
+##  hole in it.
+def _mergeShapely(polygons, template):
+    union = unary_union(polygons)
+    if union.geom_type == "Polygon":
+        parts = [union]
+    elif union.geom_type == "MultiPolygon":
+        parts = list(union.geoms)
+    else:
+        return None
+    if any(part.interiors for part in parts):
+        return None
+    merged = []
+    for part in parts:
+        path = _newPolygon(template)
+        for x, y in list(part.exterior.coords)[:-1]:
+            path.append(x, y)
+        merged.append(path)
+    return merged
+
+## The fallback. _ring() returns a (points, edges) pair for a POLYGON, where
+##  'points' is its ring of corners in hundredths of a mm (see quantize() in
+##  SCRSupport.py), anticlockwise and without repeats, and 'edges' the set of
+##  (corner, next corner) pairs going round it. A POLYGON that doesn't come
+##  out as a proper ring gets no edges, so it doesn't touch anything.
+def _ring(path):
+    if numpy is not None:
+        keys = numpy.array(quantize(path.path), dtype=numpy.int64) >> 1
+        xs = keys[0::2]
+        ys = keys[1::2]
+        keep = numpy.ones(len(xs), dtype=bool)
+        keep[1:] = (xs[1:] != xs[:-1]) | (ys[1:] != ys[:-1])
+        xs = xs[keep]
+        ys = ys[keep]
+        if len(xs) > 1 and xs[0] == xs[-1] and ys[0] == ys[-1]:
+            xs = xs[:-1]
+            ys = ys[:-1]
+        area = int((xs * numpy.roll(ys, -1) - numpy.roll(xs, -1) * ys).sum())
+        points = zip(xs.tolist(), ys.tolist())
+    else:
+        keys = map(keyHundredths, quantize(path.path))
+        points = []
+        for p in zip(keys[0::2], keys[1::2]):
+            if not points or p != points[-1]:
+                points.append(p)
+        if len(points) > 1 and points[0] == points[-1]:
+            points.pop()
+        area = sum(x0*y1 - x1*y0 for (x0, y0), (x1, y1)
+                   in zip(points, points[1:] + points[:1]))
+    if area < 0:
+        points.reverse()
+    edges = set()
+    if len(points) >= 3 and area:
+        edges = set(zip(points, points[1:] + points[:1]))
+    return points, edges
+
+## _mergeEdges() returns the POLYGON that a set of rings (as returned by
+##  _ring()) make together, in the style of 'template', or None if they
+##  don't make a single ring. The edges are first split wherever a corner of
+##  another ring lies on them (see _splitEdges()). Then every edge that two
+##  rings share goes round one of them one way and the other the other way,
+##  so those cancel out, and
+##  what's left is the outline, which is followed round from corner to
+##  corner. Corners that end up in the middle of a straight edge are dropped.
+def _mergeEdges(rings, template):
+    edges = set()
+    for ringEdges in _splitEdges(rings):
+        for p, q in ringEdges:
+            if (p, q) in edges:
+                return None         ## Two rings on top of one another.
+            if (q, p) in edges:
+                edges.remove((q, p))
+            else:
+                edges.add((p, q))
+    following = {}
+    for p, q in edges:
+        if p in following:
+            return None             ## Rings that only meet at a corner.
+        following[p] = q
+    if not following:
+        return None
+    start = min(following)
+    outline = [start]
+    p = following[start]
+    while p != start:
+        outline.append(p)
+        p = following.get(p)
+        if p is None or len(outline) > len(following):
+            return None
+    if len(outline) != len(following):
+        return None                 ## More than one ring: a hole.
+    corners = []
+    for n, (x, y) in enumerate(outline):
+        x0, y0 = outline[n - 1]
+        x1, y1 = outline[(n + 1) % len(outline)]
+        if (x - x0) * (y1 - y) != (y - y0) * (x1 - x):
+            corners.append((x, y))
+    if len(corners) < 3:
+        return None
+    path = _newPolygon(template)
+    for x, y in corners:
+        path.append(x / 100.0, y / 100.0)
+    return [path]
+
+## _splitEdges() returns the edges of each of 'rings' (see _ring()), as a
+##  list of (corner, next corner) pairs for each, with every edge split in
+##  two wherever a corner of any of the rings lies on it. Two rings that share
+##  part of an edge, such as a small square against one side of a big one,
+##  then share whole edges. The corners are filed in a grid, so that each
+##  edge only looks at those near it.
+def _splitEdges(rings):
+    lengths = [max(abs(q[0] - p[0]), abs(q[1] - p[1]))
+               for points, edges in rings for p, q in edges]
+    if not lengths:
+        return [[] for ring in rings]
+    size = max(1, sum(lengths) // len(lengths))
+    grid = {}
+    for points, edges in rings:
+        for x, y in points:
+            grid.setdefault((x // size, y // size), set()).add((x, y))
+    split = []
+    for points, edges in rings:
+        ringEdges = []
+        for p, q in edges:
+            dx = q[0] - p[0]
+            dy = q[1] - p[1]
+            length = dx*dx + dy*dy
+            between = []
+            for cx in xrange(min(p[0], q[0]) // size,
+                             max(p[0], q[0]) // size + 1):
+                for cy in xrange(min(p[1], q[1]) // size,
+                                 max(p[1], q[1]) // size + 1):
+                    for r in grid.get((cx, cy), ()):
+                        if (r[0] - p[0]) * dy != (r[1] - p[1]) * dx:
+                            continue    ## Not on the line through p and q.
+                        t = (r[0] - p[0]) * dx + (r[1] - p[1]) * dy
+                        if 0 < t < length:
+                            between.append((t, r))
+            between.sort()
+            for t, r in between:
+                ringEdges.append((p, r))
+                p = r
+            ringEdges.append((p, q))
+        split.append(ringEdges)
+    return split
+
+## _newPolygon() returns an empty POLYGON on the same layer and with the same
+##  width as 'template'.
+def _newPolygon(template):
+    path = EAGLEPath()
+    path.pathType = "POLYGON"
+    path.pathWeight = template.pathWeight
+    path.pathLayer = template.pathLayer
+    return path